@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+# Resolutions offered in the sidebar, mapped to DuckDB date_trunc units.
+# Automatic lets the database pick the finest unit fitting MAX_POINTS.
+RESOLUTIONS = {"Automatic": None, "Daily": "day", "Weekly": "week", "Monthly": "month"}
+# Points per series sent to the browser
+MAX_POINTS = 500
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: indexes of n_out points keeping the visual
+    shape of the (x, y) line. The first and last points are always kept; every
+    bucket in between keeps the point forming the largest triangle with the
+    point kept before it and the average of the next bucket.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    every = (n - 2) / (n_out - 2)
+    edges = np.append((np.arange(n_out - 1) * every).astype(int) + 1, n)
+    indexes = np.empty(n_out, dtype=int)
+    indexes[0], indexes[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end, next_end = edges[i], edges[i + 1], edges[i + 2]
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(area.argmax())
+        indexes[i + 1] = a
+    return indexes
+
+
+def downsample(
+    df: pd.DataFrame,
+    y: str,
+    max_points: int,
+    by: tuple[str, ...] = ("store_location", "sensor_id"),
+) -> pd.DataFrame:
+    """Downsamples every series of df, ordered by date, to at most max_points of y."""
+    parts = []
+    for _, series in df.groupby(list(by), sort=False):
+        if len(series) <= max_points:
+            parts.append(series)
+            continue
+        x = series["date"].to_numpy("datetime64[D]").astype(np.int64)
+        parts.append(series.iloc[lttb(x, series[y].to_numpy(), max_points)])
+    if not parts:
+        return df
+    return pd.concat(parts)
@@ -0,0 +1,526 @@
+import glob
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+from datetime import date
+
+import duckdb
+import pandas as pd
+import pyarrow.parquet as pq
+import streamlit as st
+
+DB_PATH = "data/data.duckdb"
+PROCESSED_PATH = "data/processed/data.parquet"
+
+# Constant query texts, so DuckDB prepares them once and values are only bound.
+# A NULL filter matches every store or sensor.
+SELECT_DATA_QUERY = """
+SELECT * FROM data
+WHERE ($store_location IS NULL OR store_location = $store_location)
+  AND ($sensor_id IS NULL OR sensor_id = $sensor_id)
+ORDER BY date
+"""
+SELECT_OPTIONS_QUERY = "SELECT store_location, sensor_id FROM store_sensors"
+SELECT_SPAN_QUERY = """
+SELECT min(date), max(date) + 6 FROM sensor_weekly
+WHERE ($store_location IS NULL OR store_location = $store_location)
+  AND ($sensor_id IS NULL OR sensor_id = $sensor_id)
+"""
+# Chart series at each date_trunc unit: daily rows come from the base table,
+# weeks and months from the rollups
+SERIES_TABLES = {"day": "data", "week": "sensor_weekly", "month": "sensor_monthly"}
+SELECT_SERIES_QUERIES = {
+    unit: f"""
+SELECT store_location, sensor_id, date, visit_count, moving_avg_4 FROM {table}
+WHERE ($store_location IS NULL OR store_location = $store_location)
+  AND ($sensor_id IS NULL OR sensor_id = $sensor_id)
+ORDER BY store_location, sensor_id, date
+"""
+    for unit, table in SERIES_TABLES.items()
+}
+SELECT_STORE_SERIES_QUERY = """
+SELECT
+    store_location,
+    CAST(date_trunc($unit, date) AS DATE) AS date,
+    sum(visit_count) AS visit_count
+FROM store_daily
+WHERE ($store_location IS NULL OR store_location = $store_location)
+GROUP BY ALL
+ORDER BY store_location, date
+"""
+
+# Approximate days per date_trunc unit, from the finest
+UNIT_DAYS = {"day": 1, "week": 7, "month": 30}
+
+# Columns identifying a row of the processed data
+KEY_COLUMNS = ["store_location", "sensor_id", "date"]
+# Rollups of the data table: the columns they group by, and the date_trunc
+# unit of their dates. Visits are summed over each group, moving averages are
+# averaged.
+ROLLUPS = {
+    "store_daily": (["store_location"], "day"),
+    "sensor_weekly": (["store_location", "sensor_id"], "week"),
+    "sensor_monthly": (["store_location", "sensor_id"], "month"),
+}
+# Rows appended by refreshes are out of order; once they reach this share of
+# the data table, every table is rewritten sorted
+COMPACTION_FRACTION = 0.1
+# Serializes the refreshes of the sessions of this process
+refresh_lock = threading.Lock()
+# Footer metadata in which the transform records a hash of each month of the
+# processed file (etl/incremental_transform.py)
+MONTH_HASHES_KEY = b"month_hashes"
+# Part name of a source without month hashes, always read and compared whole
+WHOLE_SOURCE = "*"
+
+
+def create_database() -> None:
+    """
+    This function performs the following checks and actions:
+    - Checks for the existence of the 'data' directory.
+    - Builds 'data.duckdb' from the processed Parquet data ('data/processed/data.parquet')
+      if it does not exist, or refreshes it if the Parquet data changed since the last
+      build (see refresh_database).
+
+    Returns:
+        None
+    """
+    if "data" not in os.listdir():
+        logging.error(os.listdir())
+        logging.error("creating folder data")
+        os.mkdir("data")
+    refresh_database()
+
+
+def open_read_only(path: str) -> duckdb.DuckDBPyConnection:
+    """
+    Opens the database file read-only in a new in-memory DuckDB instance.
+    duckdb.connect(path) would return the instance already open on that path,
+    which keeps showing the previous file after an atomic swap.
+    """
+    con = duckdb.connect()
+    escaped_path = path.replace("'", "''")
+    con.execute(f"ATTACH '{escaped_path}' AS db (READ_ONLY)")
+    con.execute("USE db")
+    return con
+
+
+def source_files(parquet_path: str = PROCESSED_PATH) -> list[str]:
+    """The processed Parquet file, or the files of a partitioned directory."""
+    if os.path.isdir(parquet_path):
+        return sorted(
+            glob.glob(os.path.join(parquet_path, "**", "*.parquet"), recursive=True)
+        )
+    return [parquet_path] if os.path.exists(parquet_path) else []
+
+
+def source_fingerprint(files: list[str]) -> str:
+    """Fingerprint of the names, sizes and modification times of the source files."""
+    digest = hashlib.sha256()
+    for filename in files:
+        stat = os.stat(filename)
+        digest.update(f"{filename}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+def table_names(con: duckdb.DuckDBPyConnection) -> list[str]:
+    tables = con.execute("SELECT table_name FROM duckdb_tables()").df()
+    return tables["table_name"].tolist()
+
+
+def source_parts(files: list[str]) -> dict[str, str]:
+    """
+    Fingerprint of each part of the source: each month ("YYYY-MM") of a
+    processed file, read from its footer, or the whole source for files written
+    without month hashes.
+    """
+    if len(files) == 1:
+        metadata = pq.read_schema(files[0]).metadata or {}
+        if MONTH_HASHES_KEY in metadata:
+            return json.loads(metadata[MONTH_HASHES_KEY])
+    return {WHOLE_SOURCE: source_fingerprint(files)}
+
+
+def stored_state(con: duckdb.DuckDBPyConnection) -> tuple[dict[str, str], int]:
+    """Fingerprints of the source parts loaded in the database, and its unsorted row count."""
+    tables = table_names(con)
+    # Databases refreshed before the parts were recorded compare every part
+    if "refresh_parts" not in tables or "refresh_state" not in tables:
+        return {}, 0
+    parts = con.execute("SELECT part, fingerprint FROM refresh_parts").fetchall()
+    unsorted_rows = con.execute("SELECT unsorted_rows FROM refresh_state").fetchone()[0]
+    return dict(parts), int(unsorted_rows)
+
+
+def save_state(
+    con: duckdb.DuckDBPyConnection, parts: dict[str, str], unsorted_rows: int
+) -> None:
+    con.execute(
+        "CREATE OR REPLACE TABLE refresh_state AS SELECT $unsorted_rows AS unsorted_rows",
+        {"unsorted_rows": unsorted_rows},
+    )
+    con.execute(
+        "CREATE OR REPLACE TABLE refresh_parts (part VARCHAR, fingerprint VARCHAR)"
+    )
+    if parts:
+        con.executemany("INSERT INTO refresh_parts VALUES (?, ?)", list(parts.items()))
+
+
+def changed_months(
+    parts: dict[str, str], stored_parts: dict[str, str]
+) -> list[str] | None:
+    """
+    Months whose rows were added, changed or removed since the stored parts,
+    or None if the whole source has to be compared.
+    """
+    if WHOLE_SOURCE in parts or WHOLE_SOURCE in stored_parts or not stored_parts:
+        return None
+    return sorted(
+        month
+        for month in parts.keys() | stored_parts.keys()
+        if parts.get(month) != stored_parts.get(month)
+    )
+
+
+def month_filter(months: list[str] | None) -> str:
+    """
+    Condition on the date column selecting the given months. The date range lets
+    the Parquet reader skip the row groups of the other months.
+    """
+    if months is None:
+        return "TRUE"
+    first_days = [date.fromisoformat(f"{month}-01") for month in months]
+    last = first_days[-1]
+    end = date(last.year + last.month // 12, last.month % 12 + 1, 1)
+    listed = ", ".join(f"'{day:%Y-%m}'" for day in first_days)
+    return (
+        f"date >= DATE '{first_days[0]}' AND date < DATE '{end}' "
+        f"AND strftime(date, '%Y-%m') IN ({listed})"
+    )
+
+
+def rollup_keys(name: str, table: str) -> dict[str, str]:
+    """Key columns of a rollup mapped to their expression over table."""
+    columns, unit = ROLLUPS[name]
+    keys = {column: f"{table}.{column}" for column in columns}
+    keys["date"] = f"CAST(date_trunc('{unit}', {table}.date) AS DATE)"
+    return keys
+
+
+def rollup_query(name: str, where: str = "") -> str:
+    """Aggregation of the data table for a rollup, optionally filtered."""
+    keys = ", ".join(
+        f"{expression} AS {column}"
+        for column, expression in rollup_keys(name, "data").items()
+    )
+    return (
+        f"SELECT {keys}, CAST(sum(visit_count) AS INTEGER) AS visit_count, "
+        f"avg(moving_avg_4) AS moving_avg_4 FROM data {where} GROUP BY ALL"
+    )
+
+
+def sort_order(table: str) -> str:
+    if table == "data":
+        return ", ".join(KEY_COLUMNS)
+    if table == "store_sensors":
+        return "store_location, sensor_id"
+    columns, _ = ROLLUPS[table]
+    return ", ".join([*columns, "date"])
+
+
+def build_rollups(con: duckdb.DuckDBPyConnection) -> None:
+    """Creates every rollup from the data table, stored sorted."""
+    for name in ROLLUPS:
+        con.execute(
+            f"CREATE OR REPLACE TABLE {name} AS "
+            f"{rollup_query(name)} ORDER BY {sort_order(name)}"
+        )
+    update_store_sensors(con)
+
+
+def update_store_sensors(con: duckdb.DuckDBPyConnection) -> None:
+    """Distinct (store, sensor) lookup, from the smallest rollup."""
+    con.execute(
+        "CREATE OR REPLACE TABLE store_sensors AS "
+        "SELECT DISTINCT store_location, sensor_id FROM sensor_monthly "
+        f"ORDER BY {sort_order('store_sensors')}"
+    )
+
+
+def update_rollups(con: duckdb.DuckDBPyConnection) -> None:
+    """
+    Recomputes only the rollup groups holding a day of the temp table touched:
+    their rows are deleted, then aggregated again from the data table.
+    """
+    for name in ROLLUPS:
+        keys = rollup_keys(name, "touched")
+        con.execute(
+            "CREATE OR REPLACE TEMP TABLE affected AS SELECT DISTINCT "
+            + ", ".join(f"{expression} AS {column}" for column, expression in keys.items())
+            + " FROM touched"
+        )
+        matches_rollup = " AND ".join(f"a.{column} = {name}.{column}" for column in keys)
+        con.execute(
+            f"DELETE FROM {name} WHERE EXISTS "
+            f"(SELECT 1 FROM affected a WHERE {matches_rollup})"
+        )
+        matches_data = " AND ".join(
+            f"a.{column} = {expression}"
+            for column, expression in rollup_keys(name, "data").items()
+        )
+        con.execute(
+            f"INSERT INTO {name} "
+            + rollup_query(
+                name, f"WHERE EXISTS (SELECT 1 FROM affected a WHERE {matches_data})"
+            )
+        )
+    update_store_sensors(con)
+
+
+def compact(con: duckdb.DuckDBPyConnection) -> None:
+    """Rewrites the data table and its rollups sorted, so zone maps prune well."""
+    for table in ["data", *ROLLUPS]:
+        con.execute(
+            f"CREATE OR REPLACE TABLE {table} AS "
+            f"SELECT * FROM {table} ORDER BY {sort_order(table)}"
+        )
+
+
+def apply_changes(
+    con: duckdb.DuckDBPyConnection, files: list[str], months: list[str] | None
+) -> tuple[int, int] | None:
+    """
+    Brings the data table in line with the given months of the source files
+    (every month if None): only their rows are read and compared. Rows that are
+    new or whose values changed are inserted, rows missing from the source are
+    deleted, and the rollup groups of those days are recomputed.
+    A missing table or a different column layout rebuilds every table, sorted.
+    Returns the numbers of deleted and inserted rows, or None after a rebuild.
+    """
+    in_months = month_filter(months)
+    con.execute(
+        f"CREATE TEMP TABLE source AS SELECT * FROM read_parquet($files) WHERE {in_months}",
+        {"files": files},
+    )
+    if "data" in table_names(con):
+        layout = con.execute("DESCRIBE data").df()[["column_name", "column_type"]]
+        source_layout = con.execute("DESCRIBE source").df()[
+            ["column_name", "column_type"]
+        ]
+        missing_rollups = {*ROLLUPS, "store_sensors"} - set(table_names(con))
+        if missing_rollups or not layout.equals(source_layout):
+            con.execute("DROP TABLE data")
+    if "data" not in table_names(con):
+        con.execute(
+            "CREATE TABLE data AS SELECT * FROM read_parquet($files) "
+            f"ORDER BY {sort_order('data')}",
+            {"files": files},
+        )
+        build_rollups(con)
+        return None
+
+    same_key = " AND ".join(f"k.{c} = data.{c}" for c in KEY_COLUMNS)
+    con.execute(
+        "CREATE TEMP TABLE changed AS SELECT * FROM source "
+        f"EXCEPT SELECT * FROM data WHERE {in_months}"
+    )
+    # Days whose row changed, is new or disappeared from the source
+    con.execute(
+        f"""
+        CREATE TEMP TABLE touched AS
+        SELECT {", ".join(KEY_COLUMNS)} FROM changed
+        UNION
+        SELECT {", ".join(KEY_COLUMNS)} FROM data
+        WHERE {in_months} AND NOT EXISTS (SELECT 1 FROM source k WHERE {same_key})
+        """
+    )
+    deleted = con.execute(
+        f"DELETE FROM data WHERE EXISTS (SELECT 1 FROM touched k WHERE {same_key})"
+    ).fetchone()[0]
+    inserted = con.execute("INSERT INTO data SELECT * FROM changed").fetchone()[0]
+    update_rollups(con)
+    return deleted, inserted
+
+
+def refresh_database(
+    db_path: str = DB_PATH, parquet_path: str = PROCESSED_PATH
+) -> bool:
+    """
+    Loads the changes of the processed Parquet data into the database when the
+    fingerprint of one of its parts changed; only the changed months are read.
+    The changes are applied to a copy of the database, which then atomically
+    replaces the file: readers never see a partial table, and never hold the
+    file locked against the refresh.
+    Returns whether the database was refreshed.
+    """
+    files = source_files(parquet_path)
+    if not files:
+        logging.error(f"No processed data in {parquet_path}")
+        return False
+    parts = source_parts(files)
+
+    with refresh_lock:
+        stored_parts, unsorted_rows = {}, 0
+        if os.path.exists(db_path):
+            with open_read_only(db_path) as con:
+                stored_parts, unsorted_rows = stored_state(con)
+            if stored_parts == parts:
+                return False
+        months = changed_months(parts, stored_parts)
+
+        tmp_path = f"{db_path}.{os.getpid()}.tmp"
+        if os.path.exists(db_path):
+            shutil.copyfile(db_path, tmp_path)
+        try:
+            with duckdb.connect(database=tmp_path, read_only=False) as con:
+                con.execute("BEGIN TRANSACTION")
+                changes = apply_changes(con, files, months)
+                if changes is None:
+                    unsorted_rows = 0
+                    logging.info(f"Rebuilt {db_path}")
+                else:
+                    deleted, inserted = changes
+                    unsorted_rows += inserted
+                    n_rows = con.execute("SELECT count(*) FROM data").fetchone()[0]
+                    if unsorted_rows > COMPACTION_FRACTION * n_rows:
+                        compact(con)
+                        unsorted_rows = 0
+                    scope = "all" if months is None else len(months)
+                    logging.info(
+                        f"Refreshed {db_path}: {deleted + inserted} rows "
+                        f"inserted or deleted, months read: {scope}"
+                    )
+                save_state(con, parts, unsorted_rows)
+                con.execute("COMMIT")
+            os.replace(tmp_path, db_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    return True
+
+
+def auto_unit(n_days: int, max_points: int) -> str:
+    """Finest date_trunc unit giving at most max_points per series over n_days."""
+    for unit, days in UNIT_DAYS.items():
+        if n_days / days <= max_points:
+            return unit
+    return "month"
+
+
+def data_version(path: str = DB_PATH) -> str:
+    """
+    Fingerprint of the database file. It changes whenever the file is rebuilt,
+    and keys the cached connection and query results.
+    """
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+@st.cache_resource(max_entries=1)
+def get_connection(version: str, path: str = DB_PATH) -> duckdb.DuckDBPyConnection:
+    """
+    Read-only connection shared by every session, reopened when the version
+    changes. Read-only connections never take the write lock of the file.
+    """
+    return open_read_only(path)
+
+
+def get_cursor(version: str, path: str = DB_PATH) -> duckdb.DuckDBPyConnection:
+    """
+    Cursor of the current session on the shared connection. Sessions run in
+    their own threads, and a DuckDB connection must not be shared between them.
+    """
+    cursor = st.session_state.get("duckdb_cursor")
+    if cursor is None or st.session_state.get("duckdb_version") != version:
+        cursor = get_connection(version, path).cursor()
+        cursor.execute("USE db")
+        st.session_state["duckdb_cursor"] = cursor
+        st.session_state["duckdb_version"] = version
+    return cursor
+
+
+@st.cache_data(max_entries=4)
+def get_options(_cursor: duckdb.DuckDBPyConnection, version: str) -> pd.DataFrame:
+    """Distinct (store, sensor) pairs for the sidebar, cached per data version."""
+    return _cursor.execute(SELECT_OPTIONS_QUERY).df()
+
+
+@st.cache_data(max_entries=256)
+def get_table(
+    _cursor: duckdb.DuckDBPyConnection,
+    version: str,
+    current_store: str | None,
+    current_sensor: str | None,
+) -> pd.DataFrame:
+    """
+    Retrieves stores and sensors matching the given ID.
+    Results are cached per data version and filters, so widget changes that
+    come back to a previous selection never query the database again.
+
+    Args:
+        _cursor (DuckDBPyConnection): Cursor of the session, not hashed.
+        version (str): Version of the data, see data_version.
+        current_store (str): Location of the store (Bordeaux, Lyon, Marseille).
+            If empty, retrieves all stores.
+        current_sensor (str): ID of the sensor (e.g. 1-8).
+            If empty, retrieves all sensors.
+
+    Returns:
+        pd.DataFrame: A DataFrame of specific stores and sensors.
+    """
+    return _cursor.execute(
+        SELECT_DATA_QUERY,
+        {
+            "store_location": current_store or None,
+            "sensor_id": current_sensor or None,
+        },
+    ).df()
+
+
+@st.cache_data(max_entries=256)
+def get_series(
+    _cursor: duckdb.DuckDBPyConnection,
+    version: str,
+    current_store: str | None,
+    current_sensor: str | None,
+    unit: str | None,
+    max_points: int,
+) -> tuple[pd.DataFrame, str]:
+    """
+    Chart series at the date_trunc unit (day, week or month), read from the
+    base table or its rollups. Without a unit, the finest one giving at most
+    max_points per series is used.
+    Returns the series and the unit used.
+    """
+    filters = {
+        "store_location": current_store or None,
+        "sensor_id": current_sensor or None,
+    }
+    if unit is None:
+        first, last = _cursor.execute(SELECT_SPAN_QUERY, filters).fetchone()
+        unit = auto_unit((last - first).days + 1 if first else 0, max_points)
+    series = _cursor.execute(SELECT_SERIES_QUERIES[unit], filters).df()
+    return series, unit
+
+
+@st.cache_data(max_entries=256)
+def get_store_series(
+    _cursor: duckdb.DuckDBPyConnection,
+    version: str,
+    current_store: str | None,
+    unit: str,
+) -> pd.DataFrame:
+    """Total visits of each store at the date_trunc unit, from the store_daily rollup."""
+    return _cursor.execute(
+        SELECT_STORE_SERIES_QUERY,
+        {"store_location": current_store or None, "unit": unit},
+    ).df()
+
+
+if __name__ == "__main__":
+    # Run after the transform, from the project directory
+    logging.basicConfig(level=logging.INFO)
+    refresh_database()
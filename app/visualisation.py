@@ -1,77 +1,23 @@
-import os
-import logging
+from charts import MAX_POINTS, RESOLUTIONS, downsample
+from database import (create_database, data_version, get_cursor, get_options,
+                      get_series, get_store_series, get_table)
 from design import page_header, show_footer
-import duckdb
 import numpy as np
-import pandas as pd
 import plotly.express as px
 import streamlit as st
 
 
-def create_database() -> None:
-    """
-    This function performs the following checks and actions:
-    - Checks for the existence of the 'data.duckdb' database file within the 'data' directory.
-    - If the database file does not exist, it establishes a connection to DuckDB, creates the database and create the table from a pre-existing Parquet file ('data/processed/data.parquet').
-
-    Returns:
-        None
-    """
-    if "data" not in os.listdir():
-        logging.error(os.listdir())
-        logging.error("creating folder data")
-        os.mkdir("data")
-    if "data.duckdb" not in os.listdir("data"):
-        init_db = duckdb.connect(database="data/data.duckdb", read_only=False)
-        init_db.execute(
-            "CREATE TABLE IF NOT EXISTS data AS SELECT * FROM 'data/processed/data.parquet'"
-        )
-
-
-def get_table(current_store: str, current_sensor: str) -> pd.DataFrame:
-    """
-    Retrieves stores and sensors matching the given ID.
-
-    Args:
-        current_store (str): Location of the store (Bordeaux, Lyon, Marseille).
-            If empty, retrieves all stores.
-        current_sensor (str): ID of the sensor (e.g. 1-8).
-            If empty, retrieves all sensors.
-
-    Returns:
-        pd.DataFrame: A DataFrame of specific stores and sensors.
-    """
-    if current_store and current_sensor:
-        select_data_query = f"SELECT * FROM data WHERE store_location = '{current_store}' and sensor_id = '{current_sensor}'"
-    elif current_store:
-        select_data_query = (
-            f"SELECT * FROM data WHERE store_location = '{current_store}'"
-        )
-    elif current_sensor:
-        select_data_query = f"SELECT * FROM data WHERE sensor_id = '{current_sensor}'"
-    else:
-        select_data_query = "SELECT * FROM data"
-    user_selection = (
-        con.execute(select_data_query).df().sort_values("date").reset_index(drop=True)
-    )
-    return user_selection
-
-
 # Creation of the database
 create_database()
 
-# Connection to the database
-con = duckdb.connect(database="data/data.duckdb", read_only=False)
+# Shared read-only connection, with a cursor for this session
+version = data_version()
+cursor = get_cursor(version)
 
 page_header("Data Visualisation", "Explore quality metrics and insights")
 
 # Display the table and select a location and a sensor
-available_location_df = con.execute(
-    "SELECT DISTINCT store_location, sensor_id from data"
-).df()
-available_sensor_df = con.execute(
-    "SELECT DISTINCT sensor_id FROM available_location_df"
-).df()
+available_location_df = get_options(cursor, version)
 with st.sidebar:
     location = st.selectbox(
         "Please select a location to view (optional).",
@@ -81,21 +27,28 @@ with st.sidebar:
     )
     sensor_id = st.selectbox(
         "Please select a sensor to view (optional).",
-        np.sort(available_sensor_df["sensor_id"].unique()),
+        np.sort(available_location_df["sensor_id"].unique()),
         index=None,
         placeholder="Select a sensor ID...",
     )
+    resolution = st.selectbox("Chart resolution", list(RESOLUTIONS))
 
-data = get_table(current_store=location, current_sensor=sensor_id)
+data = get_table(cursor, version, current_store=location, current_sensor=sensor_id)
+# Charts get series aggregated by DuckDB, then at most MAX_POINTS points each
+series, unit = get_series(
+    cursor, version, location, sensor_id, RESOLUTIONS[resolution], MAX_POINTS
+)
+series["legend_label"] = series["store_location"] + " - " + series["sensor_id"]
+# Totals of every sensor of a store, from the store_daily rollup
+store_series = get_store_series(cursor, version, location, unit)
 
 # Display the table
 st.write("**Store Information**")
 st.write(data)
 
-data["legend_label"] = data["store_location"] + " - " + data["sensor_id"]
 # Display visit_count by date for each store
 fig = px.line(
-    data,
+    downsample(series, "visit_count", MAX_POINTS),
     x="date",
     y="visit_count",
     color="legend_label",
@@ -104,16 +57,34 @@ fig = px.line(
 
 fig.update_layout(
     xaxis_title="Date",
-    yaxis_title="Visitor Count",
+    yaxis_title=f"Visitor Count (per {unit})",
     legend_title="Location - Sensor",
 )
 
 st.plotly_chart(fig, use_container_width=True)
 
 
+# Display the total visit_count by date for each store
+fig = px.line(
+    downsample(store_series, "visit_count", MAX_POINTS, by=("store_location",)),
+    x="date",
+    y="visit_count",
+    color="store_location",
+    title="Total Visitor Count Over Time by Location",
+)
+
+fig.update_layout(
+    xaxis_title="Date",
+    yaxis_title=f"Visitor Count (per {unit})",
+    legend_title="Location",
+)
+
+st.plotly_chart(fig, use_container_width=True)
+
+
 # Display moving average by date for each store
 fig = px.line(
-    data,
+    downsample(series, "moving_avg_4", MAX_POINTS),
     x="date",
     y="moving_avg_4",
     color="legend_label",
@@ -0,0 +1,100 @@
+"""
+Benchmark of the data quality rules (etl/quality_rules.py) on simulated sensors.
+
+Simulates every sensor of n stores with StoreSensor, runs the transform features,
+then times evaluate() and reports the share of breaks and malfunctions flagged.
+
+    python -m benchmarks.bench_quality_rules --stores 200 --years 5
+"""
+import argparse
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from etl.quality_rules import evaluate
+from etl.transform_data import add_moving_average_and_change
+from src.store import StoreSensor
+
+
+def simulate_daily_visits(
+    n_stores: int, n_years: int
+) -> tuple[pd.DataFrame, np.ndarray, np.ndarray]:
+    """
+    Daily visits of every sensor as the transform outputs them, plus the break
+    days it drops (12 business hours at -1). Also returns the break and
+    malfunction flags of the rows.
+    """
+    end_date = date(2020 + n_years - 1, 12, 31)
+    parts, breaks, malfunctions = [], [], []
+    for i in range(n_stores):
+        # StoreSensor hands its rates to VisitSensor in (break, malfunction)
+        # order: 1% of the days break and 2% malfunction
+        store = StoreSensor(f"store_{i}", 1200, 300, 0.01, 0.03)
+        for sensor_id in store.sensors:
+            dates, counts, is_break, is_malfunction = store.get_sensor_traffic_range(
+                sensor_id, date(2020, 1, 1), end_date
+            )
+            # The transform sums 12 hourly readings
+            counts = np.where(is_break, -12, counts * 12)
+            parts.append(
+                pd.DataFrame(
+                    {
+                        "store_location": f"store_{i}",
+                        "sensor_id": sensor_id,
+                        "date": dates.astype("datetime64[us]"),
+                        "visit_count": counts,
+                    }
+                )
+            )
+            breaks.append(is_break)
+            malfunctions.append(is_malfunction)
+    df = pd.concat(parts, ignore_index=True)
+    is_break = np.concatenate(breaks)
+    is_malfunction = np.concatenate(malfunctions)
+
+    positive = df["visit_count"].to_numpy() > 0
+    df_day = df[positive].copy()
+    df_day["day_of_week"] = df_day["date"].dt.dayofweek
+    df_day = add_moving_average_and_change(df_day)
+    dropped = df[~positive].assign(pct_change=np.nan)
+    df = pd.concat([df_day, dropped]).sort_index()
+    return df, is_break, is_malfunction
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--stores", type=int, default=50)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    df, is_break, is_malfunction = simulate_daily_visits(args.stores, args.years)
+    print(f"{len(df):,} daily rows ({args.stores} stores x 4 sensors x {args.years} years)")
+
+    timings = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        flags = evaluate(df)
+        timings.append(time.perf_counter() - started)
+    best = min(timings)
+    print(f"evaluate: {best:.3f}s, {len(df) / best:,.0f} rows/s")
+
+    # The flags are sorted by store, sensor and date like the simulated rows
+    keys = ["store_location", "sensor_id", "date"]
+    flags = flags.set_index(keys).loc[pd.MultiIndex.from_frame(df[keys])]
+    print(f"{'check':<20} {'flagged':>10}")
+    for name in ["negative_reading", "pct_change_exceeded", "missing_day", "sensor_split"]:
+        print(f"{name:<20} {int(flags[name].sum()):>10,}")
+    print(
+        f"breaks flagged:       {flags['negative_reading'].to_numpy()[is_break].mean():.1%}"
+    )
+    print(
+        "malfunctions flagged: "
+        f"{flags['flagged'].to_numpy()[is_malfunction].mean():.1%}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Memory used at each transform stage with the shared schema (etl/schema.py).
+
+Writes a synthetic raw dataset, runs load, aggregate and features, and compares
+each stage with the previous types: string stores and sensors, text counts at
+load, int64 counts and float64 features. Also compares the processed file sizes.
+
+    python -m benchmarks.bench_schema_memory --stores 20 --days 365
+"""
+import argparse
+import os
+import tempfile
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from etl.raw_layer import PartitionedParquetSink
+from etl.schema import PROCESSED_SCHEMA, to_pandas, to_processed_table
+from etl.transform_data import (add_moving_average_and_change,
+                                aggregate_daily_visits, load_data,
+                                prepare_date_column)
+
+
+def write_raw(raw_dir: str, n_stores: int, n_days: int, seed: int = 0) -> None:
+    """12 business hours per (store, sensor, day), written through the sink."""
+    rng = np.random.default_rng(seed)
+    sink = PartitionedParquetSink(raw_dir)
+    for i in range(n_days):
+        day = date(2024, 1, 1) + timedelta(days=i)
+        sink.write(
+            [
+                {
+                    "store_location": f"store_{s}",
+                    "sensor_id": sensor,
+                    "year": day.year,
+                    "month": day.month,
+                    "day": day.day,
+                    "hour": hour,
+                    "visit_count": int(rng.integers(0, 100)),
+                }
+                for s in range(n_stores)
+                for sensor in ["A", "B", "C", "D"]
+                for hour in range(8, 20)
+            ]
+        )
+
+
+def previous_types(df: pd.DataFrame, text_counts: bool = False) -> pd.DataFrame:
+    """The same rows with the types used before the shared schema."""
+    previous = df.copy()
+    for column in previous.columns:
+        if isinstance(previous[column].dtype, pd.CategoricalDtype):
+            previous[column] = previous[column].astype(object)
+        elif pd.api.types.is_integer_dtype(previous[column]):
+            previous[column] = previous[column].astype("int64")
+        elif pd.api.types.is_float_dtype(previous[column]):
+            previous[column] = previous[column].astype("float64")
+    if text_counts:
+        previous["visit_count"] = previous["visit_count"].astype(str).astype(object)
+    return previous
+
+
+def size(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(deep=True).sum())
+
+
+def report(stage: str, typed: int, previous: int) -> None:
+    print(
+        f"{stage:<10} {previous / 2**20:>10.2f} MiB {typed / 2**20:>10.2f} MiB "
+        f"{previous / typed:>6.1f}x"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--stores", type=int, default=10)
+    parser.add_argument("--days", type=int, default=365)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        raw_dir = os.path.join(tmp_dir, "raw")
+        write_raw(raw_dir, args.stores, args.days)
+
+        df = load_data(path=raw_dir)
+        print(f"{len(df):,} raw rows ({args.stores} stores x 4 sensors x {args.days} days)")
+        print(f"{'stage':<10} {'previous':>14} {'typed':>14} {'ratio':>7}")
+        report("load", size(df), size(previous_types(df, text_counts=True)))
+
+        df = prepare_date_column(df)
+        df_day = aggregate_daily_visits(df)
+        report("aggregate", size(df_day), size(previous_types(df_day)))
+
+        df_day = add_moving_average_and_change(df_day)
+        processed = to_pandas(to_processed_table(df_day))
+        report("features", size(processed), size(previous_types(processed)))
+
+        typed_path = os.path.join(tmp_dir, "typed.parquet")
+        previous_path = os.path.join(tmp_dir, "previous.parquet")
+        pq.write_table(to_processed_table(df_day), typed_path)
+        previous_types(processed)[PROCESSED_SCHEMA.names].to_parquet(
+            previous_path, index=False
+        )
+        report(
+            "file",
+            os.path.getsize(typed_path),
+            os.path.getsize(previous_path),
+        )
+
+
+if __name__ == "__main__":
+    main()
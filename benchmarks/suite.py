@@ -0,0 +1,364 @@
+"""
+Benchmark suite of the simulation, the API, the transform and the dashboard queries.
+
+Every case runs a fixed workload on seeded synthetic data, --repeat times after
+its untimed setup, and the median time per operation is kept. Results are saved
+as JSON; with --baseline, they are compared with a stored run and the command
+fails when a case got slower than the tolerance allows.
+
+    python -m benchmarks.suite --output benchmarks/results/baseline.json
+    python -m benchmarks.suite --baseline benchmarks/results/baseline.json
+    python -m benchmarks.suite --filter dashboard/get_table --quick
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+
+import httpx
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from app.database import (SELECT_DATA_QUERY, SELECT_SERIES_QUERIES,
+                          open_read_only, refresh_database)
+from benchmarks.bench_pct_change import make_daily_data
+from etl.incremental_transform import write_processed
+from etl.raw_layer import PartitionedParquetSink
+from etl.schema import RAW_FILE_SCHEMA
+from etl.transform_data import (add_moving_average_and_change,
+                                aggregate_daily_visits, load_data,
+                                prepare_date_column)
+from src.sensor import VisitSensor, date_range
+from src.store import StoreSensor
+
+YEAR = date_range(date(2024, 1, 1), date(2024, 12, 31))
+STORE_COUNTS = [1, 10, 100]
+YEAR_COUNTS = [1, 5]
+BUSINESS_HOURS = np.arange(8, 20)
+
+
+class Case:
+    """
+    A benchmark case: run(input) performs ops operations. setup(), when given,
+    builds a fresh input before each run, outside of the timing.
+    """
+
+    def __init__(self, name: str, run, ops: int = 1, setup=None) -> None:
+        self.name = name
+        self.run = run
+        self.ops = ops
+        self.setup = setup
+
+    def measure(self, repeat: int) -> dict:
+        timings = []
+        state = None
+        for _ in range(repeat):
+            if self.setup is not None:
+                state = self.setup()
+            started = time.perf_counter()
+            self.run(state)
+            timings.append(time.perf_counter() - started)
+        median = statistics.median(timings)
+        return {
+            "ops": self.ops,
+            "repeat": repeat,
+            "median_s": median,
+            "min_s": min(timings),
+            "per_op_s": median / self.ops,
+        }
+
+
+# Simulation
+
+
+def simulation_cases() -> list[Case]:
+    def sensor_calls(_):
+        sensor = VisitSensor(1200, 300)
+        for day in YEAR.tolist():
+            sensor.get_visit_count(day)
+
+    def store_calls(store):
+        for day in YEAR.tolist():
+            store.get_all_traffic(day)
+
+    return [
+        Case("simulation/sensor.get_visit_count/call", sensor_calls, ops=len(YEAR)),
+        Case(
+            "simulation/sensor.get_visit_counts/year",
+            lambda _: VisitSensor(1200, 300).get_visit_counts(YEAR),
+        ),
+        # A new store per run, so its traffic cache starts empty
+        Case(
+            "simulation/store.get_all_traffic/call",
+            store_calls,
+            ops=len(YEAR),
+            setup=lambda: StoreSensor("Lille", 3000, 500, 0.05, 0.05),
+        ),
+        Case(
+            "simulation/store.get_all_traffic_counts/year",
+            lambda store: store.get_all_traffic_counts(YEAR),
+            setup=lambda: StoreSensor("Lille", 3000, 500, 0.05, 0.05),
+        ),
+    ]
+
+
+# API
+
+
+def api_cases(n_requests: int) -> list[Case]:
+    from src.app import app, store_dict
+
+    stores = list(store_dict)
+    days = YEAR.tolist()
+    requests = [
+        {
+            "store_location": stores[i % len(stores)],
+            "year": days[i % len(days)].year,
+            "month": days[i % len(days)].month,
+            "day": days[i % len(days)].day,
+            **({"sensor_id": "ABCD"[i % 4]} if i % 2 else {}),
+        }
+        for i in range(n_requests)
+    ]
+
+    async def send(params_list):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            for params in params_list:
+                response = await client.get("/", params=params)
+                response.raise_for_status()
+
+    def visit(_):
+        asyncio.run(send(requests))
+
+    # The stores cache the counts: the first run fills the cache, the median
+    # measures the endpoint itself
+    return [Case("api/visit/request", visit, ops=n_requests)]
+
+
+# Transform
+
+
+def make_raw_data(n_stores: int, n_years: int, seed: int = 0) -> pd.DataFrame:
+    """Hourly rows with the columns and types of load_data."""
+    rng = np.random.default_rng(seed)
+    days = date_range(date(2020, 1, 1), date(2020 + n_years - 1, 12, 31))
+    stores = pd.Categorical([f"store_{i}" for i in range(n_stores)])
+    sensors = pd.Categorical(["A", "B", "C", "D"])
+    n_series = n_stores * len(sensors)
+    n_rows = n_series * len(days) * len(BUSINESS_HOURS)
+
+    per_series = len(days) * len(BUSINESS_HOURS)
+    series = np.repeat(np.arange(n_series), per_series)
+    day = np.tile(np.repeat(days, len(BUSINESS_HOURS)), n_series)
+    year = day.astype("datetime64[Y]").astype(np.int64) + 1970
+    month = day.astype("datetime64[M]").astype(np.int64) % 12 + 1
+    day_of_month = (day - day.astype("datetime64[M]")).astype(np.int64) + 1
+    return pd.DataFrame(
+        {
+            "store_location": stores.take(series // len(sensors)),
+            "sensor_id": sensors.take(series % len(sensors)),
+            "year": year.astype(np.int16),
+            "month": month.astype(np.int8),
+            "day": day_of_month.astype(np.int8),
+            "visit_count": rng.integers(-1, 100, n_rows, dtype=np.int32),
+        }
+    )
+
+
+def write_raw_data(raw_dir: str, raw: pd.DataFrame) -> None:
+    """Writes hourly rows to the raw layer, one file per (store, sensor, month)."""
+    sink = PartitionedParquetSink(raw_dir)
+    keys = ["store_location", "sensor_id", "year", "month"]
+    for (store, sensor, year, month), rows in raw.groupby(keys, observed=True):
+        table = pa.table(
+            {
+                "visit_count": rows["visit_count"].to_numpy(),
+                "hour": np.tile(
+                    BUSINESS_HOURS.astype(np.int8), len(rows) // len(BUSINESS_HOURS)
+                ),
+                "day": rows["day"].to_numpy(),
+            },
+            schema=RAW_FILE_SCHEMA,
+        )
+        sink.write_table(store, sensor, int(year), int(month), table)
+
+
+def transform_cases(
+    store_counts: list[int], year_counts: list[int], tmp_dir: str
+) -> list[Case]:
+    cases = []
+    for n_years in year_counts:
+        for n_stores in store_counts:
+            size = f"{n_stores}_stores/{n_years}_years"
+            raw = make_raw_data(n_stores, n_years)
+            dated = prepare_date_column(raw.copy())
+            daily = aggregate_daily_visits(dated.copy())
+            cases += [
+                Case(
+                    f"transform/prepare_date_column/{size}",
+                    prepare_date_column,
+                    setup=raw.copy,
+                ),
+                Case(
+                    f"transform/aggregate_daily_visits/{size}",
+                    aggregate_daily_visits,
+                    setup=dated.copy,
+                ),
+                Case(
+                    f"transform/add_moving_average_and_change/{size}",
+                    add_moving_average_and_change,
+                    setup=daily.copy,
+                ),
+            ]
+        # Reading the raw files: one file per (store, sensor, month)
+        raw_dir = os.path.join(tmp_dir, f"raw_{n_years}")
+        write_raw_data(raw_dir, make_raw_data(min(store_counts), n_years))
+        cases.append(
+            Case(
+                f"transform/load_data/{min(store_counts)}_stores/{n_years}_years",
+                lambda _, raw_dir=raw_dir: load_data(path=raw_dir),
+            )
+        )
+    return cases
+
+
+# Dashboard
+
+
+def dashboard_cases(n_stores: int, tmp_dir: str) -> list[Case]:
+    """The get_table and chart queries on the daily rows of n_stores over 5 years."""
+    daily = add_moving_average_and_change(make_daily_data(n_stores, 5))
+    parquet_path = os.path.join(tmp_dir, "data.parquet")
+    db_path = os.path.join(tmp_dir, "data.duckdb")
+    write_processed(daily, parquet_path)
+    refresh_database(db_path, parquet_path)
+    con = open_read_only(db_path)
+
+    def query(sql: str, params: dict):
+        return lambda _: con.execute(sql, params).df()
+
+    patterns = {
+        "all": {"store_location": None, "sensor_id": None},
+        "store": {"store_location": "store_0", "sensor_id": None},
+        "sensor": {"store_location": None, "sensor_id": "A"},
+        "store_sensor": {"store_location": "store_0", "sensor_id": "A"},
+    }
+    cases = [
+        Case(
+            f"dashboard/get_table/{name}/{n_stores}_stores",
+            query(SELECT_DATA_QUERY, params),
+        )
+        for name, params in patterns.items()
+    ]
+    cases += [
+        Case(
+            f"dashboard/get_series/{unit}/{n_stores}_stores",
+            query(SELECT_SERIES_QUERIES[unit], patterns["all"]),
+        )
+        for unit in SELECT_SERIES_QUERIES
+    ]
+    return cases
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Prints the change of every case against the baseline, and returns the cases
+    whose time per operation grew by more than tolerance.
+    """
+    regressions = []
+    print(f"{'case':<60} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, result in results["cases"].items():
+        previous = baseline["cases"].get(name)
+        if previous is None:
+            print(f"{name:<60} {'-':>12} {result['per_op_s']:>12.3g} {'new':>8}")
+            continue
+        change = result["per_op_s"] / previous["per_op_s"] - 1
+        marker = ""
+        if change > tolerance:
+            regressions.append(name)
+            marker = " !"
+        print(
+            f"{name:<60} {previous['per_op_s']:>12.3g} {result['per_op_s']:>12.3g} "
+            f"{change:>+8.0%}{marker}"
+        )
+    return regressions
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--output", help="JSON file the results are written to")
+    parser.add_argument("--baseline", help="JSON results to compare with")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="slowdown per operation allowed before a case counts as a regression",
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--filter", default="", help="only run the cases starting with this prefix"
+    )
+    parser.add_argument(
+        "--quick",
+        action="store_true",
+        help="only the smallest transform and dashboard datasets",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    store_counts = STORE_COUNTS[:1] if args.quick else STORE_COUNTS
+    year_counts = YEAR_COUNTS[:1] if args.quick else YEAR_COUNTS
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        groups = {
+            "simulation": simulation_cases,
+            "api": lambda: api_cases(n_requests=200),
+            "transform": lambda: transform_cases(store_counts, year_counts, tmp_dir),
+            "dashboard": lambda: dashboard_cases(max(store_counts), tmp_dir),
+        }
+        results = {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "cases": {},
+        }
+        for group, build_cases in groups.items():
+            # Only the groups holding a selected case are set up
+            if not (group.startswith(args.filter) or args.filter.startswith(group)):
+                continue
+            for case in build_cases():
+                if not case.name.startswith(args.filter):
+                    continue
+                results["cases"][case.name] = case.measure(args.repeat)
+                print(f"{case.name:<60} {results['cases'][case.name]['per_op_s']:>12.3g}s")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regressions above {args.tolerance:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -10,16 +10,30 @@ with DAG(
     start_date=datetime.datetime(2025, 1, 1),
     dagrun_timeout=datetime.timedelta(minutes=60),
 ) as dag:
+    # The timing and memory reports of the run are kept in data/reports/<run time>/
     first_task = BashOperator(
         task_id="first_task",
-        bash_command="python ~/data_quality_monitoring/extract_data.py",
+        bash_command="cd ~/data_quality_monitoring && python -m etl.extract_data "
+        "--report data/reports/{{ ts_nodash }}/extract_data.json",
     )
 
     second_task = BashOperator(
         task_id="second_task",
-        bash_command="python ~/data_quality_monitoring/transform_data.py",
+        bash_command="cd ~/data_quality_monitoring && python -m etl.transform_data "
+        "--report data/reports/{{ ts_nodash }}/transform_data.json",
     )
-    first_task >> second_task
+    # Loads the new processed rows into the dashboard database
+    third_task = BashOperator(
+        task_id="third_task",
+        bash_command="cd ~/data_quality_monitoring && python app/database.py",
+    )
+    # Flags the breaks, malfunctions and missing days of the processed data
+    fourth_task = BashOperator(
+        task_id="fourth_task",
+        bash_command="cd ~/data_quality_monitoring && python -m etl.quality_rules",
+    )
+    first_task >> second_task >> third_task
+    second_task >> fourth_task
 
 if __name__ == "__main__":
     dag.test()
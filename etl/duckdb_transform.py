@@ -0,0 +1,71 @@
+import glob
+import os
+
+import duckdb
+import pandas as pd
+
+from etl.raw_layer import partition_glob
+
+# Daily sums, then the 4-period moving average of each (store, sensor, weekday)
+# series, computed straight from the raw Parquet files. Days summing to 0 or
+# less (breaks) are dropped, as in the pandas transform.
+TRANSFORM_QUERY = """
+WITH daily AS (
+    SELECT
+        store_location,
+        sensor_id,
+        CAST(make_date(year, month, day) AS TIMESTAMP) AS date,
+        CAST(sum(CAST(visit_count AS BIGINT)) AS BIGINT) AS visit_count
+    FROM read_parquet(
+        $files,
+        hive_partitioning = true,
+        hive_types = {
+            'year': INTEGER,
+            'month': INTEGER,
+            'store_location': VARCHAR,
+            'sensor_id': VARCHAR
+        }
+    )
+    GROUP BY store_location, sensor_id, year, month, day
+    HAVING visit_count > 0
+),
+features AS (
+    SELECT
+        *,
+        CAST(isodow(date) - 1 AS INTEGER) AS day_of_week,
+        avg(visit_count) OVER (
+            PARTITION BY store_location, sensor_id, isodow(date)
+            ORDER BY date
+            ROWS BETWEEN 3 PRECEDING AND CURRENT ROW
+        ) AS moving_avg_4
+    FROM daily
+)
+SELECT
+    store_location,
+    sensor_id,
+    date,
+    day_of_week,
+    visit_count,
+    moving_avg_4,
+    CASE
+        WHEN moving_avg_4 = 0 THEN 0
+        ELSE abs(visit_count - moving_avg_4) / moving_avg_4
+    END AS pct_change
+FROM features
+ORDER BY store_location, sensor_id, date
+"""
+
+
+def transform_with_duckdb(raw_dir: str) -> pd.DataFrame:
+    """
+    Runs the whole transform in DuckDB, which scans the raw files on all cores
+    and spills to disk instead of holding the dataset in memory.
+    Returns the same rows and columns as the pandas transform.
+    """
+    raw_dir = os.path.expanduser(raw_dir)
+    files = sorted(glob.glob(partition_glob(raw_dir)))
+    if not files:
+        return pd.DataFrame()
+
+    with duckdb.connect() as con:
+        return con.execute(TRANSFORM_QUERY, {"files": files}).df()
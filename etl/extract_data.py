@@ -1,11 +1,23 @@
+import argparse
+import asyncio
 import logging
 import os
 from datetime import date, timedelta
 from itertools import product
 
-import pandas as pd
+import aiohttp
 import requests
 
+from etl.extract_state import ExtractionState
+from etl.raw_layer import PartitionedParquetSink
+from etl.request_cache import ResponseCache, unique_requests
+from etl.run_report import RunReport, default_report_path
+
+API_URL = "https://data-quality-monitoring-j9nq.onrender.com"
+DATA_DIR = os.path.expanduser("~/data_quality_monitoring/data")
+RAW_DIR = os.path.join(DATA_DIR, "raw")
+REPORTS_DIR = os.path.join(DATA_DIR, "reports")
+
 
 def create_folder():
     """
@@ -32,12 +44,40 @@ def get_data(business_parameter: str) -> tuple[str, int]:
     Returns the response text and status code.
     """
     r = requests.get(
-        "https://data-quality-monitoring-j9nq.onrender.com",
+        API_URL,
         params=business_parameter,
     )
     return r.text, r.status_code
 
 
+async def fetch_data(
+    session: aiohttp.ClientSession,
+    semaphore: asyncio.Semaphore,
+    business_parameter: str,
+    retries: int = 5,
+    backoff: float = 0.5,
+) -> tuple[str, int]:
+    """
+    Async counterpart of get_data on a pooled session.
+    At most as many requests as the semaphore allows are in flight; 5xx responses
+    and timeouts are retried with exponential backoff.
+    Returns the response text and status code.
+    """
+    for attempt in range(retries + 1):
+        try:
+            async with semaphore:
+                async with session.get(API_URL, params=business_parameter) as r:
+                    text, status = await r.text(), r.status
+            if status < 500 or attempt == retries:
+                return text, status
+            logging.warning(f"Status {status} for {business_parameter}, retrying")
+        except asyncio.TimeoutError:
+            if attempt == retries:
+                raise
+            logging.warning(f"Timeout for {business_parameter}, retrying")
+        await asyncio.sleep(backoff * 2**attempt)
+
+
 def get_input() -> tuple[list[str], date, list[str]]:
     store_locations = ["Lille", "Paris", "Lyon", "Bordeaux", "Marseille"]
     sensors = ["A", "B", "C", "D"]
@@ -45,21 +85,46 @@ def get_input() -> tuple[list[str], date, list[str]]:
     return store_locations, business_date, sensors
 
 
-def collect_traffic_data(
+def plan_row(
+    store_location: str, sensor: str, business_date: date, hour: int
+) -> tuple[dict, str | None]:
+    """
+    Builds one hourly data row with the API parameters to fetch its visit_count,
+    or None outside business hours.
+    """
+    sensor_row = {
+        "store_location": store_location,
+        "sensor_id": sensor,
+        "visit_count": 0,
+        "hour": hour,
+        "day": business_date.day,
+        "month": business_date.month,
+        "year": business_date.year,
+    }
+    if hour < 8 or hour > 19:
+        return sensor_row, None
+    params = (
+        f"store_location={store_location}"
+        f"&year={business_date.year}&month={business_date.month}&day={business_date.day}&sensor_id={sensor}"
+    )
+    return sensor_row, params
+
+
+def plan_traffic_rows(
     store_locations: list[str], sensors: list[str], start_date: date
-) -> list[dict]:
+) -> list[tuple[dict, str | None]]:
     """
-    Iterates from start_date to today, hour by hour, collecting traffic data.
-    Returns a list of data rows.
+    Iterates over the previous month, hour by hour, building the data rows.
+    Returns each row with the API parameters to fetch its visit_count,
+    or None outside business hours.
     """
-    data = []
+    plan = []
     current_hour = 0
     # Replace the day with 1 to get the first day of the month
     first_day = start_date.replace(day=1)
     last_day_previous_month = first_day - timedelta(days=1)
     # Retrieve the first day of the previous month
     current_date = last_day_previous_month.replace(day=1)
-    condition = current_date <= last_day_previous_month
     while current_date <= last_day_previous_month:
         current_hour += 1
         if current_hour == 24:
@@ -68,56 +133,363 @@ def collect_traffic_data(
         if current_date > last_day_previous_month:
             break
 
-        if current_hour < 8 or current_hour > 19:
-            for store_location, sensor in product(store_locations, sensors):
-                sensor_row = {
-                    "store_location": store_location,
-                    "sensor_id": sensor,
-                    "visit_count": 0,
-                    "hour": current_hour,
-                    "day": current_date.day,
-                    "month": current_date.month,
-                    "year": current_date.year,
-                }
-                data.append(sensor_row)
+        for store_location, sensor in product(store_locations, sensors):
+            plan.append(plan_row(store_location, sensor, current_date, current_hour))
+    return plan
+
+
+def plan_day_rows(
+    pairs: list[tuple[str, str]], business_date: date
+) -> list[tuple[dict, str | None]]:
+    """Builds the 24 hourly rows of a day for each (store, sensor) pair."""
+    return [
+        plan_row(store_location, sensor, business_date, hour)
+        for hour in range(24)
+        for store_location, sensor in pairs
+    ]
+
+
+def fill_visit_counts(
+    plan: list[tuple[dict, str | None]], responses: dict[str, tuple[str, int]]
+) -> list[dict]:
+    """Fans each API response back out to the hourly rows that need it."""
+    data = []
+    for sensor_row, params in plan:
+        if params:
+            sensor_row["visit_count"], status = responses[params]
+        data.append(sensor_row)
+    return data
+
+
+def response_bytes(responses: dict[str, tuple[str, int]]) -> int:
+    """Size of the bodies of the API responses."""
+    return sum(len(text.encode()) for text, _ in responses.values())
+
+
+def fetch_responses(
+    requests_by_params: dict[str, date], cache: ResponseCache | None = None
+) -> dict[str, tuple[str, int]]:
+    """
+    Fetches each request once, one at a time, skipping the cached ones.
+    Returns the (text, status) of every request.
+    """
+    responses = cache.get_many(requests_by_params) if cache else {}
+    for params, business_date in requests_by_params.items():
+        if params in responses:
+            continue
+        visit_count, status = get_data(business_parameter=params)
+        responses[params] = (visit_count, status)
+        if cache:
+            cache.put(params, business_date, visit_count, status)
+    return responses
+
+
+async def fetch_responses_async(
+    session: aiohttp.ClientSession,
+    semaphore: asyncio.Semaphore,
+    requests_by_params: dict[str, date],
+    cache: ResponseCache | None = None,
+) -> dict[str, tuple[str, int]]:
+    """Same as fetch_responses, with the missing requests fetched concurrently."""
+    responses = cache.get_many(requests_by_params) if cache else {}
+    missing = [params for params in requests_by_params if params not in responses]
+    fetched = await asyncio.gather(
+        *[fetch_data(session, semaphore, params) for params in missing]
+    )
+    for params, (visit_count, status) in zip(missing, fetched):
+        responses[params] = (visit_count, status)
+        if cache:
+            cache.put(params, requests_by_params[params], visit_count, status)
+    return responses
+
+
+def open_session(max_in_flight: int, timeout: float) -> aiohttp.ClientSession:
+    """Pooled keep-alive session holding at most max_in_flight connections."""
+    return aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=max_in_flight),
+        timeout=aiohttp.ClientTimeout(total=timeout),
+    )
+
+
+def collect_traffic_data(
+    store_locations: list[str],
+    sensors: list[str],
+    start_date: date,
+    cache: ResponseCache | None = None,
+) -> list[dict]:
+    """
+    Iterates over the previous month, hour by hour, collecting traffic data
+    with one request at a time. Each (store, sensor, day) is fetched once,
+    and not at all if it is already in the cache.
+    Returns a list of data rows.
+    """
+    plan = plan_traffic_rows(store_locations, sensors, start_date)
+    responses = fetch_responses(unique_requests(plan), cache)
+    return fill_visit_counts(plan, responses)
+
+
+async def collect_traffic_data_async(
+    store_locations: list[str],
+    sensors: list[str],
+    start_date: date,
+    max_in_flight: int = 20,
+    timeout: float = 30,
+    cache: ResponseCache | None = None,
+) -> list[dict]:
+    """
+    Same rows as collect_traffic_data, fetched concurrently over a pooled
+    keep-alive connection with at most max_in_flight requests in flight.
+    """
+    plan = plan_traffic_rows(store_locations, sensors, start_date)
+    semaphore = asyncio.Semaphore(max_in_flight)
+    async with open_session(max_in_flight, timeout) as session:
+        responses = await fetch_responses_async(
+            session, semaphore, unique_requests(plan), cache
+        )
+    return fill_visit_counts(plan, responses)
+
+
+def checkpoint_day(
+    plan: list[tuple[dict, str | None]],
+    responses: dict[str, tuple[str, int]],
+    pairs: list[tuple[str, str]],
+    business_date: date,
+    state: ExtractionState,
+    sink: PartitionedParquetSink,
+    report: RunReport,
+) -> None:
+    """
+    Streams a completed day to the sink and advances the watermarks of its pairs.
+    A day with a failed request is left out, to be fetched again by the next run.
+    """
+    failed = [params for params, (_, status) in responses.items() if status != 200]
+    if failed:
+        logging.error(f"{len(failed)} failed requests on {business_date}, skipping")
+        return
+    with report.stage("write") as stage:
+        rows, size = sink.rows_written, sink.bytes_written
+        sink.write(fill_visit_counts(plan, responses))
+        stage.rows += sink.rows_written - rows
+        stage.bytes_written += sink.bytes_written - size
+    for store_location, sensor in pairs:
+        state.mark(store_location, sensor, business_date)
+    state.save()
+
+
+def missing_pairs(
+    pairs: list[tuple[str, str]], business_date: date, state: ExtractionState
+) -> list[tuple[str, str]]:
+    """Pairs whose day has not been extracted yet."""
+    return [pair for pair in pairs if not state.is_extracted(*pair, business_date)]
+
+
+def extract_days(
+    pairs: list[tuple[str, str]],
+    days: list[date],
+    state: ExtractionState,
+    sink: PartitionedParquetSink,
+    cache: ResponseCache | None = None,
+    report: RunReport | None = None,
+) -> None:
+    """Extracts the missing days one request at a time, checkpointing each day."""
+    report = report or RunReport("extract_data")
+    for business_date in days:
+        todo = missing_pairs(pairs, business_date, state)
+        if not todo:
+            continue
+        plan = plan_day_rows(todo, business_date)
+        with report.stage("fetch") as stage:
+            responses = fetch_responses(unique_requests(plan), cache)
+            stage.rows += len(responses)
+            stage.bytes_read += response_bytes(responses)
+        checkpoint_day(plan, responses, todo, business_date, state, sink, report)
+
+
+async def extract_days_async(
+    pairs: list[tuple[str, str]],
+    days: list[date],
+    state: ExtractionState,
+    sink: PartitionedParquetSink,
+    cache: ResponseCache | None = None,
+    max_in_flight: int = 20,
+    timeout: float = 30,
+    report: RunReport | None = None,
+) -> None:
+    """
+    Extracts the missing days concurrently; each day is checkpointed as soon as
+    all of its requests are complete.
+    """
+    report = report or RunReport("extract_data")
+    semaphore = asyncio.Semaphore(max_in_flight)
+
+    async def extract_day(session, business_date):
+        todo = missing_pairs(pairs, business_date, state)
+        if not todo:
+            return
+        plan = plan_day_rows(todo, business_date)
+        with report.stage("fetch") as stage:
+            responses = await fetch_responses_async(
+                session, semaphore, unique_requests(plan), cache
+            )
+            stage.rows += len(responses)
+            stage.bytes_read += response_bytes(responses)
+        checkpoint_day(plan, responses, todo, business_date, state, sink, report)
+
+    async with open_session(max_in_flight, timeout) as session:
+        await asyncio.gather(*[extract_day(session, day) for day in days])
+
+
+def run_extraction(
+    store_locations: list[str],
+    sensors: list[str],
+    start_date: date,
+    end_date: date,
+    state: ExtractionState,
+    cache: ResponseCache | None = None,
+    raw_dir: str = RAW_DIR,
+    serial: bool = False,
+    max_in_flight: int = 20,
+    chunk_days: int = 31,
+    report: RunReport | None = None,
+) -> None:
+    """
+    Extracts every day from start_date to end_date (inclusive) not yet extracted,
+    in chunks of chunk_days. Each day is streamed to a partitioned sink under
+    raw_dir and progress is saved after it, so memory stays bounded whatever
+    the range and an interrupted run resumes where it stopped.
+    The requests and the writes are measured as the fetch and write stages of report.
+    """
+    report = report or RunReport("extract_data")
+    pairs = list(product(store_locations, sensors))
+    sink = PartitionedParquetSink(raw_dir)
+    chunk_start = start_date
+    while chunk_start <= end_date:
+        chunk_end = min(chunk_start + timedelta(days=chunk_days - 1), end_date)
+        days = [
+            chunk_start + timedelta(days=i)
+            for i in range((chunk_end - chunk_start).days + 1)
+        ]
+        if serial:
+            extract_days(pairs, days, state, sink, cache, report)
         else:
-            for store_location, sensor in product(store_locations, sensors):
-                params = (
-                    f"store_location={store_location}"
-                    f"&year={current_date.year}&month={current_date.month}&day={current_date.day}&sensor_id={sensor}"
+            asyncio.run(
+                extract_days_async(
+                    pairs,
+                    days,
+                    state,
+                    sink,
+                    cache,
+                    max_in_flight=max_in_flight,
+                    report=report,
                 )
-                visit_count, status = get_data(business_parameter=params)
-                sensor_row = {
-                    "store_location": store_location,
-                    "sensor_id": sensor,
-                    "visit_count": visit_count,
-                    "hour": current_hour,
-                    "day": current_date.day,
-                    "month": current_date.month,
-                    "year": current_date.year,
-                }
-                data.append(sensor_row)
-    return data
+            )
+        logging.info(f"Extracted {chunk_start} to {chunk_end}")
+        chunk_start = chunk_end + timedelta(days=1)
 
 
-def save_data_by_month(data: list[dict]):
-    """Groups data by month and saves each group as a separate CSV file."""
-    df = pd.DataFrame(data)
-    grouped = dict(tuple(df.groupby(["year", "month"])))
+def first_missing_day(
+    store_locations: list[str],
+    sensors: list[str],
+    state: ExtractionState,
+    default_start: date,
+) -> date:
+    """Earliest day after the watermarks, default_start for a pair never extracted."""
+    starts = []
+    for store_location, sensor in product(store_locations, sensors):
+        watermark = state.watermark(store_location, sensor)
+        starts.append(watermark + timedelta(days=1) if watermark else default_start)
+    return min(starts)
 
-    for (year, month), group_df in grouped.items():
-        filename = f"~/data_quality_monitoring/data/raw/data_{year}_{month:02}.csv"
-        group_df.to_csv(filename, index=False)
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Extract the traffic days not extracted yet, up to yesterday."
+    )
+    parser.add_argument(
+        "command",
+        nargs="?",
+        default="run",
+        choices=["run", "backfill"],
+        help="run: days after the watermarks; backfill: any historical range.",
+    )
+    parser.add_argument(
+        "--start",
+        type=date.fromisoformat,
+        help="First day to backfill (YYYY-MM-DD).",
+    )
+    parser.add_argument(
+        "--end",
+        type=date.fromisoformat,
+        help="Last day to backfill (YYYY-MM-DD), yesterday by default.",
+    )
+    parser.add_argument(
+        "--chunk-days",
+        type=int,
+        default=31,
+        help="Number of days extracted per chunk.",
+    )
+    parser.add_argument(
+        "--serial",
+        action="store_true",
+        help="Send one request at a time instead of the concurrent async mode.",
+    )
+    parser.add_argument(
+        "--max-in-flight",
+        type=int,
+        default=20,
+        help="Maximum number of concurrent requests in async mode.",
+    )
+    parser.add_argument(
+        "--report",
+        help="JSON file to write the timing and memory report of the run to, "
+        "a new file in data/reports by default.",
+    )
+    args = parser.parse_args()
+    if args.command == "backfill" and args.start is None:
+        parser.error("backfill requires --start")
+    return args
 
 
 def main():
+    args = parse_args()
     create_folder()
     store_location, business_date, sensor_id = get_input()
+    state = ExtractionState(os.path.join(DATA_DIR, "extract_state.json"))
+    cache = ResponseCache(os.path.join(DATA_DIR, "api_cache.sqlite"))
 
-    data = collect_traffic_data(store_location, sensor_id, business_date)
+    end_date = args.end or business_date - timedelta(days=1)
+    if args.command == "backfill":
+        start_date = args.start
+    else:
+        # Without a watermark, start from the first day of the previous month
+        first_day_previous_month = (
+            business_date.replace(day=1) - timedelta(days=1)
+        ).replace(day=1)
+        start_date = first_missing_day(
+            store_location, sensor_id, state, first_day_previous_month
+        )
 
-    if data:
-        save_data_by_month(data)
+    report = RunReport("extract_data", vars(args))
+    try:
+        run_extraction(
+            store_location,
+            sensor_id,
+            start_date,
+            end_date,
+            state,
+            cache=cache,
+            serial=args.serial,
+            max_in_flight=args.max_in_flight,
+            chunk_days=args.chunk_days,
+            report=report,
+        )
+        report.status = "success"
+    except BaseException:
+        report.status = "failed"
+        raise
+    finally:
+        cache.close()
+        report.save(args.report or default_report_path(REPORTS_DIR, "extract_data"))
 
 
 if __name__ == "__main__":
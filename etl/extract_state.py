@@ -0,0 +1,62 @@
+import json
+import os
+from datetime import date, timedelta
+
+
+class ExtractionState:
+    """
+    Days already extracted for each (store, sensor), persisted as a JSON file of
+    merged [start, end] day ranges. The end of the first range is the pair's
+    watermark: every day from its first extracted day up to it is on disk.
+    Later ranges come from days completed out of order or from backfills.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.ranges = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                for key, ranges in json.load(f).items():
+                    self.ranges[key] = [
+                        [date.fromisoformat(start), date.fromisoformat(end)]
+                        for start, end in ranges
+                    ]
+
+    @staticmethod
+    def key(store_location: str, sensor_id: str) -> str:
+        return f"{store_location}|{sensor_id}"
+
+    def is_extracted(self, store_location: str, sensor_id: str, day: date) -> bool:
+        """Whether the day was already extracted for the pair."""
+        return any(
+            start <= day <= end
+            for start, end in self.ranges.get(self.key(store_location, sensor_id), [])
+        )
+
+    def watermark(self, store_location: str, sensor_id: str) -> date | None:
+        """Last day of the pair's first extracted range, or None if nothing was extracted."""
+        ranges = self.ranges.get(self.key(store_location, sensor_id))
+        return ranges[0][1] if ranges else None
+
+    def mark(self, store_location: str, sensor_id: str, day: date) -> None:
+        """Records the day as extracted for the pair, merging adjacent ranges."""
+        ranges = sorted(
+            self.ranges.get(self.key(store_location, sensor_id), []) + [[day, day]]
+        )
+        merged = [ranges[0]]
+        for start, end in ranges[1:]:
+            if start <= merged[-1][1] + timedelta(days=1):
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        self.ranges[self.key(store_location, sensor_id)] = merged
+
+    def save(self) -> None:
+        """Writes the state atomically, so a crash never leaves a partial file."""
+        content = {
+            key: [[start.isoformat(), end.isoformat()] for start, end in ranges]
+            for key, ranges in self.ranges.items()
+        }
+        with open(self.path + ".tmp", "w") as f:
+            json.dump(content, f, indent=2)
+        os.replace(self.path + ".tmp", self.path)
@@ -0,0 +1,179 @@
+import argparse
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+import numpy as np
+import pyarrow as pa
+
+from etl.extract_data import RAW_DIR
+from etl.raw_layer import PartitionedParquetSink
+from etl.schema import RAW_FILE_SCHEMA
+from src.sensor import date_range
+from src.store import StoreSensor
+
+# The extractor writes the 24 hours of each day, and the API count of the day
+# at every business hour
+HOURS = np.arange(24, dtype=np.int8)
+BUSINESS_HOURS = (HOURS >= 8) & (HOURS <= 19)
+SENSOR_IDS = ["A", "B", "C", "D"]
+
+
+def store_name(index: int) -> str:
+    return f"store_{index:04}"
+
+
+def make_store(
+    index: int, perc_break: float, perc_malfunction: float, seed: int = 0
+) -> StoreSensor:
+    """
+    A simulated store whose average traffic is drawn from (seed, index), with
+    the given fault rates on every sensor.
+    """
+    rng = np.random.default_rng([seed, index])
+    avg_visit = int(rng.integers(1500, 8000))
+    std_visit = int(avg_visit * rng.uniform(0.05, 0.2))
+    store = StoreSensor(store_name(index), avg_visit, std_visit)
+    for sensor in store.sensors.values():
+        sensor.perc_break = perc_break
+        sensor.perc_malfunction = perc_malfunction
+    return store
+
+
+def month_tables(dates: np.ndarray, counts: np.ndarray):
+    """
+    Yields the (year, month, table) of each month of a sensor's daily counts,
+    with the 24 hourly rows the extractor writes per day.
+    """
+    months = dates.astype("datetime64[M]")
+    day_of_month = ((dates - months).astype(np.int64) + 1).astype(np.int8)
+    hourly = np.where(BUSINESS_HOURS, counts[:, None], 0).astype(np.int32)
+    starts = np.flatnonzero(np.r_[True, months[1:] != months[:-1]])
+    for start, end in zip(starts, np.r_[starts[1:], len(dates)]):
+        month = int(months[start].astype(np.int64))
+        table = pa.Table.from_arrays(
+            [
+                pa.array(hourly[start:end].ravel()),
+                pa.array(np.tile(HOURS, end - start)),
+                pa.array(np.repeat(day_of_month[start:end], len(HOURS))),
+            ],
+            schema=RAW_FILE_SCHEMA,
+        )
+        yield 1970 + month // 12, month % 12 + 1, table
+
+
+def write_store(
+    raw_dir: str,
+    index: int,
+    sensors: list[str],
+    start_date: date,
+    end_date: date,
+    perc_break: float,
+    perc_malfunction: float,
+    seed: int = 0,
+) -> tuple[int, int]:
+    """
+    Simulates every day of a store's sensors with one vectorized call each, then
+    writes one raw file per (sensor, month), as the extractor does.
+    Returns the numbers of rows and bytes written.
+    """
+    store = make_store(index, perc_break, perc_malfunction, seed)
+    sink = PartitionedParquetSink(raw_dir)
+    dates = date_range(start_date, end_date)
+    for sensor_id in sensors:
+        counts, _, _ = store.sensors[sensor_id].get_visit_counts(dates)
+        for year, month, table in month_tables(dates, counts):
+            sink.write_table(store.name, sensor_id, year, month, table)
+    return sink.rows_written, sink.bytes_written
+
+
+def generate(
+    raw_dir: str,
+    n_stores: int,
+    sensors: list[str],
+    start_date: date,
+    end_date: date,
+    perc_break: float = 0.015,
+    perc_malfunction: float = 0.035,
+    seed: int = 0,
+    workers: int | None = None,
+) -> tuple[int, int]:
+    """
+    Writes the raw data of n_stores simulated stores from start_date to end_date
+    (inclusive), one store per task on a pool of worker processes.
+    Returns the numbers of rows and bytes written.
+    """
+    started = time.perf_counter()
+    rows = bytes_written = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(
+                write_store,
+                raw_dir,
+                index,
+                sensors,
+                start_date,
+                end_date,
+                perc_break,
+                perc_malfunction,
+                seed,
+            )
+            for index in range(n_stores)
+        ]
+        for done, future in enumerate(futures, start=1):
+            store_rows, store_bytes = future.result()
+            rows += store_rows
+            bytes_written += store_bytes
+            if done % max(1, n_stores // 20) == 0 or done == n_stores:
+                elapsed = time.perf_counter() - started
+                logging.info(
+                    f"{done}/{n_stores} stores, {rows:,} rows in {elapsed:.1f}s "
+                    f"({rows / elapsed:,.0f} rows/s)"
+                )
+    return rows, bytes_written
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Generate simulated raw data in the layout of the extractor."
+    )
+    parser.add_argument("--stores", type=int, default=500)
+    parser.add_argument(
+        "--sensors", nargs="+", choices=SENSOR_IDS, default=SENSOR_IDS
+    )
+    parser.add_argument("--start", type=date.fromisoformat, default=date(2020, 1, 1))
+    parser.add_argument("--end", type=date.fromisoformat, default=date(2024, 12, 31))
+    parser.add_argument("--perc-break", type=float, default=0.015)
+    parser.add_argument("--perc-malfunction", type=float, default=0.035)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--workers", type=int, default=None, help="processes (default: every core)"
+    )
+    parser.add_argument("--output", default=RAW_DIR, help="raw data directory")
+    args = parser.parse_args(argv)
+    if args.end < args.start:
+        parser.error("--end is before --start")
+    return args
+
+
+def main(argv: list[str] | None = None):
+    args = parse_args(argv)
+    rows, bytes_written = generate(
+        os.path.expanduser(args.output),
+        args.stores,
+        args.sensors,
+        args.start,
+        args.end,
+        args.perc_break,
+        args.perc_malfunction,
+        args.seed,
+        args.workers,
+    )
+    print(f"Wrote {rows:,} rows ({bytes_written / 2**20:,.1f} MiB) to {args.output}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,178 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from etl.schema import PROCESSED_SCHEMA, to_pandas, to_processed_table
+
+# File system timestamps can lag the clock; rereading a file is harmless
+MTIME_SLACK_NS = 1_000_000_000
+# The moving average covers a day and the WINDOW - 1 previous same weekdays
+WINDOW = 4
+DAY_KEYS = ["store_location", "sensor_id", "date"]
+GROUP_KEYS = ["store_location", "sensor_id", "day_of_week"]
+PROCESSED_COLUMNS = PROCESSED_SCHEMA.names
+# Footer metadata of the processed file: a content hash of each month, so the
+# dashboard refresh only reads and compares the months that changed
+MONTH_HASHES_KEY = b"month_hashes"
+
+
+class TransformState:
+    """
+    Time of the last transform run, persisted as a JSON file next to the
+    processed dataset. Raw files written after it hold new days or late
+    corrections, and are the only ones an incremental run reads.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.last_run_ns = None
+        if os.path.exists(path):
+            with open(path) as f:
+                self.last_run_ns = json.load(f)["last_run_ns"]
+
+    def save(self, started_ns: int) -> None:
+        """
+        Records the start of a successful run, atomically. The slack makes the
+        next run reread the files written around the start, as the upsert is
+        idempotent.
+        """
+        last_run_ns = started_ns - MTIME_SLACK_NS
+        with open(self.path + ".tmp", "w") as f:
+            json.dump({"last_run_ns": last_run_ns}, f)
+        os.replace(self.path + ".tmp", self.path)
+        self.last_run_ns = last_run_ns
+
+
+def read_processed(path: str) -> pd.DataFrame:
+    """
+    Reads the processed dataset, or an empty one on the first run, ordered by
+    store, sensor and date.
+    """
+    if not os.path.exists(path):
+        return to_pandas(PROCESSED_SCHEMA.empty_table())
+    df = to_pandas(pq.read_table(path, schema=PROCESSED_SCHEMA))
+    # The file is ordered by date, in one row group per month (write_processed)
+    return df.sort_values(
+        ["store_location", "sensor_id", "date"], ignore_index=True, kind="stable"
+    )
+
+
+def month_hashes(table) -> tuple[np.ndarray, dict[str, str]]:
+    """
+    Start row of each month of a table sorted by date, and a hash of the rows
+    of each month ("YYYY-MM"). Row hashes are summed, so the hash does not
+    depend on the order of the rows within the month.
+    """
+    if table.num_rows == 0:
+        return np.empty(0, dtype=np.int64), {}
+    months = table["date"].to_numpy().astype("datetime64[M]")
+    starts = np.flatnonzero(np.r_[True, months[1:] != months[:-1]])
+    row_hashes = pd.util.hash_pandas_object(to_pandas(table), index=False).to_numpy()
+    sums = np.add.reduceat(row_hashes, starts)
+    counts = np.diff(np.r_[starts, len(months)])
+    hashes = {
+        str(months[start]): f"{count}:{total:016x}"
+        for start, count, total in zip(starts, counts, sums)
+    }
+    return starts, hashes
+
+
+def write_processed(df: pd.DataFrame, path: str) -> None:
+    """
+    Replaces the processed dataset atomically, so readers never see a partial
+    file. The file always follows PROCESSED_SCHEMA, whatever the engine.
+    Rows are ordered by date with one row group per month, and the footer holds
+    the hash of each month (MONTH_HASHES_KEY).
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    table = to_processed_table(df)
+    table = table.take(pc.sort_indices(table, [("date", "ascending")]))
+    starts, hashes = month_hashes(table)
+    schema = table.schema.with_metadata(
+        {**(table.schema.metadata or {}), MONTH_HASHES_KEY: json.dumps(hashes)}
+    )
+    with pq.ParquetWriter(path + ".tmp", schema) as writer:
+        if table.num_rows == 0:
+            writer.write_table(table.cast(schema))
+        for start, end in zip(starts, np.r_[starts[1:], table.num_rows]):
+            writer.write_table(table.slice(start, end - start).cast(schema))
+    os.replace(path + ".tmp", path)
+
+
+def upsert_daily_visits(
+    processed: pd.DataFrame, df_day: pd.DataFrame, changed_days: pd.DataFrame
+) -> pd.DataFrame:
+    """
+    Merges freshly aggregated days into the processed dataset.
+    changed_days lists every (store, sensor, date) read from the raw files, including
+    the days dropped by the aggregation: their old rows are replaced by df_day.
+    Within each (store, sensor, weekday) series, only the rows whose window holds a
+    changed day are recomputed, using the WINDOW - 1 previous rows as seed; the
+    other rows keep their stored features.
+    """
+    changed_days = changed_days[DAY_KEYS].drop_duplicates()
+    # Stored dates may come back with another resolution than fresh ones
+    processed = processed.assign(
+        date=processed["date"].astype(changed_days["date"].dtype)
+    )
+
+    stale = processed.set_index(DAY_KEYS).index.isin(
+        changed_days.set_index(DAY_KEYS).index
+    )
+    combined = pd.concat(
+        [processed[~stale], df_day[DAY_KEYS + ["visit_count"]]], ignore_index=True
+    ).astype({"visit_count": "int64", "moving_avg_4": float, "pct_change": float})
+    if combined.empty:
+        return combined[PROCESSED_COLUMNS]
+    combined["day_of_week"] = combined["date"].dt.dayofweek
+    combined = combined.sort_values(GROUP_KEYS + ["date"], ignore_index=True)
+
+    # First and last changed date of each series
+    bounds = (
+        changed_days.assign(day_of_week=changed_days["date"].dt.dayofweek)
+        .groupby(GROUP_KEYS)["date"]
+        .agg(first_changed="min", last_changed="max")
+    )
+    combined = combined.join(bounds, on=GROUP_KEYS)
+    position = combined.groupby(GROUP_KEYS, sort=False).cumcount()
+    series = [combined[key] for key in GROUP_KEYS]
+
+    # Recompute from the first row on or after the first changed date, to the
+    # WINDOW - 1 rows following the last changed date (a dropped day at -1)
+    start = (
+        position.where(combined["date"] >= combined["first_changed"])
+        .groupby(series, sort=False)
+        .transform("min")
+    )
+    last = (
+        position.where(combined["date"] <= combined["last_changed"])
+        .groupby(series, sort=False)
+        .transform("max")
+    )
+    end = last.fillna(-1) + WINDOW - 1
+
+    window = (position >= start - (WINDOW - 1)) & (position <= end)
+    recompute = window & (position >= start)
+    if recompute.any():
+        moving_avg = (
+            combined[window]
+            .groupby(GROUP_KEYS, sort=False)["visit_count"]
+            .rolling(window=WINDOW, min_periods=1)
+            .mean()
+            .reset_index(level=[0, 1, 2], drop=True)
+        )
+        combined.loc[recompute, "moving_avg_4"] = moving_avg[recompute[recompute].index]
+
+        # Columnar |visit - avg| / avg, with 0 where the average is 0
+        visit_count = combined.loc[recompute, "visit_count"]
+        moving_avg = combined.loc[recompute, "moving_avg_4"]
+        combined.loc[recompute, "pct_change"] = (
+            (visit_count - moving_avg).abs().div(moving_avg).where(moving_avg != 0, 0)
+        )
+
+    combined = combined.sort_values(DAY_KEYS, ignore_index=True)
+    return combined[PROCESSED_COLUMNS]
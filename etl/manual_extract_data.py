@@ -5,6 +5,9 @@ from datetime import date, datetime, timedelta
 import pandas as pd
 import requests
 
+from etl.raw_layer import PartitionedParquetSink
+from etl.request_cache import ResponseCache, unique_requests
+
 
 def create_folder():
     """
@@ -53,14 +56,15 @@ def is_valid_sensor(sensor_id: str) -> bool:
     return sensor_id in ["A", "B", "C", "D"]
 
 
-def collect_traffic_data(
+def plan_traffic_rows(
     store_location: str, sensor_id: str, start_date: date
-) -> list[dict]:
+) -> list[tuple[dict, str | None]]:
     """
-    Iterates from start_date to today, hour by hour, collecting traffic data.
-    Returns a list of data rows.
+    Iterates from start_date to today, hour by hour, building the data rows.
+    Returns each row with the API parameters to fetch its visit_count,
+    or None outside business hours.
     """
-    data = []
+    plan = []
     current_date = start_date
     current_hour = 0
 
@@ -72,48 +76,97 @@ def collect_traffic_data(
             current_hour = 0
 
         if current_hour < 8 or current_hour > 19:
-            visit_count = 0
+            params = None
         elif is_valid_sensor(sensor_id):
             params = (
                 f"store_location={store_location}"
                 f"&year={current_date.year}&month={current_date.month}&day={current_date.day}&sensor_id={sensor_id}"
             )
-            visit_count, status = get_data(business_parameter=params)
         else:
             params = (
                 f"store_location={store_location}"
                 f"&year={current_date.year}&month={current_date.month}&day={current_date.day}"
             )
-            visit_count, status = get_data(business_parameter=params)
-
-            if status == 404:
-                print("\nThe specified store location could not be found.")
-                return []
 
         row = {
             "store_location": store_location,
-            "visit_count": visit_count,
+            "visit_count": 0,
             "hour": current_hour,
             "day": current_date.day,
             "month": current_date.month,
             "year": current_date.year,
         }
+        plan.append((row, params))
+
+    return plan
+
+
+def collect_traffic_data(
+    store_location: str,
+    sensor_id: str,
+    start_date: date,
+    cache: ResponseCache | None = None,
+) -> list[dict]:
+    """
+    Iterates from start_date to today, hour by hour, collecting traffic data.
+    Each day is fetched once, and not at all if it is already in the cache.
+    Returns a list of data rows.
+    """
+    plan = plan_traffic_rows(store_location, sensor_id, start_date)
+    requests_by_params = unique_requests(plan)
+    responses = cache.get_many(requests_by_params) if cache else {}
+
+    for params, business_date in requests_by_params.items():
+        if params in responses:
+            continue
+        visit_count, status = get_data(business_parameter=params)
+
+        if status == 404 and not is_valid_sensor(sensor_id):
+            print("\nThe specified store location could not be found.")
+            return []
+
+        responses[params] = (visit_count, status)
+        if cache:
+            cache.put(params, business_date, visit_count, status)
+
+    # A day with a failed request is left out, as extract_data does
+    failed = {
+        business_date
+        for params, business_date in requests_by_params.items()
+        if responses[params][1] != 200
+    }
+    if failed:
+        logging.error(f"{len(failed)} days with failed requests, skipping them")
+
+    data = []
+    for row, params in plan:
+        if date(row["year"], row["month"], row["day"]) in failed:
+            continue
+        if params:
+            row["visit_count"], status = responses[params]
         data.append(row)
 
     return data
 
 
 def save_data_by_month(data: list[dict], store_location: str, sensor_id: str):
-    """Groups data by month and saves each group as a separate CSV file."""
+    """
+    Saves sensor data into the partitioned Parquet raw dataset, one day at a time.
+    Whole-store traffic, which has no sensor partition, is grouped by month and
+    saved as separate CSV files.
+    """
     df = pd.DataFrame(data)
-    grouped = dict(tuple(df.groupby(["year", "month"])))
 
-    for (year, month), group_df in grouped.items():
-        if is_valid_sensor(sensor_id):
-            filename = f"data/raw/data_{store_location}_{year}_{month:02}_sensor{sensor_id}.csv"
-        else:
-            filename = f"data/raw/data_{store_location}_{year}_{month:02}.csv"
+    if is_valid_sensor(sensor_id):
+        df["sensor_id"] = sensor_id
+        sink = PartitionedParquetSink("data/raw")
+        for _, day_df in df.groupby(["year", "month", "day"]):
+            sink.write(day_df.to_dict("records"))
+        return
 
+    grouped = dict(tuple(df.groupby(["year", "month"])))
+    for (year, month), group_df in grouped.items():
+        filename = f"data/raw/data_{store_location}_{year}_{month:02}.csv"
         group_df.to_csv(filename, index=False)
 
 
@@ -124,7 +177,9 @@ def main():
     if sensor_id and not is_valid_sensor(sensor_id):
         print("Sensor ID not selected or is invalid; returning all traffic by default.")
 
-    data = collect_traffic_data(store_location, sensor_id, business_date)
+    cache = ResponseCache("data/api_cache.sqlite")
+    data = collect_traffic_data(store_location, sensor_id, business_date, cache=cache)
+    cache.close()
 
     if data:
         save_data_by_month(data, store_location, sensor_id)
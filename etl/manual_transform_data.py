@@ -1,28 +1,45 @@
-import glob
+import argparse
+import logging
 import os
+import time
 
+import numpy as np
 import pandas as pd
 
+from etl.duckdb_transform import transform_with_duckdb
+from etl.incremental_transform import (TransformState, read_processed,
+                                       upsert_daily_visits, write_processed)
+from etl.raw_layer import read_raw
+from etl.schema import log_memory
 
-def load_sensor_data(path: str = "data/raw/") -> pd.DataFrame:
+RAW_PATH = "data/raw/"
+PROCESSED_PATH = "data/processed/data.parquet"
+STATE_PATH = os.path.join(os.path.dirname(PROCESSED_PATH), "transform_state.json")
+
+# Columns needed by the transform: the hour is summed away
+RAW_COLUMNS = ["store_location", "sensor_id", "year", "month", "day", "visit_count"]
+
+
+def load_sensor_data(
+    path: str = RAW_PATH,
+    year: int | None = None,
+    month: int | None = None,
+    store_location: str | None = None,
+    modified_after_ns: int | None = None,
+) -> pd.DataFrame:
     """
-    Loads and combines CSV files for multiple sensors into a single DataFrame.
+    Loads the sensor data of the raw Parquet dataset into a single DataFrame,
+    with numeric visit counts. Only the needed columns are read, and only the
+    files of the requested year, month and store partitions are touched. With
+    modified_after_ns, only the files written since then are read.
     """
-    sensors = ["A", "B", "C", "D"]
-    all_sensors_data = []
-
-    for i in sensors:
-        csv_files = glob.glob(os.path.join(path, f"*_sensor{i}.csv"))
-        if not csv_files:
-            continue
-        sensor_data = pd.concat(map(pd.read_csv, csv_files))
-        sensor_data["sensor_id"] = i
-        all_sensors_data.append(sensor_data)
-
-    return (
-        pd.concat(all_sensors_data, ignore_index=True)
-        if all_sensors_data
-        else pd.DataFrame()
+    return read_raw(
+        path,
+        columns=RAW_COLUMNS,
+        year=year,
+        month=month,
+        store_location=store_location,
+        modified_after_ns=modified_after_ns,
     )
 
 
@@ -32,7 +49,10 @@ def prepare_date_column(df: pd.DataFrame) -> pd.DataFrame:
     """
     if df.empty:
         return df
-    df["date"] = pd.to_datetime(dict(year=df.year, month=df.month, day=df.day))
+    # Months since 1970 plus days, without parsing each row
+    year, month, day = (df[c].to_numpy(np.int64) for c in ["year", "month", "day"])
+    months = ((year - 1970) * 12 + month - 1).astype("datetime64[M]")
+    df["date"] = (months.astype("datetime64[D]") + (day - 1)).astype("datetime64[us]")
     return df
 
 
@@ -66,19 +86,16 @@ def add_moving_average_and_change(df_day: pd.DataFrame) -> pd.DataFrame:
     if df_day.empty:
         return df_day
     df_day["moving_avg_4"] = (
-        df_day.groupby(by=["day_of_week", "sensor_id"])["visit_count"]
+        df_day.groupby(by=["store_location", "sensor_id", "day_of_week"])["visit_count"]
         .rolling(window=4, min_periods=1)
         .mean()
-        .reset_index(level=[0, 1], drop=True)
+        .reset_index(level=[0, 1, 2], drop=True)
     )
 
-    df_day["pct_change"] = df_day.apply(
-        lambda x: (
-            abs(x["visit_count"] - x["moving_avg_4"]) / x["moving_avg_4"]
-            if x["moving_avg_4"] != 0
-            else 0
-        ),
-        axis=1,
+    # Columnar |visit - avg| / avg, with 0 where the average is 0
+    moving_avg = df_day["moving_avg_4"]
+    df_day["pct_change"] = (
+        (df_day["visit_count"] - moving_avg).abs().div(moving_avg).where(moving_avg != 0, 0)
     )
     return df_day[
         [
@@ -93,19 +110,60 @@ def add_moving_average_and_change(df_day: pd.DataFrame) -> pd.DataFrame:
     ]
 
 
-def main():
-    df = load_sensor_data()
-    if not df.empty:
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Transform the raw visit data.")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="only read the raw files written since the last run and update "
+        "the affected rows of the processed dataset",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=["pandas", "duckdb"],
+        default="pandas",
+        help="duckdb runs the full transform in SQL, multi-threaded and out-of-core",
+    )
+    args = parser.parse_args(argv)
+    if args.incremental and args.engine == "duckdb":
+        parser.error("--incremental is only supported by the pandas engine")
+    return args
+
+
+def main(argv: list[str] | None = None):
+    args = parse_args(argv)
+    state = TransformState(STATE_PATH)
+    started_ns = time.time_ns()
+    if args.engine == "duckdb":
+        df_day = transform_with_duckdb(RAW_PATH)
+    else:
+        if args.incremental:
+            df = load_sensor_data(modified_after_ns=state.last_run_ns)
+        else:
+            df = load_sensor_data()
+        log_memory("load", df)
         df = prepare_date_column(df)
         df_day = aggregate_daily_visits(df)
-        df_day = add_moving_average_and_change(df_day)
+        log_memory("aggregate", df_day)
+        if args.incremental and not df.empty:
+            df_day = upsert_daily_visits(
+                read_processed(PROCESSED_PATH),
+                df_day,
+                df[["store_location", "sensor_id", "date"]],
+            )
+        elif not args.incremental:
+            df_day = add_moving_average_and_change(df_day)
+        log_memory("features", df_day)
+
+    if not df_day.empty:
         print(df_day.sort_values(by="date"))
-        df_day.to_parquet(
-            path="data/processed/data.parquet", index=False
-        )
+        write_processed(df_day, PROCESSED_PATH)
+        state.save(started_ns)
     else:
         print("Input DataFrame is empty — skipping processing.")
 
 
 if __name__ == "__main__":
+    # Shows the raw read throughput
+    logging.basicConfig(level=logging.INFO)
     main()
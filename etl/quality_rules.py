@@ -0,0 +1,284 @@
+import argparse
+import json
+import logging
+import os
+import time
+
+import duckdb
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from etl.incremental_transform import MTIME_SLACK_NS, read_processed
+from etl.raw_layer import raw_files
+from etl.schema import FLAGS_SCHEMA
+from etl.transform_data import PROCESSED_PATH, RAW_PATH
+
+FLAGS_PATH = os.path.join(os.path.dirname(PROCESSED_PATH), "flags.parquet")
+# Dropped raw days of the previous run, next to the processed data
+DROPPED_DAYS_FILE = "dropped_days.parquet"
+# Schema metadata key of the dropped days file: raw files written after it are scanned
+LAST_RUN_KEY = b"last_run_ns"
+
+# Checks run when no configuration is given, with their parameters
+DEFAULT_RULES = {
+    # Broken sensors report -1 every hour
+    "negative_reading": {},
+    # |visits - moving average| / moving average above threshold; a malfunction
+    # dividing the visits by 5 gives about 0.75
+    "pct_change_exceeded": {"threshold": 0.5},
+    # Days absent from a sensor's series, except the days the stores are closed
+    "missing_day": {"closed_weekdays": [6]},
+    # A sensor's share of its store's daily visits moving away from its usual
+    # (median) share by more than max_deviation of that share, on the days
+    # every sensor of the store has visits
+    "sensor_split": {"max_deviation": 0.5},
+}
+
+# Raw days summing to 0 or less, which the transform drops: breaks and Sundays
+SELECT_DROPPED_DAYS_QUERY = """
+SELECT
+    store_location,
+    sensor_id,
+    CAST(make_date(year, month, day) AS TIMESTAMP) AS date,
+    CAST(sum(visit_count) AS INTEGER) AS visit_count
+FROM read_parquet(
+    $files,
+    hive_partitioning = true,
+    hive_types = {
+        'year': INTEGER,
+        'month': INTEGER,
+        'store_location': VARCHAR,
+        'sensor_id': VARCHAR
+    }
+)
+GROUP BY store_location, sensor_id, year, month, day
+HAVING sum(visit_count) <= 0
+"""
+
+
+def complete_days(df: pd.DataFrame) -> tuple[pd.DataFrame, np.ndarray]:
+    """
+    Every day between the first and last date of each (store, sensor) series,
+    with the columns of df where the day exists. Also returns a mask of the
+    days df lacks. Built with positions in a grid instead of a merge.
+    """
+    df = df.sort_values(["store_location", "sensor_id", "date"], ignore_index=True)
+    days = df["date"].to_numpy("datetime64[D]").astype(np.int64)
+    series = df.groupby(["store_location", "sensor_id"], sort=False).ngroup().to_numpy()
+    starts = np.flatnonzero(np.diff(series, prepend=-1))
+    first = days[starts]
+    lengths = days[np.append(starts[1:], len(df)) - 1] - first + 1
+    offsets = np.cumsum(lengths) - lengths
+
+    # Position of each row in the grid, and series and day of each grid cell
+    n_days = int(lengths.sum())
+    positions = offsets[series] + days - first[series]
+    grid_series = np.repeat(np.arange(len(starts)), lengths)
+    grid_days = first[grid_series] + np.arange(n_days) - offsets[grid_series]
+
+    present = np.zeros(n_days, dtype=bool)
+    present[positions] = True
+    full = pd.DataFrame(
+        {
+            "store_location": df["store_location"].to_numpy()[starts][grid_series],
+            "sensor_id": df["sensor_id"].to_numpy()[starts][grid_series],
+            "date": grid_days.astype("datetime64[D]").astype("datetime64[us]"),
+        }
+    )
+    for column in ["visit_count", "pct_change"]:
+        values = np.full(n_days, np.nan)
+        values[positions] = df[column].to_numpy(dtype=float, na_value=np.nan)
+        full[column] = values
+    return full, ~present
+
+
+def negative_reading(df: pd.DataFrame, missing: np.ndarray) -> np.ndarray:
+    return (df["visit_count"] < 0).to_numpy()
+
+
+def pct_change_exceeded(
+    df: pd.DataFrame, missing: np.ndarray, threshold: float
+) -> np.ndarray:
+    return (df["pct_change"] > threshold).to_numpy()
+
+
+def missing_day(
+    df: pd.DataFrame, missing: np.ndarray, closed_weekdays: list[int]
+) -> np.ndarray:
+    weekday = df["date"].dt.dayofweek.to_numpy()
+    return missing & ~np.isin(weekday, closed_weekdays)
+
+
+def sensor_split(
+    df: pd.DataFrame, missing: np.ndarray, max_deviation: float
+) -> np.ndarray:
+    visits = df["visit_count"].where(df["visit_count"] > 0)
+    store_days = visits.groupby([df["store_location"], df["date"]])
+    # The split is only judged on the days every sensor of the store counted
+    complete = store_days.transform("count") == store_days.transform("size")
+    share = (visits / store_days.transform("sum")).where(complete)
+    usual = share.groupby([df["store_location"], df["sensor_id"]]).transform("median")
+    return ((share - usual).abs() > max_deviation * usual).to_numpy()
+
+
+# Checks by name: each returns a boolean mask over the completed days
+RULES = {
+    "negative_reading": negative_reading,
+    "pct_change_exceeded": pct_change_exceeded,
+    "missing_day": missing_day,
+    "sensor_split": sensor_split,
+}
+
+
+def evaluate(df: pd.DataFrame, rules: dict | None = None) -> pd.DataFrame:
+    """
+    Runs the configured checks over daily visits (store_location, sensor_id,
+    date, visit_count, pct_change) in one pass of column operations.
+    Returns a row per completed day with a boolean column per check, and
+    flagged when any check fails.
+    """
+    rules = DEFAULT_RULES if rules is None else rules
+    unknown = set(rules) - set(RULES)
+    if unknown:
+        raise ValueError(f"Unknown checks: {sorted(unknown)}")
+
+    df = df[["store_location", "sensor_id", "date", "visit_count", "pct_change"]]
+    if df.empty:
+        return pd.DataFrame(columns=FLAGS_SCHEMA.names)
+    flags, missing = complete_days(df)
+    for name, params in rules.items():
+        flags[name] = RULES[name](flags, missing, **params)
+    flags["flagged"] = flags[list(rules)].any(axis=1)
+    return flags
+
+
+def raw_partition(raw_dir: str, path: str) -> tuple[str, str, int, int]:
+    """(store, sensor, year, month) partition of a raw file."""
+    values = dict(
+        part.split("=", 1)
+        for part in os.path.relpath(os.path.dirname(path), raw_dir).split(os.sep)
+    )
+    return (
+        values["store_location"],
+        values["sensor_id"],
+        int(values["year"]),
+        int(values["month"]),
+    )
+
+
+def load_dropped_days(raw_dir: str, cache_path: str) -> pd.DataFrame:
+    """
+    The raw days summing to 0 or less. They are kept in cache_path with the time
+    of the run, and only the partitions with a file written since are scanned
+    again; the days of deleted partitions are dropped.
+    """
+    started_ns = time.time_ns()
+    partitions = {path: raw_partition(raw_dir, path) for path in raw_files(raw_dir)}
+    if not partitions:
+        return pd.DataFrame()
+    cached, last_run_ns = None, None
+    if os.path.exists(cache_path):
+        table = pq.read_table(cache_path)
+        cached = table.to_pandas()
+        last_run_ns = int(table.schema.metadata[LAST_RUN_KEY])
+    changed = {
+        partition
+        for path, partition in partitions.items()
+        if last_run_ns is None or os.stat(path).st_mtime_ns > last_run_ns
+    }
+    files = [path for path, partition in partitions.items() if partition in changed]
+
+    frames = []
+    if cached is not None:
+        existing = set(partitions.values()) - changed
+        keys = zip(
+            cached["store_location"],
+            cached["sensor_id"],
+            cached["date"].dt.year,
+            cached["date"].dt.month,
+        )
+        frames.append(cached[[key in existing for key in keys]])
+    if files:
+        with duckdb.connect() as con:
+            frames.append(con.execute(SELECT_DROPPED_DAYS_QUERY, {"files": files}).df())
+    dropped = pd.concat(frames, ignore_index=True)
+
+    if cached is None or files or len(dropped) != len(cached):
+        table = pa.Table.from_pandas(dropped, preserve_index=False)
+        table = table.replace_schema_metadata(
+            {LAST_RUN_KEY: str(started_ns - MTIME_SLACK_NS)}
+        )
+        os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+        pq.write_table(table, cache_path + ".tmp")
+        os.replace(cache_path + ".tmp", cache_path)
+    return dropped
+
+
+def load_daily_visits(
+    processed_path: str = PROCESSED_PATH, raw_dir: str = RAW_PATH
+) -> pd.DataFrame:
+    """
+    The processed daily visits, plus the raw days the transform drops because
+    they sum to 0 or less, so that breaks are seen as negative readings.
+    The dropped days are cached next to the processed data (load_dropped_days).
+    """
+    processed = read_processed(processed_path)
+    processed = processed.astype({"store_location": str, "sensor_id": str})
+    dropped = load_dropped_days(
+        os.path.expanduser(raw_dir),
+        os.path.join(os.path.dirname(processed_path), DROPPED_DAYS_FILE),
+    )
+    if dropped.empty:
+        return processed
+    return pd.concat([processed, dropped.assign(pct_change=np.nan)], ignore_index=True)
+
+
+def write_flags(flags: pd.DataFrame, path: str = FLAGS_PATH) -> None:
+    """
+    Writes the flags table with FLAGS_SCHEMA, replacing the file atomically.
+    The checks that were not run are written as False.
+    """
+    table = pa.Table.from_pandas(
+        flags.reindex(columns=FLAGS_SCHEMA.names, fill_value=False),
+        schema=FLAGS_SCHEMA,
+        preserve_index=False,
+    )
+    tmp_path = path + ".tmp"
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Flag data quality issues in the processed visits."
+    )
+    parser.add_argument(
+        "--rules",
+        help="JSON file mapping the checks to run to their parameters "
+        "(default: every check with its default parameters)",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None):
+    args = parse_args(argv)
+    rules = DEFAULT_RULES
+    if args.rules:
+        with open(args.rules) as f:
+            rules = json.load(f)
+
+    df = load_daily_visits()
+    started = time.perf_counter()
+    flags = evaluate(df, rules)
+    logging.info(
+        f"Checked {len(flags)} days in {time.perf_counter() - started:.2f}s: "
+        + ", ".join(f"{name} {int(flags[name].sum())}" for name in rules)
+    )
+    write_flags(flags)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,282 @@
+import glob
+import logging
+import operator
+import os
+import re
+import time
+from collections import defaultdict
+from functools import reduce
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from etl.schema import RAW_FILE_SCHEMA, RAW_PARTITION_SCHEMA
+
+PARTITIONING = ds.partitioning(RAW_PARTITION_SCHEMA, flavor="hive")
+# Explicit schema of the whole dataset, so no file is opened to infer it
+DATASET_SCHEMA = pa.unify_schemas([RAW_FILE_SCHEMA, RAW_PARTITION_SCHEMA])
+# Partition columns read as dictionaries, as their values repeat on every row
+CATEGORY_COLUMNS = ["store_location", "sensor_id"]
+# Files of the earlier layout, with one file per day instead of per month
+DAILY_FILE_PATTERN = "data_*_*_*.parquet"
+
+
+def parse_visit_count(value) -> int | None:
+    """
+    Count of a raw row, or None if the response body is not a number. Counts
+    served as floats, such as "2.0", are truncated.
+    """
+    try:
+        return int(float(value))
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+class PartitionedParquetSink:
+    """
+    Streams batches of raw rows to disk as they arrive, in a Hive-partitioned
+    Parquet dataset: year=YYYY/month=MM/store_location=<store>/sensor_id=<id>/,
+    with one file per partition. Only the current batch and the month files it
+    touches are held in memory. The days of a batch replace those already in the
+    month file, which is replaced atomically, so rewriting a day after a crash
+    never duplicates rows.
+    """
+
+    def __init__(self, raw_dir: str) -> None:
+        self.raw_dir = raw_dir
+        self.rows_written = 0
+        self.bytes_written = 0
+
+    def partition_path(
+        self, store_location: str, sensor_id: str, year: int, month: int
+    ) -> str:
+        directory = os.path.join(
+            self.raw_dir,
+            f"year={year}",
+            f"month={month:02}",
+            f"store_location={store_location}",
+            f"sensor_id={sensor_id}",
+        )
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, f"data_{year}_{month:02}.parquet")
+
+    def write(self, rows: list[dict]) -> None:
+        """
+        Writes a batch of rows, merging each partition into its month file.
+        Rows whose count is not a number are logged and left out.
+        """
+        partitions = defaultdict(lambda: defaultdict(list))
+        rejected = 0
+        for row in rows:
+            visit_count = parse_visit_count(row["visit_count"])
+            if visit_count is None:
+                rejected += 1
+                continue
+            key = (row["store_location"], row["sensor_id"], row["year"], row["month"])
+            columns = partitions[key]
+            columns["visit_count"].append(visit_count)
+            columns["hour"].append(row["hour"])
+            columns["day"].append(row["day"])
+        if rejected:
+            logging.error(f"Skipped {rejected} raw rows whose visit count is not a number")
+
+        for key, columns in partitions.items():
+            table = pa.Table.from_pydict(columns, schema=RAW_FILE_SCHEMA)
+            self.write_table(*key, table)
+
+    def write_table(
+        self,
+        store_location: str,
+        sensor_id: str,
+        year: int,
+        month: int,
+        table: pa.Table,
+    ) -> None:
+        """
+        Merges a table of RAW_FILE_SCHEMA into the month file of its partition:
+        its days replace the same days on disk. Daily files of the earlier layout
+        are folded into the month file, which wins over them, and deleted.
+        """
+        filename = self.partition_path(store_location, sensor_id, year, month)
+        daily_files = [
+            f
+            for f in glob.glob(os.path.join(os.path.dirname(filename), "*.parquet"))
+            if f != filename
+        ]
+        parts = [table]
+        # The month file wins over daily files, the table over both
+        for files in [[filename] if os.path.exists(filename) else [], daily_files]:
+            if not files:
+                continue
+            days = pc.unique(pa.concat_tables(parts)["day"])
+            # Files written before the counts were typed are cast on read
+            existing = ds.dataset(files, schema=RAW_FILE_SCHEMA, format="parquet")
+            parts.append(existing.to_table(filter=~ds.field("day").isin(days)))
+        merged = pa.concat_tables(parts).sort_by(
+            [("day", "ascending"), ("hour", "ascending")]
+        )
+
+        # Dot-prefixed, so dataset discovery ignores a leftover temporary file
+        tmp_filename = os.path.join(
+            os.path.dirname(filename), "." + os.path.basename(filename)
+        )
+        pq.write_table(merged, tmp_filename)
+        os.replace(tmp_filename, filename)
+        for daily_file in daily_files:
+            os.remove(daily_file)
+        self.rows_written += table.num_rows
+        self.bytes_written += os.path.getsize(filename)
+
+
+def partition_glob(
+    raw_dir: str,
+    year: int | None = None,
+    month: int | None = None,
+    store_location: str | None = None,
+    sensor_id: str | None = None,
+) -> str:
+    """Glob pattern of the files of the requested partitions only."""
+    return os.path.join(
+        raw_dir,
+        f"year={year}" if year else "year=*",
+        f"month={month:02}" if month else "month=*",
+        f"store_location={store_location}" if store_location else "store_location=*",
+        f"sensor_id={sensor_id}" if sensor_id else "sensor_id=*",
+        "*.parquet",
+    )
+
+
+def raw_files(
+    raw_dir: str,
+    year: int | None = None,
+    month: int | None = None,
+    store_location: str | None = None,
+    sensor_id: str | None = None,
+    modified_after_ns: int | None = None,
+) -> list[str]:
+    """Sorted files of the requested partitions, written after modified_after_ns if set."""
+    files = sorted(
+        glob.glob(partition_glob(raw_dir, year, month, store_location, sensor_id))
+    )
+    if modified_after_ns is not None:
+        files = [f for f in files if os.stat(f).st_mtime_ns > modified_after_ns]
+    return files
+
+
+def read_raw(
+    raw_dir: str,
+    columns: list[str] | None = None,
+    year: int | None = None,
+    month: int | None = None,
+    store_location: str | None = None,
+    sensor_id: str | None = None,
+    modified_after_ns: int | None = None,
+) -> pd.DataFrame:
+    """
+    Reads the raw dataset with pyarrow.dataset, projecting the requested columns.
+    Only the directories of the requested partitions are listed and read.
+    With modified_after_ns, only the files written after that time are read.
+    Files are scanned in parallel with the explicit DATASET_SCHEMA, which types
+    the counts, and stores and sensors come back as categoricals. The throughput
+    is logged.
+    """
+    started = time.perf_counter()
+    files = raw_files(
+        raw_dir, year, month, store_location, sensor_id, modified_after_ns
+    )
+    if not files:
+        return pd.DataFrame()
+
+    filters = [
+        ds.field(name) == value
+        for name, value in [
+            ("year", year),
+            ("month", month),
+            ("store_location", store_location),
+            ("sensor_id", sensor_id),
+        ]
+        if value
+    ]
+    dataset = ds.dataset(
+        files,
+        schema=DATASET_SCHEMA,
+        format="parquet",
+        partitioning=PARTITIONING,
+        partition_base_dir=raw_dir,
+    )
+    # Raw files are small, so keep enough of them in flight to use every core
+    scanner = dataset.scanner(
+        columns=columns,
+        filter=reduce(operator.and_, filters) if filters else None,
+        use_threads=True,
+        fragment_readahead=max(4, 2 * (os.cpu_count() or 1)),
+    )
+    table = scanner.to_table()
+    for name in CATEGORY_COLUMNS:
+        if name in table.column_names:
+            table = table.set_column(
+                table.schema.get_field_index(name), name, table[name].dictionary_encode()
+            )
+    df = table.to_pandas()
+
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    logging.info(
+        f"Read {len(files)} raw files ({len(df)} rows) in {elapsed:.2f}s: "
+        f"{len(files) / elapsed:.0f} files/s, {len(df) / elapsed:.0f} rows/s"
+    )
+    return df
+
+
+def migrate_csv_files(raw_dir: str) -> int:
+    """
+    Moves legacy raw CSV files into the Parquet dataset and deletes them.
+    Manual extraction files carry their sensor in the file name; files of whole
+    stores, which have no sensor, are left untouched.
+    Returns the number of migrated files.
+    """
+    sink = PartitionedParquetSink(raw_dir)
+    migrated = 0
+    for filename in glob.glob(os.path.join(raw_dir, "**", "*.csv"), recursive=True):
+        df = pd.read_csv(filename, dtype={"visit_count": str, "sensor_id": str})
+        if "sensor_id" not in df.columns:
+            match = re.search(r"_sensor([A-D])\.csv$", filename)
+            if not match:
+                continue
+            df["sensor_id"] = match.group(1)
+        sink.write(df.to_dict("records"))
+        os.remove(filename)
+        migrated += 1
+    return migrated
+
+
+def compact_daily_files(raw_dir: str) -> int:
+    """
+    Merges the daily files of the earlier layout into the month file of their
+    partition. Returns the number of compacted partitions.
+    """
+    sink = PartitionedParquetSink(raw_dir)
+    daily_files = glob.glob(
+        os.path.join(os.path.dirname(partition_glob(raw_dir)), DAILY_FILE_PATTERN)
+    )
+    directories = sorted({os.path.dirname(f) for f in daily_files})
+    for directory in directories:
+        values = dict(
+            part.split("=", 1)
+            for part in os.path.relpath(directory, raw_dir).split(os.sep)
+        )
+        sink.write_table(
+            values["store_location"],
+            values["sensor_id"],
+            int(values["year"]),
+            int(values["month"]),
+            RAW_FILE_SCHEMA.empty_table(),
+        )
+    return len(directories)
+
+
+if __name__ == "__main__":
+    migrate_csv_files("data/raw")
+    compact_daily_files("data/raw")
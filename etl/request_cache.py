@@ -0,0 +1,60 @@
+import sqlite3
+from datetime import date
+
+
+def unique_requests(plan: list[tuple[dict, str | None]]) -> dict[str, date]:
+    """
+    Returns the minimal set of API calls needed by a row plan, mapped to their
+    business date. The API has no hour parameter, so every business hour of a
+    (store, sensor, day) shares the same call.
+    """
+    requests_by_params = {}
+    for row, params in plan:
+        if params and params not in requests_by_params:
+            requests_by_params[params] = date(row["year"], row["month"], row["day"])
+    return requests_by_params
+
+
+class ResponseCache:
+    """
+    On-disk cache of API responses keyed by the request parameters.
+    Only successful responses for past days are stored: they never change, so
+    reruns, retries and overlapping requests never fetch them again.
+    """
+
+    def __init__(self, path: str = "data/api_cache.sqlite") -> None:
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses "
+            "(params TEXT PRIMARY KEY, text TEXT NOT NULL, status INTEGER NOT NULL)"
+        )
+        self.connection.commit()
+
+    def get_many(self, params_list: list[str]) -> dict[str, tuple[str, int]]:
+        """Returns the cached (text, status) of every params found in the cache."""
+        responses = {}
+        params_list = list(params_list)
+        # Stay below SQLite's limit on the number of bound parameters
+        for i in range(0, len(params_list), 500):
+            chunk = params_list[i : i + 500]
+            rows = self.connection.execute(
+                "SELECT params, text, status FROM responses WHERE params IN "
+                f"({', '.join('?' * len(chunk))})",
+                chunk,
+            )
+            for params, text, status in rows:
+                responses[params] = (text, status)
+        return responses
+
+    def put(self, params: str, business_date: date, text: str, status: int) -> None:
+        """Stores a response if it is successful and its day is over."""
+        if status != 200 or business_date >= date.today():
+            return
+        self.connection.execute(
+            "INSERT OR REPLACE INTO responses (params, text, status) VALUES (?, ?, ?)",
+            (params, text, status),
+        )
+        self.connection.commit()
+
+    def close(self) -> None:
+        self.connection.close()
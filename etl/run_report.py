@@ -0,0 +1,147 @@
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:  # Windows: peak RSS is not reported
+    resource = None
+
+
+def peak_rss_bytes() -> int | None:
+    """High-water mark of the resident memory of the process so far."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class Stage:
+    """
+    Measures of a stage, accumulated over every time it is entered. Concurrent
+    entries, such as the requests of several days in flight, are timed once:
+    from the first entry to the last exit, less the time other stages ran
+    meanwhile (RunReport.stage).
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.calls = 0
+        self.wall_s = 0.0
+        self.cpu_s = 0.0
+        self.peak_rss_bytes = None
+        self.rows = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.active = 0
+        self.started = None
+
+    def enter(self) -> None:
+        self.calls += 1
+        self.active += 1
+
+    def exit(self) -> None:
+        self.active -= 1
+        # The process peak once the stage ran: a stage raising it set the new peak
+        self.peak_rss_bytes = peak_rss_bytes()
+
+    def start(self) -> None:
+        """Starts the clocks of the stage."""
+        self.started = (time.perf_counter(), time.process_time())
+
+    def pause(self) -> None:
+        """Stops the clocks of the stage, adding the time since start."""
+        wall, cpu = self.started
+        self.wall_s += time.perf_counter() - wall
+        self.cpu_s += time.process_time() - cpu
+        self.started = None
+
+    def as_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "calls": self.calls,
+            "wall_s": round(self.wall_s, 6),
+            "cpu_s": round(self.cpu_s, 6),
+            "peak_rss_bytes": self.peak_rss_bytes,
+            "rows": self.rows,
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+        }
+
+
+class RunReport:
+    """
+    Wall time, CPU time, peak RSS, rows and bytes read and written of each stage
+    of a script run, saved as a JSON file.
+    """
+
+    def __init__(self, script: str, args: dict | None = None) -> None:
+        self.script = script
+        self.args = args or {}
+        self.started_at = datetime.now(timezone.utc)
+        self.started = (time.perf_counter(), time.process_time())
+        self.stages = dict()
+        # Active stages in the order they became active; only the last one is timed
+        self.running = []
+        self.status = "running"
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Measures the block as the named stage, and yields it to record the rows and
+        bytes. Stages do not overlap: while another stage runs within the block, as
+        a day written while the requests of other days are in flight, the time
+        counts for that stage only.
+        """
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = Stage(name)
+        stage.enter()
+        if stage.active == 1:
+            if self.running:
+                self.running[-1].pause()
+            self.running.append(stage)
+            stage.start()
+        try:
+            yield stage
+        finally:
+            stage.exit()
+            if stage.active == 0:
+                if self.running[-1] is stage:
+                    stage.pause()
+                    self.running.pop()
+                    if self.running:
+                        self.running[-1].start()
+                else:
+                    # Paused since a later stage became active
+                    self.running.remove(stage)
+
+    def as_dict(self) -> dict:
+        wall, cpu = self.started
+        return {
+            "script": self.script,
+            "status": self.status,
+            "started_at": self.started_at.isoformat(),
+            "args": self.args,
+            "wall_s": round(time.perf_counter() - wall, 6),
+            "cpu_s": round(time.process_time() - cpu, 6),
+            "peak_rss_bytes": peak_rss_bytes(),
+            "stages": [stage.as_dict() for stage in self.stages.values()],
+        }
+
+    def save(self, path: str) -> None:
+        """Writes the report atomically, creating its folder if needed."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path + ".tmp", "w") as f:
+            json.dump(self.as_dict(), f, indent=2, default=str)
+        os.replace(path + ".tmp", path)
+
+
+def default_report_path(reports_dir: str, script: str) -> str:
+    """A new report file per run, named after the script and the UTC start time."""
+    timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+    return os.path.join(reports_dir, f"{script}_{timestamp}.json")
@@ -0,0 +1,78 @@
+import logging
+
+import pandas as pd
+import pyarrow as pa
+
+# Store and sensor names repeat on every row: store them once per file
+CATEGORY = pa.dictionary(pa.int32(), pa.string())
+
+# Columns stored in the raw files; the others come from the partition directories.
+# Files written before the counts were typed hold visit_count as text, which the
+# dataset scan casts to int32.
+RAW_FILE_SCHEMA = pa.schema(
+    [
+        ("visit_count", pa.int32()),
+        ("hour", pa.int8()),
+        ("day", pa.int8()),
+    ]
+)
+RAW_PARTITION_SCHEMA = pa.schema(
+    [
+        ("year", pa.int16()),
+        ("month", pa.int8()),
+        ("store_location", pa.string()),
+        ("sensor_id", pa.string()),
+    ]
+)
+
+# Daily features, as written by the transform and loaded by the dashboard
+PROCESSED_SCHEMA = pa.schema(
+    [
+        ("store_location", CATEGORY),
+        ("sensor_id", CATEGORY),
+        ("date", pa.date32()),
+        ("day_of_week", pa.int8()),
+        ("visit_count", pa.int32()),
+        ("moving_avg_4", pa.float32()),
+        ("pct_change", pa.float32()),
+    ]
+)
+
+# Data quality checks of each day (etl/quality_rules.py), including the days
+# missing from the processed data, whose counts are null
+FLAGS_SCHEMA = pa.schema(
+    [
+        ("store_location", CATEGORY),
+        ("sensor_id", CATEGORY),
+        ("date", pa.date32()),
+        ("visit_count", pa.int32()),
+        ("pct_change", pa.float32()),
+        ("negative_reading", pa.bool_()),
+        ("pct_change_exceeded", pa.bool_()),
+        ("missing_day", pa.bool_()),
+        ("sensor_split", pa.bool_()),
+        ("flagged", pa.bool_()),
+    ]
+)
+
+
+def to_processed_table(df: pd.DataFrame) -> pa.Table:
+    """Converts the transform output to PROCESSED_SCHEMA, failing on a missing column."""
+    return pa.Table.from_pandas(
+        df[PROCESSED_SCHEMA.names], schema=PROCESSED_SCHEMA, preserve_index=False
+    )
+
+
+def to_pandas(table: pa.Table) -> pd.DataFrame:
+    """
+    Converts a table of the contract to pandas: dictionaries become categoricals,
+    and dates become datetime64 for the pandas date accessors.
+    """
+    return table.to_pandas(date_as_object=False)
+
+
+def log_memory(stage: str, df: pd.DataFrame) -> int:
+    """Logs and returns the memory used by a DataFrame at a stage of the pipeline."""
+    size = int(df.memory_usage(deep=True).sum())
+    logging.info(f"{stage}: {len(df)} rows, {size / 2**20:.1f} MiB")
+    return size
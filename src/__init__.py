@@ -1,22 +1,20 @@
-from src.store import StoreSensor
+from src.registry import STORES_PATH, StoreRegistry
+from src.table import TrafficTable
 
 
-def create_app() -> dict:
+def create_app(
+    table_path: str | None = None, stores_path: str = STORES_PATH
+) -> StoreRegistry:
+    """
+    Load the stores defined in stores_path (src/stores.csv by default); each
+    StoreSensor is built on first access. If table_path is given, every count
+    from 2020-01-01 to today is materialized into a memory-mapped int32 file
+    shared by all workers; an existing file is only extended with the missing days.
+    """
+    store_dict = StoreRegistry.from_csv(stores_path)
 
-    store_location = ["Lille", "Paris", "Lyon", "Bordeaux", "Marseille"]
-    store_avg_visit = [3000, 8000, 6000, 2000, 1700]
-    store_std_visit = [500, 800, 500, 400, 100]
-    perc_malfunction = [0.05, 0.1, 0.08, 0.05, 0.05]
-    perc_break = [0.05, 0.08, 0.05, 0.02, 0]
-
-    store_dict = dict()
-
-    for i in range(len(store_location)):
-        store_dict[store_location[i]] = StoreSensor(
-            store_location[i],
-            store_avg_visit[i],
-            store_std_visit[i],
-            perc_malfunction[i],
-            perc_break[i],
-        )
+    if table_path:
+        table = TrafficTable(table_path, store_dict)
+        table.sync()
+        store_dict.attach_table(table)
     return store_dict
@@ -1,52 +1,262 @@
 import logging
+import os
+import time
+from collections import defaultdict
 from datetime import date
 
-from fastapi import FastAPI
-from fastapi.responses import JSONResponse
+import numpy as np
+from fastapi import FastAPI, Query, Request
+from fastapi.exception_handlers import request_validation_exception_handler
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, PlainTextResponse
+from pydantic import BaseModel
 
 from src.__init__ import create_app
+from src.metrics import (SENSOR_BREAKS, SENSOR_MALFUNCTIONS,
+                         SIMULATION_DURATION, VALIDATION_FAILURES,
+                         MetricsMiddleware, render)
+from src.registry import STORES_PATH
+from src.sensor import date_range
 
-store_dict = create_app()
+# Set TRAFFIC_TABLE_PATH to serve counts from a shared precomputed table,
+# and STORES_PATH to serve the stores of another CSV file
+store_dict = create_app(
+    table_path=os.environ.get("TRAFFIC_TABLE_PATH"),
+    stores_path=os.environ.get("STORES_PATH", STORES_PATH),
+)
 app = FastAPI()
+# Latency and status of every request, exposed with the other metrics on /metrics
+app.add_middleware(MetricsMiddleware)
 
+SENSOR_IDS = ["A", "B", "C", "D"]
+# Most counts a /visits request may return: days x stores x sensors, or keys
+MAX_VISITS = 100_000
 
-@app.get("/")
-def visit(
-    store_location: str, year: int, month: int, day: int, sensor_id: str | None = None
+
+class VisitKey(BaseModel):
+    store_location: str
+    year: int
+    month: int
+    day: int
+    sensor_id: str | None = None
+
+
+class VisitKeys(BaseModel):
+    keys: list[VisitKey]
+
+
+def reject(reason: str, content: str, status_code: int = 404) -> JSONResponse:
+    """Return an error response, 404 by default, counting the failure by reason."""
+    VALIDATION_FAILURES.inc(reason)
+    return JSONResponse(status_code=status_code, content=content)
+
+
+def reject_too_many_visits(n_visits: int) -> JSONResponse | None:
+    """Return a 400 error response if a request asks for more than MAX_VISITS counts."""
+    if n_visits > MAX_VISITS:
+        return reject(
+            "too_many_visits",
+            f"At most {MAX_VISITS} visits per request, {n_visits} requested",
+            status_code=400,
+        )
+    return None
+
+
+def count_faults(breaks, malfunctions) -> None:
+    """
+    Count the sensors that broke and malfunctioned behind the counts served,
+    whether they were simulated or read from the precomputed table. A store
+    total counts the faults of each of its sensors.
+    """
+    breaks, malfunctions = int(np.sum(breaks)), int(np.sum(malfunctions))
+    if breaks:
+        SENSOR_BREAKS.inc(amount=breaks)
+    if malfunctions:
+        SENSOR_MALFUNCTIONS.inc(amount=malfunctions)
+
+
+@app.exception_handler(RequestValidationError)
+async def count_request_validation_error(
+    request: Request, exc: RequestValidationError
 ) -> JSONResponse:
+    """Count the requests FastAPI rejects (422), then answer as FastAPI does."""
+    VALIDATION_FAILURES.inc("request_validation")
+    return await request_validation_exception_handler(request, exc)
+
+
+def check_store_and_sensor(
+    store_location: str, sensor_id: str | None
+) -> JSONResponse | None:
+    """Return an error response if the store or the sensor is unknown."""
     # If the store is not in the dictionary
     if not (store_location in store_dict.keys()):
-        return JSONResponse(status_code=404, content="Store Not Found")
+        return reject("unknown_store", "Store Not Found")
 
     # Check the value of sensor_id
-    if sensor_id and (sensor_id not in ["A", "B", "C", "D"]):
-        return JSONResponse(
-            status_code=404, content="Sensor_id should be A, B, C or D"
-        )
+    if sensor_id is not None and sensor_id not in SENSOR_IDS:
+        return reject("unknown_sensor", "Sensor_id should be A, B, C or D")
+    return None
+
+
+def check_date(requested_date: date) -> JSONResponse | None:
+    """Return an error response if the date is before 2020 or in the future."""
+    # Check the year
+    if requested_date.year < 2020:
+        return reject("before_2020", "No data before 2020")
+
+    # Check if the date is in the past
+    if date.today() < requested_date:
+        return reject("future_date", "Choose a date in the past")
+    return None
+
 
+def cast_date(year: int, month: int, day: int) -> date | JSONResponse:
+    """Build the requested date, or return an error response if it is invalid."""
     # Check the year
     if year < 2020:
-        return JSONResponse(status_code=404, content="No data before 2020")
+        return reject("before_2020", "No data before 2020")
 
     # Check the date
     try:
-        requested_date = date(year, month, day)
+        return date(year, month, day)
     except ValueError as e:
         logging.error(f"Could not cast date: {e}")
-        return JSONResponse(status_code=404, content="Enter a valid date")
+        return reject("invalid_date", "Enter a valid date")
 
-    # Check if the date is in the past
-    if date.today() < requested_date:
-        return JSONResponse(status_code=404, content="Choose a date in the past")
+
+@app.get("/")
+def visit(
+    store_location: str, year: int, month: int, day: int, sensor_id: str | None = None
+) -> JSONResponse:
+    error = check_store_and_sensor(store_location, sensor_id)
+    if error:
+        return error
+
+    requested_date = cast_date(year, month, day)
+    if isinstance(requested_date, JSONResponse):
+        return requested_date
+
+    error = check_date(requested_date)
+    if error:
+        return error
 
     # If no sensor choose return the visit for the whole store
-    if sensor_id is None:
-        visit_count = store_dict[store_location].get_all_traffic(
-            date(year=year, month=month, day=day)
-        )
-    else:
-        visit_count = store_dict[store_location].get_sensor_traffic(
-            sensor_id, date(year=year, month=month, day=day)
-        )
+    started = time.perf_counter()
+    visit_count, breaks, malfunctions = store_dict[store_location].get_day(
+        sensor_id, requested_date
+    )
+    SIMULATION_DURATION.observe(time.perf_counter() - started, "GET", "/")
+    count_faults(breaks, malfunctions)
 
     return JSONResponse(status_code=200, content=visit_count)
+
+
+@app.get("/visits")
+def visits(
+    start_date: date,
+    end_date: date,
+    store_location: list[str] = Query(),
+    sensor_id: list[str] | None = Query(None),
+) -> JSONResponse:
+    """
+    Return the visits of every store and sensor between start_date and end_date
+    (inclusive) as columns. Without sensor_id, the visits of the whole store are returned.
+    """
+    sensors = sensor_id or [None]
+    for location in store_location:
+        for sensor in sensors:
+            error = check_store_and_sensor(location, sensor)
+            if error:
+                return error
+
+    for requested_date in (start_date, end_date):
+        error = check_date(requested_date)
+        if error:
+            return error
+    if end_date < start_date:
+        return reject("end_before_start", "end_date should not be before start_date")
+    n_days = (end_date - start_date).days + 1
+    error = reject_too_many_visits(n_days * len(store_location) * len(sensors))
+    if error:
+        return error
+
+    dates = date_range(start_date, end_date)
+    day_labels = dates.astype(str).tolist()
+    columns = defaultdict(list)
+    simulation_time = 0.0
+    for location in store_location:
+        store = store_dict[location]
+        for sensor in sensors:
+            started = time.perf_counter()
+            visit_count, breaks, malfunctions = store.get_traffic_faults(sensor, dates)
+            simulation_time += time.perf_counter() - started
+            count_faults(breaks, malfunctions)
+            columns["store_location"] += [location] * len(dates)
+            columns["sensor_id"] += [sensor] * len(dates)
+            columns["date"] += day_labels
+            columns["visit_count"] += visit_count.tolist()
+    SIMULATION_DURATION.observe(simulation_time, "GET", "/visits")
+
+    return JSONResponse(status_code=200, content=columns)
+
+
+@app.post("/visits")
+def visits_by_keys(body: VisitKeys) -> JSONResponse:
+    """
+    Return the visits for an explicit list of (store, sensor, date) keys as columns,
+    in the order of the keys.
+    """
+    error = reject_too_many_visits(len(body.keys))
+    if error:
+        return error
+
+    requested_dates = []
+    for key in body.keys:
+        error = check_store_and_sensor(key.store_location, key.sensor_id)
+        if error:
+            return error
+        requested_date = cast_date(key.year, key.month, key.day)
+        if isinstance(requested_date, JSONResponse):
+            return requested_date
+        error = check_date(requested_date)
+        if error:
+            return error
+        requested_dates.append(requested_date)
+
+    # Group the keys by store and sensor so each series is simulated in one pass
+    positions = defaultdict(list)
+    for i, key in enumerate(body.keys):
+        positions[(key.store_location, key.sensor_id)].append(i)
+
+    visit_count = [0] * len(body.keys)
+    simulation_time = 0.0
+    for (location, sensor), indexes in positions.items():
+        store = store_dict[location]
+        dates = [requested_dates[i] for i in indexes]
+        started = time.perf_counter()
+        counts, breaks, malfunctions = store.get_traffic_faults(sensor, dates)
+        simulation_time += time.perf_counter() - started
+        count_faults(breaks, malfunctions)
+        for i, count in zip(indexes, counts.tolist()):
+            visit_count[i] = count
+    SIMULATION_DURATION.observe(simulation_time, "POST", "/visits")
+
+    return JSONResponse(
+        status_code=200,
+        content={
+            "store_location": [key.store_location for key in body.keys],
+            "sensor_id": [key.sensor_id for key in body.keys],
+            "date": [d.isoformat() for d in requested_dates],
+            "visit_count": visit_count,
+        },
+    )
+
+
+@app.get("/metrics")
+def metrics() -> PlainTextResponse:
+    """
+    Request latency and counts, validation failures, simulation time and
+    sensor breaks and malfunctions served by this process, in the Prometheus
+    text format.
+    """
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
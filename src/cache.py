@@ -0,0 +1,62 @@
+import threading
+from collections import OrderedDict
+from datetime import date
+
+MISSING = object()
+
+
+class TrafficCache:
+    """
+    Bounded LRU cache of traffic values keyed by (store, sensor, date).
+    Only past dates are cached: today's value is always recomputed, so nothing
+    cached during the day outlives midnight.
+    """
+
+    def __init__(self, max_size: int = 10_000) -> None:
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: tuple[str, str | None, date]):
+        """Return the cached value for key, or MISSING."""
+        with self.lock:
+            value = self.entries.get(key, MISSING)
+            if value is MISSING:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.entries.move_to_end(key)
+            return value
+
+    def put(self, key: tuple[str, str | None, date], value) -> None:
+        """Store value for key, evicting the least recently used entry if full."""
+        if self.max_size <= 0 or key[2] >= date.today():
+            return
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop every entry and reset the counters."""
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict:
+        """Return the hit, miss and eviction counters and the hit rate."""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,186 @@
+import threading
+import time
+from bisect import bisect_left
+
+# Upper bounds in seconds, from sub-millisecond lookups to slow range requests
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+
+def escape(value: str) -> str:
+    return str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def format_labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    """Monotonic counter per combination of label values."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels
+        # A counter without labels is reported from 0
+        self.values = dict() if labels else {(): 0}
+        self.lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def value(self, *label_values: str) -> float:
+        return self.values.get(label_values, 0)
+
+    def samples(self) -> list[str]:
+        with self.lock:
+            items = sorted(self.values.items())
+        return [
+            f"{self.name}{format_labels(self.labels, values)} {count}"
+            for values, count in items
+        ]
+
+
+class Histogram:
+    """
+    Distribution of observed values per combination of label values. Each
+    observation increments a single bucket; the cumulative counts Prometheus
+    expects are only computed when the metrics are rendered.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        # Per label values: [count per bucket and +Inf, sum]
+        self.values = dict()
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        i = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.values.get(label_values)
+            if series is None:
+                series = self.values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    def count(self, *label_values: str) -> int:
+        series = self.values.get(label_values)
+        return sum(series[0]) if series else 0
+
+    def samples(self) -> list[str]:
+        with self.lock:
+            items = sorted((k, (list(v[0]), v[1])) for k, v in self.values.items())
+        lines = []
+        bounds = [repr(float(b)) for b in self.buckets] + ["+Inf"]
+        for values, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                labels = format_labels((*self.labels, "le"), (*values, bound))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = format_labels(self.labels, values)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time to answer a request, by method and route.",
+    ("method", "route"),
+)
+REQUESTS = Counter(
+    "http_requests_total",
+    "Requests answered, by method, route and status code.",
+    ("method", "route", "status"),
+)
+VALIDATION_FAILURES = Counter(
+    "validation_failures_total",
+    "Requests rejected because of their parameters, by reason.",
+    ("reason",),
+)
+SIMULATION_DURATION = Histogram(
+    "simulation_duration_seconds",
+    "Time spent computing the visit counts of a request, by method and route.",
+    ("method", "route"),
+)
+SENSOR_BREAKS = Counter(
+    "sensor_breaks_total",
+    "Sensor counts served as a break (-1), with each sensor behind a store total.",
+)
+SENSOR_MALFUNCTIONS = Counter(
+    "sensor_malfunctions_total",
+    "Sensor counts served from a malfunction, with each sensor behind a store total.",
+)
+METRICS = [
+    REQUEST_DURATION,
+    REQUESTS,
+    VALIDATION_FAILURES,
+    SIMULATION_DURATION,
+    SENSOR_BREAKS,
+    SENSOR_MALFUNCTIONS,
+]
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request and counting it by status, under
+    the path template of its route, so that path parameters and unknown paths
+    cannot grow the number of series.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router stores the matched route in the shared scope
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            REQUEST_DURATION.observe(
+                time.perf_counter() - started, scope["method"], path
+            )
+            REQUESTS.inc(scope["method"], path, str(status))
+
+
+def render(metrics: list = METRICS) -> str:
+    """The metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines += metric.samples()
+    return "\n".join(lines) + "\n"
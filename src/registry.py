@@ -0,0 +1,127 @@
+import csv
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+
+import numpy as np
+
+from src.store import StoreSensor
+
+# Store definitions served by the API, one row per store
+STORES_PATH = os.path.join(os.path.dirname(__file__), "stores.csv")
+COLUMNS = ["location", "avg_visit", "std_visit", "perc_malfunction", "perc_break"]
+# Built stores kept in memory, the least recently used being dropped first
+MAX_STORES = 1024
+
+
+class StoreRegistry(Mapping):
+    """
+    Read-only mapping from a location to its StoreSensor. The parameters of every
+    store are held in one array per column, and a StoreSensor is only built the
+    first time its location is accessed, so startup time and memory stay flat
+    however many stores are defined. At most max_stores built stores are kept,
+    along with their traffic caches.
+    """
+
+    def __init__(
+        self,
+        locations: list[str],
+        avg_visit,
+        std_visit,
+        perc_malfunction,
+        perc_break,
+        max_stores: int = MAX_STORES,
+    ) -> None:
+        self.locations = list(locations)
+        self.index = {location: i for i, location in enumerate(self.locations)}
+        if len(self.index) != len(self.locations):
+            raise ValueError("Store locations should be unique")
+        self.avg_visit = np.asarray(avg_visit, dtype=np.int32)
+        self.std_visit = np.asarray(std_visit, dtype=np.int32)
+        self.perc_malfunction = np.asarray(perc_malfunction, dtype=np.float64)
+        self.perc_break = np.asarray(perc_break, dtype=np.float64)
+        # Optional precomputed TrafficTable, attached to the stores as they are built
+        self.table = None
+        self.max_stores = max_stores
+        self.stores = OrderedDict()
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_csv(cls, path: str = STORES_PATH) -> "StoreRegistry":
+        """Loads the stores of a CSV file with a header naming COLUMNS."""
+        columns = {column: [] for column in COLUMNS}
+        with open(path, newline="") as f:
+            reader = csv.DictReader(f)
+            missing = set(COLUMNS) - set(reader.fieldnames or [])
+            if missing:
+                raise ValueError(f"{path} is missing the columns {sorted(missing)}")
+            for row in reader:
+                for column in COLUMNS:
+                    columns[column].append(row[column])
+        for location in columns["location"]:
+            # StoreSensor seeds its traffic split with the ASCII codes of the name
+            if not location.isascii():
+                raise ValueError(f"Store location {location!r} should be ASCII")
+        return cls(
+            columns["location"],
+            np.array(columns["avg_visit"], dtype=np.int32),
+            np.array(columns["std_visit"], dtype=np.int32),
+            np.array(columns["perc_malfunction"], dtype=np.float64),
+            np.array(columns["perc_break"], dtype=np.float64),
+        )
+
+    def parameters(self) -> list[list]:
+        """The simulation parameters of each store, in COLUMNS order."""
+        return [
+            [location, int(avg), int(std), float(malfunction), float(brk)]
+            for location, avg, std, malfunction, brk in zip(
+                self.locations,
+                self.avg_visit,
+                self.std_visit,
+                self.perc_malfunction,
+                self.perc_break,
+            )
+        ]
+
+    def build(self, location: str) -> StoreSensor:
+        """A new StoreSensor for a location, neither kept nor attached to the table."""
+        i = self.index[location]
+        return StoreSensor(
+            location,
+            int(self.avg_visit[i]),
+            int(self.std_visit[i]),
+            float(self.perc_malfunction[i]),
+            float(self.perc_break[i]),
+        )
+
+    def __getitem__(self, location: str) -> StoreSensor:
+        with self.lock:
+            store = self.stores.get(location)
+            if store is not None:
+                self.stores.move_to_end(location)
+                return store
+        store = self.build(location)
+        store.table = self.table
+        with self.lock:
+            # Another thread may have built the store meanwhile
+            store = self.stores.setdefault(location, store)
+            while len(self.stores) > self.max_stores:
+                self.stores.popitem(last=False)
+        return store
+
+    def __contains__(self, location) -> bool:
+        return location in self.index
+
+    def __iter__(self):
+        return iter(self.locations)
+
+    def __len__(self) -> int:
+        return len(self.locations)
+
+    def attach_table(self, table) -> None:
+        """Serves the counts of the stores, built or not, from a TrafficTable."""
+        self.table = table
+        with self.lock:
+            for store in self.stores.values():
+                store.table = table
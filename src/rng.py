@@ -0,0 +1,51 @@
+import numpy as np
+
+SHIFT_11 = np.uint64(11)
+
+
+def derive_key(*entropy: int) -> np.ndarray:
+    """Derive a 2 x uint64 Philox key from integers, e.g. a store and a sensor."""
+    return np.random.SeedSequence(list(entropy)).generate_state(2, np.uint64)
+
+
+def philox_run(key: np.ndarray, first: int, n: int) -> np.ndarray:
+    """
+    Philox4x64-10 blocks of the n consecutive counters from first, as an (n, 4)
+    array. numpy increments its counter before generating the first block.
+    """
+    bit_generator = np.random.Philox(key=key, counter=[first - 1, 0, 0, 0])
+    return bit_generator.random_raw(4 * n).reshape(n, 4)
+
+
+def philox_blocks(key: np.ndarray, ordinals) -> np.ndarray:
+    """
+    One Philox4x64-10 block per ordinal, used as the counter: any block is
+    computed independently, in O(1) and without shared state. Each run of
+    consecutive ordinals is generated by a single numpy.random.Philox.
+    """
+    ordinals = np.asarray(ordinals, dtype=np.int64)
+    if ordinals.size == 1:
+        return philox_run(key, int(ordinals[0]), 1)
+    unique, inverse = np.unique(ordinals, return_inverse=True)
+    blocks = np.empty((len(unique), 4), dtype=np.uint64)
+    bounds = np.r_[0, np.flatnonzero(np.diff(unique) != 1) + 1, len(unique)]
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        blocks[start:end] = philox_run(key, int(unique[start]), end - start)
+    return blocks[inverse]
+
+
+def daily_draws(key: np.ndarray, ordinals) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Return one uniform draw in [0, 1) and one standard normal draw per date,
+    using the date ordinal as the Philox counter.
+    """
+    blocks = philox_blocks(key, ordinals) >> SHIFT_11
+
+    # 53-bit doubles, as numpy does; u1 is shifted to (0, 1] to keep log finite
+    uniform = blocks[:, 0] * 2.0**-53
+    u1 = (blocks[:, 1] + 1) * 2.0**-53
+    u2 = blocks[:, 2] * 2.0**-53
+
+    # Box-Muller transform
+    normal = np.sqrt(-2.0 * np.log(u1)) * np.cos(2.0 * np.pi * u2)
+    return uniform, normal
@@ -3,6 +3,29 @@ from datetime import date, timedelta
 
 import numpy as np
 
+from src.rng import daily_draws, derive_key
+
+# Ordinal of 1970-01-01, the epoch of numpy's datetime64[D]
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# Traffic multiplier by weekday: Monday = 0, Sunday = 6
+WEEKDAY_FACTOR = np.array([1.0, 1.0, 1.10, 1.0, 1.25, 1.35, 0.0])
+
+
+def to_ordinals(dates) -> np.ndarray:
+    """Convert a sequence of dates (or a datetime64 array) to proleptic ordinals."""
+    days = np.asarray(dates, dtype="datetime64[D]").astype(np.int64)
+    return days + EPOCH_ORDINAL
+
+
+def date_range(start_date: date, end_date: date) -> np.ndarray:
+    """Return every day from start_date to end_date (inclusive) as datetime64[D]."""
+    return np.arange(
+        np.datetime64(start_date, "D"),
+        np.datetime64(end_date + timedelta(days=1), "D"),
+        dtype="datetime64[D]",
+    )
+
 
 class VisitSensor:
 
@@ -12,21 +35,29 @@ class VisitSensor:
         std_visit: int,
         perc_break: float = 0.015,
         perc_malfunction: float = 0.035,
+        seed: tuple[int, ...] = (0,),
     ) -> None:
         self.avg_visit = avg_visit
         self.std_visit = std_visit
         self.perc_break = perc_break
         self.perc_malfunction = perc_malfunction
+        # Key of the counter-based generator: draws only depend on (key, date)
+        self.key = derive_key(*seed)
+
+    def draw(self, business_date: date) -> tuple[float, float]:
+        """Return the uniform and normal draws of the sensor at a date."""
+        uniform, normal = daily_draws(self.key, [business_date.toordinal()])
+        return float(uniform[0]), float(normal[0])
 
     def simulate_visit_count(self, business_date: date) -> int:
 
         # Ensure reproducibility of measurements
-        np.random.seed(seed=business_date.toordinal())
+        _, normal = self.draw(business_date)
 
         # Find out which day the business_date corresponds to: Monday = 0, Sunday = 6
         week_day = business_date.weekday()
 
-        visit = np.random.normal(self.avg_visit, self.std_visit)
+        visit = self.avg_visit + self.std_visit * normal
         # More traffic on Wednesdays (2), Fridays (4) and Saturdays (5)
         if week_day == 2:
             visit *= 1.10
@@ -43,18 +74,34 @@ class VisitSensor:
         return math.floor(visit / 11)
 
     def get_visit_count(self, business_date: date) -> int:
-        np.random.seed(seed=business_date.toordinal())
-        proba_malfunction = np.random.random()
+        proba_malfunction, _ = self.draw(business_date)
 
         # The sensor can break sometimes
         if proba_malfunction < self.perc_break:
-            print("break")
             return -1
 
         visit = self.simulate_visit_count(business_date)
 
         # The sensor can also malfunction
         if proba_malfunction < self.perc_malfunction:
-            print("malfunction")
             visit = np.floor(visit * 0.2)
         return visit
+
+    def get_visit_counts(self, dates) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Vectorized get_visit_count over an array of dates.
+        Returns the visit counts and the break and malfunction flags.
+        """
+        ordinals = to_ordinals(dates)
+        uniform, normal = daily_draws(self.key, ordinals)
+        week_day = (ordinals + 6) % 7
+
+        visit = (self.avg_visit + self.std_visit * normal) * WEEKDAY_FACTOR[week_day]
+        visit = np.floor(visit / 11)
+
+        is_break = uniform < self.perc_break
+        is_malfunction = ~is_break & (uniform < self.perc_malfunction)
+
+        visit = np.where(is_malfunction, np.floor(visit * 0.2), visit)
+        visit = np.where(is_break, -1, visit)
+        return visit.astype(np.int64), is_break, is_malfunction
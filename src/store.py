@@ -2,7 +2,8 @@ from datetime import date
 
 import numpy as np
 
-from src.sensor import (VisitSensor)
+from src.cache import MISSING, TrafficCache
+from src.sensor import VisitSensor, date_range
 
 
 class StoreSensor:
@@ -13,18 +14,23 @@ class StoreSensor:
         std_visit: int,
         perc_malfunction: float = 0,
         perc_break: float = 0,
+        cache_size: int = 10_000,
     ) -> None:
         """Initialize a store"""
         self.name = location
         self.sensors = dict()
+        # Memoize past traffic values, keyed by (store, sensor, date)
+        self.cache = TrafficCache(max_size=cache_size)
+        # Optional precomputed TrafficTable, attached by create_app
+        self.table = None
 
         # To always get the same result when asking for the same store
         seed = np.sum(list(self.name.encode("ascii")))
-        np.random.seed(seed=seed)
 
         # 80/20: most people take the main entrance
+        # A local generator keeps the global numpy state untouched
         traffic_percentage = [0.58, 0.30, 0.07, 0.05]
-        np.random.shuffle(traffic_percentage)
+        np.random.RandomState(seed=seed).shuffle(traffic_percentage)
 
         # Initialization of the store's sensors
         # To keep things simple, we assume each store has eight sensors
@@ -36,13 +42,109 @@ class StoreSensor:
                 traffic_percentage[i] * std_visit,
                 perc_malfunction,
                 perc_break,
+                seed=(i, *self.name.encode("utf-8")),
             )
             self.sensors[label] = sensor
 
     def get_sensor_traffic(self, sensor_id: str, business_date: date) -> int:
         """Return the traffic for one sensor at a date"""
-        return self.sensors[sensor_id].get_visit_count(business_date)
+        return self.get_day(sensor_id, business_date)[0]
 
     def get_all_traffic(self, business_date: date) -> int:
         """Return the traffic for all store sensors at a date"""
-        return sum([self.sensors[i].get_visit_count(business_date) for i in ["A", "B", "C", "D"]])
+        return self.get_day(None, business_date)[0]
+
+    def get_day(
+        self, sensor_id: str | None, business_date: date
+    ) -> tuple[int, int, int]:
+        """
+        Return the traffic of one sensor, or of the whole store if sensor_id is None,
+        at a date, with the number of sensors behind it that broke and malfunctioned
+        """
+        if self.table:
+            day = self.table.lookup_faults(self.name, sensor_id, [business_date])
+            if day is not None:
+                return tuple(int(values[0]) for values in day)
+
+        key = (self.name, sensor_id, business_date)
+        day = self.cache.get(key)
+        if day is MISSING:
+            day = tuple(
+                int(values[0]) for values in self.simulate(sensor_id, [business_date])
+            )
+            self.cache.put(key, day)
+        return day
+
+    def get_sensor_traffic_range(
+        self, sensor_id: str, start_date: date, end_date: date
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Return the dates, traffic, break flags and malfunction flags
+        for one sensor from start_date to end_date (inclusive)
+        """
+        dates = date_range(start_date, end_date)
+        counts, is_break, is_malfunction = self.sensors[sensor_id].get_visit_counts(dates)
+        return dates, counts, is_break, is_malfunction
+
+    def get_all_traffic_range(
+        self, start_date: date, end_date: date
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Return the dates, traffic summed over all store sensors, and whether any
+        sensor broke or malfunctioned, from start_date to end_date (inclusive)
+        """
+        dates = date_range(start_date, end_date)
+        counts, any_break, any_malfunction = self.get_all_traffic_counts(dates)
+        return dates, counts, any_break, any_malfunction
+
+    def get_all_traffic_counts(
+        self, dates
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Vectorized get_all_traffic over an array of dates.
+        Returns the traffic and whether any sensor broke or malfunctioned.
+        """
+        counts = np.zeros(len(dates), dtype=np.int64)
+        any_break = np.zeros(len(dates), dtype=bool)
+        any_malfunction = np.zeros(len(dates), dtype=bool)
+        for i in ["A", "B", "C", "D"]:
+            sensor_counts, is_break, is_malfunction = self.sensors[i].get_visit_counts(dates)
+            counts += sensor_counts
+            any_break |= is_break
+            any_malfunction |= is_malfunction
+        return counts, any_break, any_malfunction
+
+    def get_traffic_counts(self, sensor_id: str | None, dates) -> np.ndarray:
+        """
+        Return the traffic of one sensor, or of the whole store if sensor_id is None,
+        for an array of dates, reading the precomputed table when available
+        """
+        counts, _, _ = self.get_traffic_faults(sensor_id, dates)
+        return counts
+
+    def get_traffic_faults(
+        self, sensor_id: str | None, dates
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        get_traffic_counts, with the number of sensors behind each count that
+        broke and that malfunctioned
+        """
+        if self.table:
+            days = self.table.lookup_faults(self.name, sensor_id, dates)
+            if days is not None:
+                return days
+        return self.simulate(sensor_id, dates)
+
+    def simulate(
+        self, sensor_id: str | None, dates
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Simulate get_traffic_faults without the precomputed table"""
+        counts = np.zeros(len(dates), dtype=np.int64)
+        breaks = np.zeros(len(dates), dtype=np.int64)
+        malfunctions = np.zeros(len(dates), dtype=np.int64)
+        for i in ["A", "B", "C", "D"] if sensor_id is None else [sensor_id]:
+            sensor_counts, is_break, is_malfunction = self.sensors[i].get_visit_counts(dates)
+            counts += sensor_counts
+            breaks += is_break
+            malfunctions += is_malfunction
+        return counts, breaks, malfunctions
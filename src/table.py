@@ -0,0 +1,179 @@
+import json
+import os
+import threading
+from datetime import date, timedelta
+
+import numpy as np
+
+from src.sensor import date_range, to_ordinals
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory file locks, single worker only
+    fcntl = None
+
+START_DATE = date(2020, 1, 1)
+SENSOR_IDS = ["A", "B", "C", "D"]
+DTYPE = np.dtype("<i4")
+# Bit set on the counts of malfunctioning sensors, far above any visit count
+MALFUNCTION_FLAG = 1 << 30
+
+
+def decode(rows: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Split stored counts into the visit counts and the malfunction flags."""
+    is_malfunction = (rows >= 0) & (rows & MALFUNCTION_FLAG != 0)
+    return np.where(is_malfunction, rows ^ MALFUNCTION_FLAG, rows), is_malfunction
+
+
+class TrafficTable:
+    """
+    Precomputed int32 table of every sensor count since START_DATE, stored as a
+    flat (day, store, sensor) array file that each worker memory-maps.
+    Days are the outermost axis, so a new day is appended without a rebuild.
+    The counts of malfunctioning sensors carry MALFUNCTION_FLAG, and breaks are
+    stored as -1, so the faults behind a count are served with it.
+    A JSON sidecar records the start date, the stores with their simulation
+    parameters, and the sensors; the table is rebuilt when any of them changes.
+    """
+
+    def __init__(self, path: str, stores: dict) -> None:
+        self.path = path
+        self.meta_path = path + ".json"
+        self.lock_path = path + ".lock"
+        self.stores = stores
+        self.store_index = {name: i for i, name in enumerate(stores)}
+        self.start_ordinal = START_DATE.toordinal()
+        self.row_shape = (len(stores), len(SENSOR_IDS))
+        self.row_bytes = DTYPE.itemsize * len(stores) * len(SENSOR_IDS)
+        self.array = np.empty((0, *self.row_shape), dtype=DTYPE)
+        self.refresh_lock = threading.Lock()
+
+    def metadata(self) -> dict:
+        return {
+            "start_date": START_DATE.isoformat(),
+            "stores": self.stores.parameters(),
+            "sensors": SENSOR_IDS,
+            "malfunction_flag": MALFUNCTION_FLAG,
+        }
+
+    def n_days(self) -> int:
+        return len(self.array)
+
+    def open(self) -> None:
+        """Memory-map the days currently in the file (read-only)."""
+        n_days = os.path.getsize(self.path) // self.row_bytes
+        if n_days == 0:
+            self.array = np.empty((0, *self.row_shape), dtype=DTYPE)
+        else:
+            self.array = np.memmap(
+                self.path, dtype=DTYPE, mode="r", shape=(n_days, *self.row_shape)
+            )
+
+    def compute_rows(self, start_date: date, end_date: date) -> np.ndarray:
+        """
+        Simulate every store and sensor from start_date to end_date (inclusive).
+        Stores are built for the computation only, so the registry keeps none.
+        """
+        dates = date_range(start_date, end_date)
+        rows = np.empty((len(dates), *self.row_shape), dtype=DTYPE)
+        build = getattr(self.stores, "build", self.stores.__getitem__)
+        for s, name in enumerate(self.stores):
+            store = build(name)
+            for j, sensor_id in enumerate(SENSOR_IDS):
+                counts, _, is_malfunction = store.sensors[sensor_id].get_visit_counts(
+                    dates
+                )
+                rows[:, s, j] = np.where(
+                    is_malfunction, counts | MALFUNCTION_FLAG, counts
+                )
+        return rows
+
+    def sync(self, end_date: date | None = None) -> None:
+        """
+        Make the file cover START_DATE to end_date (today by default), then map it.
+        The file is rebuilt when the stores or their parameters changed, otherwise
+        only missing days are appended. An exclusive file lock serializes
+        concurrent workers.
+        """
+        end_date = end_date or date.today()
+        with open(self.lock_path, "w") as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+
+            metadata = None
+            if os.path.exists(self.meta_path) and os.path.exists(self.path):
+                with open(self.meta_path) as f:
+                    metadata = json.load(f)
+            if metadata != self.metadata():
+                # Replace rather than truncate, so existing maps stay valid
+                with open(self.path + ".tmp", "wb"):
+                    pass
+                os.replace(self.path + ".tmp", self.path)
+                with open(self.meta_path, "w") as f:
+                    json.dump(self.metadata(), f)
+
+            n_days = os.path.getsize(self.path) // self.row_bytes
+            first_missing = START_DATE + timedelta(days=n_days)
+            if first_missing <= end_date:
+                rows = self.compute_rows(first_missing, end_date)
+                with open(self.path, "r+b") as f:
+                    # Drop any partial row left by an interrupted write
+                    f.truncate(n_days * self.row_bytes)
+                    f.seek(0, os.SEEK_END)
+                    f.write(rows.tobytes())
+        self.open()
+
+    def ensure(self, last_index: int) -> bool:
+        """Extend the mapping up to last_index if the date is not in the future."""
+        if last_index < self.n_days():
+            return True
+        if self.start_ordinal + last_index > date.today().toordinal():
+            return False
+        with self.refresh_lock:
+            if last_index >= self.n_days():
+                # Another worker may already have appended the day
+                self.open()
+            if last_index >= self.n_days():
+                self.sync()
+        return last_index < self.n_days()
+
+    def lookup(self, store_location: str, sensor_id: str | None, business_date: date):
+        """Return the count of a sensor (or of the whole store) at a date, or None."""
+        day = self.lookup_faults(store_location, sensor_id, [business_date])
+        if day is None:
+            return None
+        return int(day[0][0])
+
+    def lookup_many(self, store_location: str, sensor_id: str | None, dates):
+        """Vectorized lookup over an array of dates, or None if any is not covered."""
+        days = self.lookup_faults(store_location, sensor_id, dates)
+        if days is None:
+            return None
+        return days[0]
+
+    def lookup_faults(
+        self, store_location: str, sensor_id: str | None, dates
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray] | None:
+        """
+        Return the counts of a sensor (or of the whole store) over an array of
+        dates, with the number of sensors behind each count that broke and that
+        malfunctioned, or None if any date is not covered.
+        """
+        indexes = to_ordinals(dates) - self.start_ordinal
+        if len(indexes) == 0 or indexes.min() < 0 or not self.ensure(indexes.max()):
+            return None
+        rows = self.array[indexes, self.store_index[store_location]]
+        if sensor_id is not None:
+            rows = rows[:, [SENSOR_IDS.index(sensor_id)]]
+        counts, is_malfunction = decode(rows)
+        return (
+            counts.sum(axis=1, dtype=np.int64),
+            np.count_nonzero(counts == -1, axis=1),
+            np.count_nonzero(is_malfunction, axis=1),
+        )
+
+if __name__ == "__main__":
+    # Nightly job: append the days missing up to today
+    from src.__init__ import create_app
+
+    create_app(table_path=os.environ.get("TRAFFIC_TABLE_PATH", "data/traffic.i32"))
@@ -0,0 +1,30 @@
+"""Raw rows shared by the transform and quality rules tests."""
+from datetime import date
+
+STORES = ["Lille", "Paris"]
+SENSORS = ["A", "B"]
+START = date(2024, 1, 1)
+
+
+def raw_rows(days, rng, overrides=None):
+    """Two business hours per (store, sensor, day), with optional fixed counts."""
+    overrides = overrides or {}
+    rows = []
+    for day in days:
+        for store in STORES:
+            for sensor in SENSORS:
+                count = overrides.get((store, sensor, day))
+                for hour in [9, 10]:
+                    visit_count = rng.integers(0, 100) if count is None else count
+                    rows.append(
+                        {
+                            "store_location": store,
+                            "sensor_id": sensor,
+                            "year": day.year,
+                            "month": day.month,
+                            "day": day.day,
+                            "hour": hour,
+                            "visit_count": str(visit_count),
+                        }
+                    )
+    return rows
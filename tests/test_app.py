@@ -0,0 +1,179 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+import src.app
+from src.app import app, store_dict
+from src.metrics import VALIDATION_FAILURES
+
+
+class TestVisitsEndpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.client = TestClient(app)
+
+    def test_visits_range_matches_single_day(self):
+        response = self.client.get(
+            "/visits",
+            params={
+                "start_date": "2024-02-26",
+                "end_date": "2024-03-03",
+                "store_location": ["Lille", "Paris"],
+                "sensor_id": ["A", "C"],
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        content = response.json()
+        self.assertEqual(len(content["visit_count"]), 2 * 2 * 7)
+
+        for location, sensor, day, count in zip(
+            content["store_location"],
+            content["sensor_id"],
+            content["date"],
+            content["visit_count"],
+        ):
+            requested_date = date.fromisoformat(day)
+            expected = self.client.get(
+                "/",
+                params={
+                    "store_location": location,
+                    "sensor_id": sensor,
+                    "year": requested_date.year,
+                    "month": requested_date.month,
+                    "day": requested_date.day,
+                },
+            ).json()
+            self.assertEqual(count, expected)
+
+    def test_visits_range_whole_store(self):
+        response = self.client.get(
+            "/visits",
+            params={
+                "start_date": "2024-01-01",
+                "end_date": "2024-01-31",
+                "store_location": "Lyon",
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        content = response.json()
+        self.assertEqual(content["sensor_id"], [None] * 31)
+        expected = [
+            store_dict["Lyon"].get_all_traffic(date(2024, 1, 1) + timedelta(days=i))
+            for i in range(31)
+        ]
+        self.assertEqual(content["visit_count"], expected)
+
+    def test_visits_range_validation(self):
+        base = {"start_date": "2024-01-01", "end_date": "2024-01-02"}
+        cases = [
+            ({"store_location": "Nowhere"}, "Store Not Found"),
+            (
+                {"store_location": "Lille", "sensor_id": "E"},
+                "Sensor_id should be A, B, C or D",
+            ),
+            (
+                {"store_location": "Lille", "start_date": "2019-12-31"},
+                "No data before 2020",
+            ),
+            (
+                {
+                    "store_location": "Lille",
+                    "end_date": (date.today() + timedelta(days=1)).isoformat(),
+                },
+                "Choose a date in the past",
+            ),
+        ]
+        for params, message in cases:
+            response = self.client.get("/visits", params={**base, **params})
+            self.assertEqual(response.status_code, 404)
+            self.assertEqual(response.json(), message)
+
+    def test_empty_sensor_id_is_rejected(self):
+        params = {"store_location": "Lille", "year": 2024, "month": 1, "day": 3}
+        responses = [
+            self.client.get("/", params={**params, "sensor_id": ""}),
+            self.client.get(
+                "/visits",
+                params={
+                    "store_location": "Lille",
+                    "sensor_id": "",
+                    "start_date": "2024-01-01",
+                    "end_date": "2024-01-02",
+                },
+            ),
+            self.client.post("/visits", json={"keys": [{**params, "sensor_id": ""}]}),
+        ]
+        for response in responses:
+            self.assertEqual(response.status_code, 404)
+            self.assertEqual(response.json(), "Sensor_id should be A, B, C or D")
+
+    def test_too_many_visits_are_rejected(self):
+        rejected = VALIDATION_FAILURES.value("too_many_visits")
+        params = {
+            "store_location": ["Lille", "Paris"],
+            "sensor_id": ["A", "B"],
+            "start_date": "2024-01-01",
+            "end_date": "2024-01-10",
+        }
+        key = {"store_location": "Lille", "year": 2024, "month": 1, "day": 3}
+        with patch.object(src.app, "MAX_VISITS", 39):
+            response = self.client.get("/visits", params=params)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(
+                response.json(), "At most 39 visits per request, 40 requested"
+            )
+            response = self.client.post("/visits", json={"keys": [key] * 40})
+            self.assertEqual(response.status_code, 400)
+        with patch.object(src.app, "MAX_VISITS", 40):
+            self.assertEqual(self.client.get("/visits", params=params).status_code, 200)
+        self.assertEqual(VALIDATION_FAILURES.value("too_many_visits"), rejected + 2)
+
+    def test_visits_by_keys(self):
+        keys = [
+            {"store_location": "Paris", "sensor_id": "B", "year": 2023, "month": 6, "day": 3},
+            {"store_location": "Lille", "year": 2023, "month": 6, "day": 4},
+            {"store_location": "Paris", "sensor_id": "B", "year": 2021, "month": 1, "day": 8},
+        ]
+        response = self.client.post("/visits", json={"keys": keys})
+        self.assertEqual(response.status_code, 200)
+        content = response.json()
+        self.assertEqual(content["date"], ["2023-06-03", "2023-06-04", "2021-01-08"])
+        for key, count in zip(keys, content["visit_count"]):
+            expected = self.client.get("/", params=key).json()
+            self.assertEqual(count, expected)
+
+    def test_visits_by_keys_validation(self):
+        keys = [{"store_location": "Lille", "year": 2023, "month": 2, "day": 30}]
+        response = self.client.post("/visits", json={"keys": keys})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), "Enter a valid date")
+
+    def test_concurrent_requests_are_deterministic(self):
+        params = [
+            {
+                "store_location": location,
+                "sensor_id": sensor,
+                "year": 2024,
+                "month": month,
+                "day": day,
+            }
+            for location in ["Lille", "Paris", "Lyon"]
+            for sensor in ["A", "B", "C", "D"]
+            for month in [1, 6]
+            for day in range(1, 11)
+        ]
+        expected = [self.client.get("/", params=p).json() for p in params]
+
+        def fetch(p):
+            return self.client.get("/", params=p).json()
+
+        with ThreadPoolExecutor(max_workers=32) as executor:
+            results = list(executor.map(fetch, params * 3))
+        self.assertEqual(results, expected * 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from benchmarks.suite import Case, compare, main, make_raw_data
+from etl.transform_data import aggregate_daily_visits, prepare_date_column
+
+
+def results(**per_op_s) -> dict:
+    return {
+        "cases": {
+            name: {"ops": 1, "median_s": value, "min_s": value, "per_op_s": value}
+            for name, value in per_op_s.items()
+        }
+    }
+
+
+class TestBenchmarkSuite(unittest.TestCase):
+
+    def test_case_setup_is_not_shared_between_runs(self):
+        inputs = []
+        case = Case("case", inputs.append, ops=4, setup=list)
+        result = case.measure(repeat=3)
+        self.assertEqual(len(inputs), 3)
+        self.assertEqual(len({id(i) for i in inputs}), 3)
+        self.assertEqual(result["per_op_s"], result["median_s"] / 4)
+
+    def test_compare_with_baseline(self):
+        baseline = results(fast=1.0, slow=1.0, removed=1.0)
+        current = results(fast=0.5, slow=1.5, new=1.0)
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            regressions = compare(current, baseline, tolerance=0.25)
+        self.assertEqual(regressions, ["slow"])
+        self.assertIn("new", output.getvalue())
+
+    def test_raw_data_has_the_load_data_layout(self):
+        raw = make_raw_data(n_stores=2, n_years=1)
+        self.assertEqual(len(raw), 2 * 4 * 366 * 12)
+        self.assertEqual(str(raw["visit_count"].dtype), "int32")
+        daily = aggregate_daily_visits(prepare_date_column(raw))
+        self.assertEqual(daily["date"].min().isoformat(), "2020-01-01T00:00:00")
+
+    def test_results_file_and_regression_exit_code(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output = os.path.join(tmp_dir, "results.json")
+            args = ["--filter", "simulation/sensor", "--repeat", "1"]
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.assertEqual(main(args + ["--output", output]), 0)
+            with open(output) as f:
+                saved = json.load(f)
+            self.assertEqual(
+                sorted(saved["cases"]),
+                [
+                    "simulation/sensor.get_visit_count/call",
+                    "simulation/sensor.get_visit_counts/year",
+                ],
+            )
+
+            # A baseline 100 times faster makes every case a regression
+            for case in saved["cases"].values():
+                case["per_op_s"] /= 100
+            with open(output, "w") as f:
+                json.dump(saved, f)
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.assertEqual(main(args + ["--baseline", output]), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+from datetime import date, timedelta
+from unittest.mock import patch
+
+from src.cache import MISSING, TrafficCache
+from src.store import StoreSensor
+
+
+class TestTrafficCache(unittest.TestCase):
+
+    def test_lru_eviction(self):
+        cache = TrafficCache(max_size=2)
+        cache.put(("Lille", "A", date(2024, 1, 1)), 1)
+        cache.put(("Lille", "A", date(2024, 1, 2)), 2)
+        # Touch the first entry so the second becomes the least recently used
+        self.assertEqual(cache.get(("Lille", "A", date(2024, 1, 1))), 1)
+        cache.put(("Lille", "A", date(2024, 1, 3)), 3)
+
+        self.assertIs(cache.get(("Lille", "A", date(2024, 1, 2))), MISSING)
+        self.assertEqual(cache.get(("Lille", "A", date(2024, 1, 3))), 3)
+        stats = cache.stats()
+        self.assertEqual(stats["size"], 2)
+        self.assertEqual(stats["hits"], 2)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["evictions"], 1)
+        self.assertAlmostEqual(stats["hit_rate"], 2 / 3)
+
+    def test_today_is_not_cached(self):
+        cache = TrafficCache()
+        cache.put(("Lille", "A", date.today()), 10)
+        cache.put(("Lille", "A", date.today() + timedelta(days=1)), 10)
+        self.assertEqual(cache.stats()["size"], 0)
+
+    def test_value_cached_today_is_not_reused_tomorrow(self):
+        cache = TrafficCache()
+        with patch("src.cache.date") as mock_date:
+            mock_date.today.return_value = date(2025, 5, 15)
+            cache.put(("Lille", "A", date(2025, 5, 15)), 10)
+        self.assertIs(cache.get(("Lille", "A", date(2025, 5, 15))), MISSING)
+
+    def test_disabled_cache(self):
+        cache = TrafficCache(max_size=0)
+        cache.put(("Lille", "A", date(2024, 1, 1)), 1)
+        self.assertIs(cache.get(("Lille", "A", date(2024, 1, 1))), MISSING)
+
+    def test_store_sensor_uses_cache(self):
+        store = StoreSensor(location="Lille", avg_visit=1500, std_visit=300)
+        business_date = date(2025, 4, 2)
+        first = store.get_all_traffic(business_date)
+        second = store.get_all_traffic(business_date)
+        store.get_sensor_traffic("A", business_date)
+
+        self.assertEqual(first, second)
+        stats = store.cache.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from app.charts import downsample, lttb
+
+
+class TestCharts(unittest.TestCase):
+
+    def test_lttb_keeps_ends_and_count(self):
+        x = np.arange(1000)
+        y = np.sin(x / 50)
+        indexes = lttb(x, y, 100)
+        self.assertEqual(len(indexes), 100)
+        self.assertEqual(indexes[0], 0)
+        self.assertEqual(indexes[-1], 999)
+        self.assertTrue((np.diff(indexes) > 0).all())
+
+    def test_lttb_keeps_spikes(self):
+        x = np.arange(1000)
+        y = np.zeros(1000)
+        y[437] = 100
+        y[702] = -50
+        indexes = lttb(x, y, 20)
+        self.assertIn(437, indexes)
+        self.assertIn(702, indexes)
+
+    def test_lttb_short_series_unchanged(self):
+        np.testing.assert_array_equal(lttb(np.arange(5), np.ones(5), 10), np.arange(5))
+
+    def test_downsample_bounds_every_series(self):
+        dates = pd.date_range("2020-01-01", periods=2000, freq="D")
+        df = pd.concat(
+            [
+                pd.DataFrame(
+                    {
+                        "store_location": store,
+                        "sensor_id": "A",
+                        "date": dates,
+                        "visit_count": np.arange(len(dates)) % 97,
+                    }
+                )
+                for store in ["Lille", "Paris"]
+            ]
+            + [
+                pd.DataFrame(
+                    {
+                        "store_location": "Lyon",
+                        "sensor_id": "A",
+                        "date": dates[:50],
+                        "visit_count": 1,
+                    }
+                )
+            ]
+        )
+        result = downsample(df, "visit_count", 300)
+        counts = result.groupby("store_location").size()
+        self.assertEqual(counts.to_dict(), {"Lille": 300, "Lyon": 50, "Paris": 300})
+
+
+if __name__ == "__main__":
+    unittest.main()
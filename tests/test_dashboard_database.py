@@ -0,0 +1,317 @@
+import os
+import tempfile
+import time
+import unittest
+
+import duckdb
+import pandas as pd
+import pyarrow.parquet as pq
+
+from app.database import (ROLLUPS, SELECT_DATA_QUERY, auto_unit,
+                          build_rollups, data_version, get_connection,
+                          get_options, get_series, get_store_series, get_table,
+                          open_read_only, refresh_database, rollup_query,
+                          sort_order)
+from etl.incremental_transform import write_processed
+
+
+def build_database(path: str, visit_count: int) -> None:
+    df = pd.DataFrame(
+        {
+            "store_location": ["Lille", "Lille", "Paris"],
+            "sensor_id": ["A", "B", "A"],
+            "date": pd.to_datetime(["2024-01-02", "2024-01-01", "2024-01-01"]),
+            "visit_count": [visit_count, 2, 3],
+            "moving_avg_4": [1.0, 2.0, 3.0],
+        }
+    )
+    if os.path.exists(path):
+        os.remove(path)
+    with duckdb.connect(path) as con:
+        con.execute("CREATE TABLE data AS SELECT * FROM df")
+        build_rollups(con)
+
+
+class TestDashboardDatabase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "data.duckdb")
+        build_database(self.path, visit_count=1)
+        self.version = data_version(self.path)
+        self.cursor = get_connection(self.version, self.path).cursor()
+        self.cursor.execute("USE db")
+
+    def tearDown(self):
+        get_connection.clear()
+        get_table.clear()
+        get_options.clear()
+        get_series.clear()
+        get_store_series.clear()
+        self.tmp_dir.cleanup()
+
+    def test_filters_are_bound_parameters(self):
+        self.assertNotIn("Lille", SELECT_DATA_QUERY)
+        df = get_table(self.cursor, self.version, "Lille", None)
+        self.assertEqual(df["sensor_id"].tolist(), ["B", "A"])  # Ordered by date
+        df = get_table(self.cursor, self.version, None, "A")
+        self.assertEqual(df["store_location"].tolist(), ["Paris", "Lille"])
+        self.assertEqual(len(get_table(self.cursor, self.version, "Lille", "A")), 1)
+        self.assertEqual(len(get_table(self.cursor, self.version, None, None)), 3)
+        # A quote in a filter is a value, not SQL
+        self.assertTrue(
+            get_table(self.cursor, self.version, "x' OR '1'='1", None).empty
+        )
+
+    def test_series_are_aggregated_in_the_database(self):
+        series, unit = get_series(self.cursor, self.version, "Lille", None, "month", 500)
+        self.assertEqual(unit, "month")
+        self.assertEqual(series["sensor_id"].tolist(), ["A", "B"])
+        self.assertEqual(series["date"].astype(str).tolist(), ["2024-01-01"] * 2)
+
+        # Weeks start on Monday 2024-01-01
+        series, _ = get_series(self.cursor, self.version, None, None, "week", 500)
+        self.assertEqual(series["visit_count"].tolist(), [1, 2, 3])
+        self.assertEqual(series["date"].astype(str).unique().tolist(), ["2024-01-01"])
+
+        # Two days fit at a daily resolution
+        series, unit = get_series(self.cursor, self.version, None, "A", None, 500)
+        self.assertEqual(unit, "day")
+        self.assertEqual(len(series), 2)
+
+    def test_store_series_read_the_daily_rollup(self):
+        series = get_store_series(self.cursor, self.version, None, "week")
+        self.assertEqual(series["store_location"].tolist(), ["Lille", "Paris"])
+        self.assertEqual(series["visit_count"].tolist(), [3, 3])
+        series = get_store_series(self.cursor, self.version, "Lille", "day")
+        self.assertEqual(series["visit_count"].tolist(), [2, 1])
+
+    def test_auto_unit(self):
+        self.assertEqual(auto_unit(365, 500), "day")
+        self.assertEqual(auto_unit(5 * 365, 500), "week")
+        self.assertEqual(auto_unit(20 * 365, 500), "month")
+        self.assertEqual(auto_unit(20 * 365, 100), "month")
+
+    def test_options(self):
+        options = get_options(self.cursor, self.version)
+        self.assertEqual(len(options), 3)
+        self.assertEqual(
+            options["store_location"].tolist(), ["Lille", "Lille", "Paris"]
+        )
+
+    def test_connection_is_shared_and_read_only(self):
+        self.assertIs(
+            get_connection(self.version, self.path),
+            get_connection(self.version, self.path),
+        )
+        with self.assertRaises(duckdb.Error):
+            self.cursor.execute("DELETE FROM data")
+
+    def test_rebuilt_database_invalidates_the_caches(self):
+        self.assertEqual(
+            get_table(self.cursor, self.version, "Lille", "A")["visit_count"].tolist(),
+            [1],
+        )
+        time.sleep(0.01)
+        tmp_path = self.path + ".tmp"
+        build_database(tmp_path, visit_count=10)
+        os.replace(tmp_path, self.path)
+
+        version = data_version(self.path)
+        self.assertNotEqual(version, self.version)
+        cursor = get_connection(version, self.path).cursor()
+        cursor.execute("USE db")
+        self.assertEqual(
+            get_table(cursor, version, "Lille", "A")["visit_count"].tolist(), [10]
+        )
+
+
+
+def make_processed(n_days: int) -> pd.DataFrame:
+    dates = pd.date_range("2024-01-01", periods=n_days, freq="D")
+    return pd.DataFrame(
+        {
+            "store_location": ["Lille"] * n_days,
+            "sensor_id": ["A"] * n_days,
+            "date": dates,
+            "day_of_week": dates.dayofweek,
+            "visit_count": range(n_days),
+            "moving_avg_4": [1.0] * n_days,
+            "pct_change": [0.0] * n_days,
+        }
+    )
+
+
+class TestRefreshDatabase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp_dir.name, "data.duckdb")
+        self.parquet_path = os.path.join(self.tmp_dir.name, "data.parquet")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def refresh(self) -> bool:
+        return refresh_database(self.db_path, self.parquet_path)
+
+    def read(self, con=None) -> pd.DataFrame:
+        if con is None:
+            with open_read_only(self.db_path) as con:
+                return self.read(con)
+        return con.execute("SELECT * FROM data ORDER BY date").df()
+
+    def assert_rollups_match_data(self):
+        with open_read_only(self.db_path) as con:
+            for name in ROLLUPS:
+                order = sort_order(name)
+                stored = con.execute(f"SELECT * FROM {name} ORDER BY {order}").df()
+                expected = con.execute(
+                    f"SELECT * FROM ({rollup_query(name)}) ORDER BY {order}"
+                ).df()
+                pd.testing.assert_frame_equal(stored, expected)
+            self.assertEqual(
+                con.execute("SELECT count(*) FROM store_sensors").fetchone()[0],
+                con.execute(
+                    "SELECT count(DISTINCT (store_location, sensor_id)) FROM data"
+                ).fetchone()[0],
+            )
+
+    def unsorted_rows(self) -> int:
+        with open_read_only(self.db_path) as con:
+            return con.execute("SELECT unsorted_rows FROM refresh_state").fetchone()[0]
+
+    def test_build_then_skip_unchanged_source(self):
+        self.assertFalse(self.refresh())  # No processed data yet
+        write_processed(make_processed(10), self.parquet_path)
+        self.assertTrue(self.refresh())
+        self.assertEqual(self.read()["visit_count"].tolist(), list(range(10)))
+
+        version = data_version(self.db_path)
+        self.assertFalse(self.refresh())
+        self.assertEqual(data_version(self.db_path), version)
+
+    def test_only_changes_are_loaded(self):
+        write_processed(make_processed(10), self.parquet_path)
+        self.refresh()
+
+        # One changed row, one new day and one removed day
+        df = make_processed(11).iloc[1:].copy()
+        df.loc[5, "visit_count"] = 500
+        time.sleep(0.01)
+        write_processed(df, self.parquet_path)
+        with self.assertLogs(level="INFO") as logs:
+            self.assertTrue(self.refresh())
+        self.assertIn("4 rows inserted or deleted", logs.output[0])
+
+        result = self.read()
+        self.assertEqual(len(result), 10)
+        self.assertEqual(result["visit_count"].tolist()[4], 500)
+        self.assertEqual(result["date"].min(), pd.Timestamp("2024-01-02"))
+        self.assert_rollups_match_data()
+
+    def test_rewriting_the_same_rows_is_skipped(self):
+        df = make_processed(70)
+        write_processed(df, self.parquet_path)
+        self.refresh()
+        time.sleep(0.01)
+        write_processed(df.sample(frac=1, random_state=0), self.parquet_path)
+        self.assertFalse(self.refresh())
+
+    def test_only_changed_months_are_read(self):
+        # January to March 2024
+        df = make_processed(70)
+        write_processed(df, self.parquet_path)
+        self.refresh()
+
+        df.loc[40, "visit_count"] = 500  # February
+        time.sleep(0.01)
+        write_processed(df.iloc[:-5], self.parquet_path)  # March loses 5 days
+        with self.assertLogs(level="INFO") as logs:
+            self.assertTrue(self.refresh())
+        self.assertIn("7 rows inserted or deleted, months read: 2", logs.output[0])
+        pd.testing.assert_series_equal(
+            self.read()["visit_count"],
+            df["visit_count"].iloc[:-5].astype("int32"),
+            check_names=False,
+        )
+        self.assert_rollups_match_data()
+
+    def test_files_without_month_hashes_are_compared_whole(self):
+        write_processed(make_processed(40), self.parquet_path)
+        table = pq.read_table(self.parquet_path)
+        pq.write_table(table.replace_schema_metadata(), self.parquet_path)
+        self.refresh()
+        time.sleep(0.01)
+        write_processed(make_processed(41), self.parquet_path)
+        with self.assertLogs(level="INFO") as logs:
+            self.assertTrue(self.refresh())
+        self.assertIn("months read: all", logs.output[0])
+        self.assertEqual(len(self.read()), 41)
+
+    def test_build_stores_tables_sorted(self):
+        df = pd.concat([make_processed(40), make_processed(40).assign(sensor_id="B")])
+        write_processed(df.sample(frac=1, random_state=0), self.parquet_path)
+        self.refresh()
+        self.assert_rollups_match_data()
+        with open_read_only(self.db_path) as con:
+            for table in ["data", *ROLLUPS]:
+                stored = con.execute(f"SELECT * FROM {table}").df()
+                self.assertTrue(
+                    stored.equals(
+                        stored.sort_values(
+                            sort_order(table).split(", "), ignore_index=True
+                        )
+                    ),
+                    table,
+                )
+
+    def test_appended_rows_are_compacted(self):
+        write_processed(make_processed(100), self.parquet_path)
+        self.refresh()
+
+        # 5 changed rows stay appended, 15 more trigger a sorted rewrite
+        df = make_processed(100)
+        df.loc[:4, "visit_count"] = 1000
+        time.sleep(0.01)
+        write_processed(df, self.parquet_path)
+        self.refresh()
+        self.assertEqual(self.unsorted_rows(), 5)
+        self.assert_rollups_match_data()
+
+        df.loc[:19, "visit_count"] = 2000
+        time.sleep(0.01)
+        write_processed(df, self.parquet_path)
+        self.refresh()
+        self.assertEqual(self.unsorted_rows(), 0)
+        with open_read_only(self.db_path) as con:
+            dates = con.execute("SELECT date FROM data").df()["date"]
+        self.assertTrue(dates.is_monotonic_increasing)
+        self.assert_rollups_match_data()
+
+    def test_readers_keep_their_snapshot_during_a_swap(self):
+        write_processed(make_processed(5), self.parquet_path)
+        self.refresh()
+        reader = open_read_only(self.db_path)
+
+        time.sleep(0.01)
+        write_processed(make_processed(8), self.parquet_path)
+        self.assertTrue(self.refresh())
+        self.assertEqual(len(self.read(reader)), 5)
+        self.assertEqual(len(self.read()), 8)
+        reader.close()
+        self.assertEqual(
+            sorted(os.listdir(self.tmp_dir.name)), ["data.duckdb", "data.parquet"]
+        )
+
+    def test_new_column_layout_rebuilds_the_table(self):
+        write_processed(make_processed(5), self.parquet_path)
+        self.refresh()
+        time.sleep(0.01)
+        make_processed(5).assign(extra=1).to_parquet(self.parquet_path)
+        self.assertTrue(self.refresh())
+        self.assertIn("extra", self.read().columns)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import tempfile
+import unittest
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from etl.duckdb_transform import transform_with_duckdb
+from etl.raw_layer import PartitionedParquetSink
+from etl.schema import to_processed_table
+from etl.transform_data import (add_moving_average_and_change,
+                                aggregate_daily_visits, load_data, parse_args,
+                                prepare_date_column)
+from tests.helpers import START, STORES, raw_rows
+
+
+class TestDuckDBTransform(unittest.TestCase):
+
+    def test_same_output_as_pandas(self):
+        days = [START + timedelta(days=i) for i in range(75)]
+        # Breaks and zero days are dropped by both engines
+        overrides = {
+            ("Paris", "B", days[3]): -1,
+            ("Lille", "A", days[10]): 0,
+        }
+        with tempfile.TemporaryDirectory() as raw_dir:
+            PartitionedParquetSink(raw_dir).write(
+                raw_rows(days, np.random.default_rng(0), overrides)
+            )
+            expected = add_moving_average_and_change(
+                aggregate_daily_visits(prepare_date_column(load_data(path=raw_dir)))
+            ).sort_values(["store_location", "sensor_id", "date"], ignore_index=True)
+
+            df_day = transform_with_duckdb(raw_dir)
+
+        # Same values, and the same file once written with the shared schema
+        pd.testing.assert_frame_equal(
+            df_day,
+            expected.astype({"store_location": str, "sensor_id": str}),
+            check_dtype=False,
+        )
+        self.assertTrue(
+            to_processed_table(df_day).equals(to_processed_table(expected))
+        )
+        self.assertEqual(set(df_day["store_location"]), set(STORES))
+
+    def test_empty_raw_directory(self):
+        with tempfile.TemporaryDirectory() as raw_dir:
+            self.assertTrue(transform_with_duckdb(raw_dir).empty)
+
+    def test_engine_selection(self):
+        self.assertEqual(parse_args([]).engine, "pandas")
+        self.assertEqual(parse_args(["--engine", "duckdb"]).engine, "duckdb")
+        with self.assertRaises(SystemExit):
+            parse_args(["--engine", "duckdb", "--incremental"])
+
+
+if __name__ == "__main__":
+    unittest.main()
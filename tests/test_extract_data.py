@@ -1,8 +1,48 @@
+import asyncio
+import os
+import tempfile
 import unittest
 from datetime import date
 from unittest.mock import MagicMock, patch
 
-from etl.extract_data import collect_traffic_data, get_data
+import pandas as pd
+
+from etl.extract_data import (collect_traffic_data, collect_traffic_data_async,
+                              fetch_data, first_missing_day, get_data,
+                              run_extraction)
+from etl.extract_state import ExtractionState
+from etl.request_cache import ResponseCache
+from etl.raw_layer import read_raw
+
+
+class FakeResponse:
+    def __init__(self, status: int, text: str = "0"):
+        self.status = status
+        self._text = text
+
+    async def text(self):
+        return self._text
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+
+class FakeSession:
+    """Replays a list of statuses (or exceptions) for successive requests."""
+
+    def __init__(self, outcomes: list):
+        self.outcomes = outcomes
+        self.calls = 0
+
+    def get(self, url, params=None):
+        outcome = self.outcomes[self.calls]
+        self.calls += 1
+        if isinstance(outcome, Exception):
+            raise outcome
+        return FakeResponse(outcome, text=str(outcome))
 
 
 class TestExtractData(unittest.TestCase):
@@ -88,15 +128,263 @@ class TestExtractData(unittest.TestCase):
 
             collect_traffic_data(store_locations, sensors, start_date)
 
-        # Assert get_data was called exactly for each business-hour slot in the month
+        # Assert get_data was called once per day in the month: the API has no hour
         expected_days = 30  # April has 30 days
-        expected_hours = 12  # From 8 to 19 inclusive
-        expected_calls = (
-            expected_days * expected_hours * len(store_locations) * len(sensors)
-        )
+        expected_calls = expected_days * len(store_locations) * len(sensors)
 
         self.assertEqual(mock_get_data.call_count, expected_calls)
 
 
+class TestAsyncExtractData(unittest.TestCase):
+    @patch("etl.extract_data.get_data")
+    def test_async_rows_match_serial(self, mock_get_data):
+        mock_get_data.side_effect = lambda business_parameter: (
+            business_parameter,
+            200,
+        )
+
+        async def fake_fetch(session, semaphore, business_parameter):
+            return business_parameter, 200
+
+        store_locations = ["Lille", "Paris"]
+        sensors = ["A", "B"]
+        start_date = date(2025, 3, 10)
+        serial = collect_traffic_data(store_locations, sensors, start_date)
+        with patch("etl.extract_data.fetch_data", new=fake_fetch):
+            concurrent = asyncio.run(
+                collect_traffic_data_async(store_locations, sensors, start_date)
+            )
+
+        self.assertEqual(concurrent, serial)
+        self.assertTrue(any(row["visit_count"] != 0 for row in concurrent))
+
+    @patch("etl.extract_data.asyncio.sleep")
+    def test_fetch_data_retries_5xx_and_timeouts(self, mock_sleep):
+        session = FakeSession([503, asyncio.TimeoutError(), 200])
+        text, status = asyncio.run(
+            fetch_data(session, asyncio.Semaphore(1), "store_location=Lille")
+        )
+        self.assertEqual((text, status), ("200", 200))
+        self.assertEqual(session.calls, 3)
+        # Exponential backoff between attempts
+        self.assertEqual([c.args[0] for c in mock_sleep.call_args_list], [0.5, 1.0])
+
+    @patch("etl.extract_data.asyncio.sleep")
+    def test_fetch_data_does_not_retry_4xx(self, mock_sleep):
+        session = FakeSession([404])
+        text, status = asyncio.run(
+            fetch_data(session, asyncio.Semaphore(1), "store_location=Nowhere")
+        )
+        self.assertEqual(status, 404)
+        self.assertEqual(session.calls, 1)
+
+    @patch("etl.extract_data.asyncio.sleep")
+    def test_fetch_data_gives_up_after_retries(self, mock_sleep):
+        session = FakeSession([500, 502, 503])
+        text, status = asyncio.run(
+            fetch_data(session, asyncio.Semaphore(1), "store_location=Lille", retries=2)
+        )
+        self.assertEqual(status, 503)
+        self.assertEqual(session.calls, 3)
+
+
+class TestPlannedExtractData(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = ResponseCache(os.path.join(self.tmp_dir.name, "cache.sqlite"))
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmp_dir.cleanup()
+
+    @patch("etl.extract_data.get_data")
+    def test_one_call_per_store_sensor_day(self, mock_get_data):
+        mock_get_data.side_effect = lambda business_parameter: (
+            business_parameter,
+            200,
+        )
+        data = collect_traffic_data(["Lille"], ["A", "B"], date(2025, 3, 10))
+
+        # February 2025: 28 days for 2 sensors
+        self.assertEqual(mock_get_data.call_count, 28 * 2)
+        business_rows = [row for row in data if 8 <= row["hour"] <= 19]
+        self.assertTrue(all(row["visit_count"] != 0 for row in business_rows))
+        self.assertTrue(
+            all(
+                f"day={row['day']}&sensor_id={row['sensor_id']}" in row["visit_count"]
+                for row in business_rows
+            )
+        )
+
+    @patch("etl.extract_data.get_data")
+    def test_rerun_reads_from_cache(self, mock_get_data):
+        mock_get_data.return_value = ("12", 200)
+        first = collect_traffic_data(
+            ["Lille"], ["A"], date(2025, 3, 10), cache=self.cache
+        )
+        self.assertEqual(mock_get_data.call_count, 28)
+
+        second = collect_traffic_data(
+            ["Lille"], ["A"], date(2025, 3, 10), cache=self.cache
+        )
+        self.assertEqual(mock_get_data.call_count, 28)
+        self.assertEqual(first, second)
+
+    @patch("etl.extract_data.get_data")
+    def test_failed_responses_are_not_cached(self, mock_get_data):
+        mock_get_data.return_value = ("Internal Server Error", 500)
+        collect_traffic_data(["Lille"], ["A"], date(2025, 3, 10), cache=self.cache)
+        collect_traffic_data(["Lille"], ["A"], date(2025, 3, 10), cache=self.cache)
+        self.assertEqual(mock_get_data.call_count, 2 * 28)
+
+    def test_async_skips_cached_requests(self):
+        fetched = []
+
+        async def fake_fetch(session, semaphore, business_parameter):
+            fetched.append(business_parameter)
+            return "5", 200
+
+        with patch("etl.extract_data.fetch_data", new=fake_fetch):
+            asyncio.run(
+                collect_traffic_data_async(
+                    ["Lille"], ["A"], date(2025, 3, 10), cache=self.cache
+                )
+            )
+            self.assertEqual(len(fetched), 28)
+            data = asyncio.run(
+                collect_traffic_data_async(
+                    ["Lille"], ["A"], date(2025, 3, 10), cache=self.cache
+                )
+            )
+        self.assertEqual(len(fetched), 28)
+        self.assertEqual({row["visit_count"] for row in data}, {0, "5"})
+
+
+class TestIncrementalExtraction(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.raw_dir = self.tmp_dir.name
+        self.state_path = os.path.join(self.tmp_dir.name, "state.json")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def read_raw(self) -> pd.DataFrame:
+        return read_raw(self.raw_dir)
+
+    @patch("etl.extract_data.get_data")
+    def test_resume_after_crash(self, mock_get_data):
+        host_down = [True]
+
+        def crash_on_day_3(business_parameter):
+            if "day=3&" in business_parameter and host_down[0]:
+                raise ConnectionError("host unreachable")
+            return "10", 200
+
+        mock_get_data.side_effect = crash_on_day_3
+        with self.assertRaises(ConnectionError):
+            run_extraction(
+                ["Lille"],
+                ["A", "B"],
+                date(2025, 4, 1),
+                date(2025, 4, 5),
+                ExtractionState(self.state_path),
+                raw_dir=self.raw_dir,
+                serial=True,
+            )
+        # Days 1 and 2 were checkpointed before the crash
+        state = ExtractionState(self.state_path)
+        self.assertEqual(state.watermark("Lille", "A"), date(2025, 4, 2))
+        self.assertEqual(sorted(self.read_raw()["day"].unique()), [1, 2])
+
+        host_down[0] = False
+        mock_get_data.reset_mock()
+        run_extraction(
+            ["Lille"],
+            ["A", "B"],
+            date(2025, 4, 1),
+            date(2025, 4, 5),
+            state,
+            raw_dir=self.raw_dir,
+            serial=True,
+        )
+        # Only days 3 to 5 are fetched again
+        self.assertEqual(mock_get_data.call_count, 3 * 2)
+        df = self.read_raw()
+        self.assertEqual(len(df), 5 * 24 * 2)
+        self.assertFalse(
+            df.duplicated(["store_location", "sensor_id", "day", "hour"]).any()
+        )
+
+    @patch("etl.extract_data.get_data")
+    def test_failed_day_is_not_checkpointed(self, mock_get_data):
+        mock_get_data.side_effect = lambda business_parameter: (
+            ("Internal Server Error", 500)
+            if "day=2&" in business_parameter
+            else ("10", 200)
+        )
+        state = ExtractionState(self.state_path)
+        run_extraction(
+            ["Lille"],
+            ["A"],
+            date(2025, 4, 1),
+            date(2025, 4, 3),
+            state,
+            raw_dir=self.raw_dir,
+            serial=True,
+        )
+        self.assertEqual(state.watermark("Lille", "A"), date(2025, 4, 1))
+        self.assertTrue(state.is_extracted("Lille", "A", date(2025, 4, 3)))
+        self.assertEqual(
+            first_missing_day(["Lille"], ["A"], state, date(2025, 3, 1)),
+            date(2025, 4, 2),
+        )
+
+    def test_async_backfill_in_chunks(self):
+        fetched = []
+
+        async def fake_fetch(session, semaphore, business_parameter):
+            fetched.append(business_parameter)
+            return "7", 200
+
+        state = ExtractionState(self.state_path)
+        with patch("etl.extract_data.fetch_data", new=fake_fetch):
+            run_extraction(
+                ["Lille", "Paris"],
+                ["A"],
+                date(2025, 4, 1),
+                date(2025, 4, 30),
+                state,
+                raw_dir=self.raw_dir,
+                chunk_days=7,
+            )
+            self.assertEqual(len(fetched), 30 * 2)
+            # A second backfill over the same range has nothing left to fetch
+            run_extraction(
+                ["Lille", "Paris"],
+                ["A"],
+                date(2025, 4, 1),
+                date(2025, 4, 30),
+                state,
+                raw_dir=self.raw_dir,
+                chunk_days=7,
+            )
+        self.assertEqual(len(fetched), 30 * 2)
+        self.assertEqual(state.watermark("Paris", "A"), date(2025, 4, 30))
+        self.assertEqual(len(self.read_raw()), 30 * 24 * 2)
+        self.assertTrue(
+            os.path.exists(
+                os.path.join(
+                    self.raw_dir,
+                    "year=2025",
+                    "month=04",
+                    "store_location=Paris",
+                    "sensor_id=A",
+                    "data_2025_04.parquet",
+                )
+            )
+        )
+
+
 if __name__ == "__main__":
     unittest.main()
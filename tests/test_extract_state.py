@@ -0,0 +1,48 @@
+import os
+import tempfile
+import unittest
+from datetime import date
+
+from etl.extract_state import ExtractionState
+
+
+class TestExtractionState(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "state.json")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_mark_merges_adjacent_days(self):
+        state = ExtractionState(self.path)
+        for day in [1, 2, 4, 3]:
+            state.mark("Lille", "A", date(2025, 4, day))
+        self.assertEqual(
+            state.ranges["Lille|A"], [[date(2025, 4, 1), date(2025, 4, 4)]]
+        )
+        self.assertEqual(state.watermark("Lille", "A"), date(2025, 4, 4))
+        self.assertIsNone(state.watermark("Lille", "B"))
+
+    def test_watermark_stops_at_first_gap(self):
+        state = ExtractionState(self.path)
+        for day in [1, 2, 5]:
+            state.mark("Lille", "A", date(2025, 4, day))
+        self.assertEqual(state.watermark("Lille", "A"), date(2025, 4, 2))
+        self.assertTrue(state.is_extracted("Lille", "A", date(2025, 4, 5)))
+        self.assertFalse(state.is_extracted("Lille", "A", date(2025, 4, 3)))
+
+    def test_save_and_reload(self):
+        state = ExtractionState(self.path)
+        state.mark("Lille", "A", date(2025, 4, 1))
+        state.mark("Paris", "B", date(2020, 1, 1))
+        state.save()
+
+        reloaded = ExtractionState(self.path)
+        self.assertEqual(reloaded.ranges, state.ranges)
+        self.assertFalse(os.path.exists(self.path + ".tmp"))
+
+
+if __name__ == "__main__":
+    unittest.main()
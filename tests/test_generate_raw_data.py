@@ -0,0 +1,79 @@
+import glob
+import os
+import tempfile
+import unittest
+from datetime import date
+
+import numpy as np
+
+from etl.generate_raw_data import generate, make_store, parse_args, store_name
+from etl.raw_layer import PartitionedParquetSink
+from etl.transform_data import (aggregate_daily_visits, load_data,
+                                prepare_date_column)
+from src.sensor import date_range
+
+START = date(2024, 1, 29)
+END = date(2024, 2, 4)
+
+
+class TestGenerateRawData(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.raw_dir = self.tmp_dir.name
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_raw_layout(self):
+        rows, _ = generate(self.raw_dir, 2, ["A", "C"], START, END, workers=2)
+        self.assertEqual(rows, 2 * 2 * 7 * 24)
+
+        files = glob.glob(os.path.join(self.raw_dir, "**", "*.parquet"), recursive=True)
+        # One file per store, sensor and month
+        self.assertEqual(len(files), 2 * 2 * 2)
+        expected = PartitionedParquetSink(self.raw_dir).partition_path(
+            store_name(1), "C", 2024, 2
+        )
+        self.assertIn(expected, files)
+
+        df = load_data(path=self.raw_dir)
+        self.assertEqual(len(df), rows)
+        self.assertEqual(str(df["visit_count"].dtype), "int32")
+        # Outside business hours the extractor writes 0 visits
+        self.assertEqual((df["visit_count"] != 0).sum() % 12, 0)
+
+    def test_counts_are_the_simulated_ones(self):
+        generate(self.raw_dir, 1, ["B"], START, END, workers=1)
+        daily = aggregate_daily_visits(prepare_date_column(load_data(path=self.raw_dir)))
+
+        counts, _, _ = make_store(0, 0.015, 0.035).sensors["B"].get_visit_counts(
+            date_range(START, END)
+        )
+        expected = {
+            day: 12 * count
+            for day, count in zip(date_range(START, END).tolist(), counts.tolist())
+            if count > 0
+        }
+        self.assertEqual(
+            dict(zip(daily["date"].dt.date, daily["visit_count"])), expected
+        )
+
+    def test_fault_rates(self):
+        store = make_store(3, perc_break=1.0, perc_malfunction=1.0)
+        counts, is_break, _ = store.sensors["A"].get_visit_counts(date_range(START, END))
+        self.assertTrue(is_break.all())
+        self.assertTrue(np.all(counts == -1))
+
+    def test_arguments(self):
+        args = parse_args(["--stores", "3", "--sensors", "A", "B", "--end", "2021-01-01"])
+        self.assertEqual(args.sensors, ["A", "B"])
+        self.assertEqual(args.end, date(2021, 1, 1))
+        with self.assertRaises(SystemExit):
+            parse_args(["--sensors", "E"])
+        with self.assertRaises(SystemExit):
+            parse_args(["--start", "2024-01-02", "--end", "2024-01-01"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+import glob
+import os
+import tempfile
+import unittest
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from etl.incremental_transform import (MTIME_SLACK_NS, TransformState,
+                                       read_processed, upsert_daily_visits,
+                                       write_processed)
+from etl.raw_layer import PartitionedParquetSink
+from etl.transform_data import (add_moving_average_and_change,
+                                aggregate_daily_visits, load_data,
+                                prepare_date_column)
+from tests.helpers import START, STORES, raw_rows
+
+class TestIncrementalTransform(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.raw_dir = os.path.join(self.tmp_dir.name, "raw")
+        self.sink = PartitionedParquetSink(self.raw_dir)
+        self.rng = np.random.default_rng(0)
+        self.mtime = 0
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, rows):
+        """Writes raw rows and stamps the new files with the next mtime."""
+        pattern = os.path.join(self.raw_dir, "**", "*.parquet")
+        self.sink.write(rows)
+        self.mtime += 1_000_000_000_000
+        for filename in glob.glob(pattern, recursive=True):
+            # Files just written carry the wall clock time, far above the fake ones
+            if os.stat(filename).st_mtime_ns > self.mtime:
+                os.utime(filename, ns=(self.mtime, self.mtime))
+        return self.mtime
+
+    def full(self):
+        df = prepare_date_column(load_data(path=self.raw_dir))
+        df_day = add_moving_average_and_change(aggregate_daily_visits(df))
+        return df_day.sort_values(
+            ["store_location", "sensor_id", "date"], ignore_index=True
+        )
+
+    def incremental(self, processed, modified_after_ns):
+        df = prepare_date_column(
+            load_data(path=self.raw_dir, modified_after_ns=modified_after_ns)
+        )
+        return upsert_daily_visits(
+            processed,
+            aggregate_daily_visits(df),
+            df[["store_location", "sensor_id", "date"]],
+        )
+
+    def assert_same(self, incremental, full):
+        types = {
+            "store_location": str,
+            "sensor_id": str,
+            "date": "datetime64[ns]",
+            "day_of_week": "int64",
+        }
+        pd.testing.assert_frame_equal(
+            incremental.astype(types), full.astype(types), check_dtype=False
+        )
+
+    def test_new_days_match_full_recompute(self):
+        days = [START + timedelta(days=i) for i in range(60)]
+        first = self.write(raw_rows(days[:40], self.rng))
+        processed = self.incremental(read_processed("missing.parquet"), None)
+        self.assert_same(processed, self.full())
+
+        # The stored file, with its compact types, seeds the next run
+        path = os.path.join(self.tmp_dir.name, "processed", "data.parquet")
+        write_processed(processed, path)
+        self.write(raw_rows(days[40:], self.rng))
+        processed = self.incremental(read_processed(path), first)
+        self.assert_same(processed, self.full())
+
+    def test_late_correction_recomputes_affected_windows_only(self):
+        days = [START + timedelta(days=i) for i in range(70)]
+        last = self.write(raw_rows(days, self.rng))
+        processed = self.incremental(read_processed("missing.parquet"), None)
+
+        # A corrected day and a day that became a break (dropped by the aggregation)
+        corrected, broken = days[15], days[30]
+        rows = raw_rows([corrected], self.rng, {(s, "A", corrected): 500 for s in STORES})
+        rows += raw_rows([broken], self.rng, {("Paris", "B", broken): -1})
+        self.write(
+            [row for row in rows if row["visit_count"] in ("500", "-1")]
+        )
+        updated = self.incremental(processed, last)
+        self.assert_same(updated, self.full())
+
+        # Only the changed days and the 3 next same weekdays moved
+        merged = processed.merge(
+            updated, on=["store_location", "sensor_id", "date"], how="outer"
+        )
+        moved = merged[merged["moving_avg_4_x"].ne(merged["moving_avg_4_y"])]
+        self.assertTrue(
+            (moved["date"] >= pd.Timestamp(corrected)).all()
+            and (moved["date"] <= pd.Timestamp(broken + timedelta(weeks=3))).all()
+        )
+        # 4 windows for each corrected series, the dropped row and 3 windows after it
+        self.assertEqual(len(moved), 2 * 4 + 4)
+
+    def test_nothing_changed(self):
+        days = [START + timedelta(days=i) for i in range(10)]
+        last = self.write(raw_rows(days, self.rng))
+        self.assertTrue(load_data(path=self.raw_dir, modified_after_ns=last).empty)
+
+    def test_state_and_processed_round_trip(self):
+        path = os.path.join(self.tmp_dir.name, "processed", "data.parquet")
+        self.write(raw_rows([START + timedelta(days=i) for i in range(10)], self.rng))
+        write_processed(self.full(), path)
+        self.assert_same(read_processed(path), self.full())
+
+        state_path = os.path.join(self.tmp_dir.name, "state.json")
+        self.assertIsNone(TransformState(state_path).last_run_ns)
+        TransformState(state_path).save(5 * MTIME_SLACK_NS)
+        self.assertEqual(TransformState(state_path).last_run_ns, 4 * MTIME_SLACK_NS)
+
+
+if __name__ == "__main__":
+    unittest.main()
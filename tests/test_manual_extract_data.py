@@ -74,6 +74,52 @@ class TestTrafficDataScript(unittest.TestCase):
         args, kwargs = mock_to_csv.call_args
         self.assertIn("data/raw/data_TestStore_2025_05.csv", args[0])
 
+    @patch("etl.manual_extract_data.get_data")
+    @patch("etl.manual_extract_data.date")
+    def test_collect_traffic_data_one_call_per_day(self, mock_date, mock_get_data):
+        mock_get_data.return_value = ("42", 200)
+        mock_date.today.return_value = date(2025, 5, 15)
+        mock_date.side_effect = lambda *args, **kwargs: date(*args, **kwargs)
+
+        data = collect_traffic_data("TestStore", "A", date(2025, 5, 13))
+
+        # 13, 14 and 15 May, whatever the number of business hours
+        self.assertEqual(mock_get_data.call_count, 3)
+        business_rows = [row for row in data if 8 <= row["hour"] <= 19]
+        self.assertEqual(len(business_rows), 3 * 12)
+        self.assertTrue(all(row["visit_count"] == "42" for row in business_rows))
+
+    @patch("etl.manual_extract_data.get_data")
+    @patch("etl.manual_extract_data.date")
+    def test_collect_traffic_data_stops_on_unknown_store(
+        self, mock_date, mock_get_data
+    ):
+        mock_get_data.return_value = ("Store Not Found", 404)
+        mock_date.today.return_value = date(2025, 5, 15)
+        mock_date.side_effect = lambda *args, **kwargs: date(*args, **kwargs)
+
+        data = collect_traffic_data("BadStore", "", date(2025, 5, 1))
+        self.assertEqual(data, [])
+        self.assertEqual(mock_get_data.call_count, 1)
+
+    @patch("etl.manual_extract_data.get_data")
+    @patch("etl.manual_extract_data.date")
+    def test_failed_days_are_left_out(self, mock_date, mock_get_data):
+        mock_get_data.side_effect = lambda business_parameter: (
+            ('"Store Not Found"', 404)
+            if "day=14" in business_parameter
+            else ("42", 200)
+        )
+        mock_date.today.return_value = date(2025, 5, 15)
+        mock_date.side_effect = lambda *args, **kwargs: date(*args, **kwargs)
+
+        with self.assertLogs(level="ERROR"):
+            data = collect_traffic_data("BadStore", "A", date(2025, 5, 13))
+        days = {row["day"] for row in data}
+        self.assertNotIn(14, days)
+        self.assertTrue({13, 15} <= days)
+        self.assertTrue(all(row["visit_count"] in ("42", 0) for row in data))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,129 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+from datetime import date
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+import src.app
+from src.__init__ import create_app
+from src.app import app
+from src.metrics import (REQUESTS, SENSOR_BREAKS, SENSOR_MALFUNCTIONS,
+                         SIMULATION_DURATION, VALIDATION_FAILURES, Counter,
+                         Histogram, render)
+from src.registry import COLUMNS
+from src.sensor import VisitSensor, date_range
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_text_format(self):
+        counter = Counter("events_total", "Events.", ("kind",))
+        counter.inc("a")
+        counter.inc("a", amount=2)
+        counter.inc('say "hi"')
+        histogram = Histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+        for value in [0.05, 0.5, 0.5, 5]:
+            histogram.observe(value)
+
+        self.assertEqual(
+            render([counter, histogram]).splitlines(),
+            [
+                "# HELP events_total Events.",
+                "# TYPE events_total counter",
+                'events_total{kind="a"} 3',
+                'events_total{kind="say \\"hi\\""} 1',
+                "# HELP latency_seconds Latency.",
+                "# TYPE latency_seconds histogram",
+                'latency_seconds_bucket{le="0.1"} 1',
+                'latency_seconds_bucket{le="1.0"} 3',
+                'latency_seconds_bucket{le="+Inf"} 4',
+                "latency_seconds_sum 6.05",
+                "latency_seconds_count 4",
+            ],
+        )
+
+    def test_simulation_does_not_print_or_count(self):
+        faults = (SENSOR_BREAKS.value(), SENSOR_MALFUNCTIONS.value())
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            VisitSensor(1200, 300, perc_break=1).get_visit_count(date(2024, 1, 2))
+            VisitSensor(1200, 300, perc_malfunction=1).get_visit_count(date(2024, 1, 2))
+            VisitSensor(1200, 300, perc_break=1).get_visit_counts(
+                date_range(date(2024, 1, 1), date(2024, 1, 10))
+            )
+        self.assertEqual(output.getvalue(), "")
+        self.assertEqual((SENSOR_BREAKS.value(), SENSOR_MALFUNCTIONS.value()), faults)
+
+    def test_served_faults_are_counted(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            stores_path = os.path.join(tmp_dir, "stores.csv")
+            with open(stores_path, "w") as f:
+                # Every sensor breaks every day in Broken, and malfunctions in Faulty
+                f.write(",".join(COLUMNS) + "\nBroken,1000,100,1,1\nFaulty,1000,100,0,1\n")
+            for table_path in [None, os.path.join(tmp_dir, "traffic.i32")]:
+                # Precomputing the table serves nothing
+                faults = (SENSOR_BREAKS.value(), SENSOR_MALFUNCTIONS.value())
+                stores = create_app(table_path=table_path, stores_path=stores_path)
+                self.assertEqual(
+                    (SENSOR_BREAKS.value(), SENSOR_MALFUNCTIONS.value()), faults
+                )
+
+                with patch.object(src.app, "store_dict", stores):
+                    client = TestClient(app)
+                    for location, counter in [
+                        ("Broken", SENSOR_BREAKS),
+                        ("Faulty", SENSOR_MALFUNCTIONS),
+                    ]:
+                        served = counter.value()
+                        params = {"store_location": location, "year": 2024, "month": 1}
+                        client.get("/", params={**params, "day": 2, "sensor_id": "A"})
+                        # A store total counts each of its 4 sensors
+                        client.get("/", params={**params, "day": 2})
+                        client.get(
+                            "/visits",
+                            params={
+                                "store_location": location,
+                                "sensor_id": ["A", "B"],
+                                "start_date": "2024-01-01",
+                                "end_date": "2024-01-10",
+                            },
+                        )
+                        key = {**params, "day": 3, "sensor_id": "C"}
+                        client.post("/visits", json={"keys": [key, key]})
+                        self.assertEqual(counter.value(), served + 1 + 4 + 2 * 10 + 2)
+
+    def test_requests_are_measured(self):
+        client = TestClient(app)
+        ok = REQUESTS.value("GET", "/", "200")
+        not_found = REQUESTS.value("GET", "/", "404")
+        unknown_store = VALIDATION_FAILURES.value("unknown_store")
+        invalid = VALIDATION_FAILURES.value("request_validation")
+        simulated = SIMULATION_DURATION.count("GET", "/")
+
+        params = {"store_location": "Lille", "year": 2024, "month": 1, "day": 3}
+        self.assertEqual(client.get("/", params=params).status_code, 200)
+        params["store_location"] = "Nice"
+        self.assertEqual(client.get("/", params=params).status_code, 404)
+        params["year"] = "last"
+        self.assertEqual(client.get("/", params=params).status_code, 422)
+
+        self.assertEqual(REQUESTS.value("GET", "/", "200"), ok + 1)
+        self.assertEqual(REQUESTS.value("GET", "/", "404"), not_found + 1)
+        self.assertEqual(VALIDATION_FAILURES.value("unknown_store"), unknown_store + 1)
+        self.assertEqual(VALIDATION_FAILURES.value("request_validation"), invalid + 1)
+        self.assertEqual(SIMULATION_DURATION.count("GET", "/"), simulated + 1)
+
+        response = client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/plain"))
+        self.assertIn('http_request_duration_seconds_count{method="GET",route="/"}', response.text)
+        # Unknown paths share one series
+        client.get("/store/Lille")
+        self.assertGreaterEqual(REQUESTS.value("GET", "unmatched", "404"), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
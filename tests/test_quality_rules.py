@@ -0,0 +1,149 @@
+import os
+import tempfile
+import time
+import unittest
+from datetime import timedelta
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from etl.incremental_transform import write_processed
+from etl.quality_rules import (DEFAULT_RULES, evaluate, load_daily_visits,
+                               load_dropped_days, write_flags)
+from etl.raw_layer import PartitionedParquetSink, raw_files
+from etl.schema import FLAGS_SCHEMA
+from tests.helpers import START, raw_rows
+
+
+def daily_visits(n_days: int = 14) -> pd.DataFrame:
+    """Two stores with sensors A and B splitting visits 60/40."""
+    dates = pd.date_range("2024-01-01", periods=n_days, freq="D")
+    index = pd.MultiIndex.from_product(
+        [["Lille", "Paris"], ["A", "B"], dates],
+        names=["store_location", "sensor_id", "date"],
+    )
+    df = index.to_frame(index=False)
+    df["visit_count"] = np.where(df["sensor_id"] == "A", 60, 40)
+    df["pct_change"] = 0.0
+    return df
+
+
+def flagged(flags: pd.DataFrame, check: str) -> list[tuple]:
+    rows = flags[flags[check]]
+    return list(
+        zip(rows["store_location"], rows["sensor_id"], rows["date"].astype(str))
+    )
+
+
+class TestQualityRules(unittest.TestCase):
+
+    def test_clean_data_is_not_flagged(self):
+        flags = evaluate(daily_visits())
+        self.assertEqual(len(flags), 56)
+        self.assertFalse(flags["flagged"].any())
+
+    def test_each_check(self):
+        df = daily_visits()
+        day = lambda store, sensor, date: (
+            (df["store_location"] == store)
+            & (df["sensor_id"] == sensor)
+            & (df["date"] == date)
+        )
+        df.loc[day("Lille", "A", "2024-01-03"), "visit_count"] = -12
+        df.loc[day("Paris", "B", "2024-01-04"), "pct_change"] = 0.8
+        # Sensor A of Paris drops to 20%: 12 of 52 visits instead of 60 of 100
+        df.loc[day("Paris", "A", "2024-01-05"), "visit_count"] = 12
+        # A missing Tuesday is flagged, a missing Sunday is not
+        df = df[~day("Lille", "B", "2024-01-09") & ~day("Lille", "B", "2024-01-07")]
+
+        flags = evaluate(df)
+        self.assertEqual(len(flags), 56)
+        self.assertEqual(
+            flagged(flags, "negative_reading"), [("Lille", "A", "2024-01-03")]
+        )
+        self.assertEqual(
+            flagged(flags, "pct_change_exceeded"), [("Paris", "B", "2024-01-04")]
+        )
+        self.assertEqual(flagged(flags, "missing_day"), [("Lille", "B", "2024-01-09")])
+        # Both sensors of Paris move away from their usual split
+        self.assertEqual(
+            flagged(flags, "sensor_split"),
+            [("Paris", "A", "2024-01-05"), ("Paris", "B", "2024-01-05")],
+        )
+        self.assertEqual(flags["flagged"].sum(), 5)
+        missing = flags[flags["date"] == "2024-01-09"]
+        self.assertTrue(missing["visit_count"].isna().tolist()[1])
+
+    def test_configured_checks(self):
+        df = daily_visits()
+        df.loc[0, "pct_change"] = 0.3
+        flags = evaluate(df, {"pct_change_exceeded": {"threshold": 0.2}})
+        self.assertNotIn("missing_day", flags.columns)
+        self.assertEqual(flags["flagged"].sum(), 1)
+        with self.assertRaises(ValueError):
+            evaluate(df, {"unknown": {}})
+
+    def test_flags_file_and_dropped_raw_days(self):
+        days = [START + timedelta(days=i) for i in range(10)]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            raw_dir = os.path.join(tmp_dir, "raw")
+            PartitionedParquetSink(raw_dir).write(
+                raw_rows(days, np.random.default_rng(0), {("Paris", "B", days[3]): -1})
+            )
+            processed = daily_visits(10)
+            processed = processed[
+                (processed["store_location"] != "Paris")
+                | (processed["sensor_id"] != "B")
+                | (processed["date"] != pd.Timestamp(days[3]))
+            ]
+            processed_path = os.path.join(tmp_dir, "data.parquet")
+            write_processed(
+                processed.assign(
+                    day_of_week=processed["date"].dt.dayofweek, moving_avg_4=50.0
+                ),
+                processed_path,
+            )
+            path = os.path.join(tmp_dir, "flags.parquet")
+            write_flags(evaluate(load_daily_visits(processed_path, raw_dir)), path)
+            table = pq.read_table(path)
+
+        self.assertEqual(table.schema, FLAGS_SCHEMA)
+        flags = table.to_pandas()
+        self.assertEqual(
+            flagged(flags, "negative_reading"), [("Paris", "B", str(days[3]))]
+        )
+        self.assertFalse(flags["missing_day"].any())
+        self.assertEqual(set(DEFAULT_RULES) | {"flagged"}, set(FLAGS_SCHEMA.names[5:]))
+
+    def test_dropped_days_scan_only_changed_partitions(self):
+        days = [START + timedelta(days=i) for i in range(40)]
+        broken = {("Paris", "B", days[3]): -1, ("Lille", "A", days[35]): -1}
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            raw_dir = os.path.join(tmp_dir, "raw")
+            cache_path = os.path.join(tmp_dir, "dropped_days.parquet")
+            sink = PartitionedParquetSink(raw_dir)
+            sink.write(raw_rows(days, np.random.default_rng(0), broken))
+            # Written well before the run, beyond the mtime slack
+            for path in raw_files(raw_dir):
+                os.utime(path, ns=(time.time_ns() - 10**10,) * 2)
+            self.assertEqual(len(load_dropped_days(raw_dir, cache_path)), 2)
+
+            with patch("etl.quality_rules.duckdb.connect") as connect:
+                self.assertEqual(len(load_dropped_days(raw_dir, cache_path)), 2)
+            connect.assert_not_called()
+
+            # Fix the January break in a partition written after the last run
+            sink.write(raw_rows([days[3]], np.random.default_rng(0), {}))
+            path = sink.partition_path("Paris", "B", 2024, 1)
+            os.utime(path, ns=(time.time_ns() + 10**10,) * 2)
+            dropped = load_dropped_days(raw_dir, cache_path)
+        self.assertEqual(
+            list(zip(dropped["store_location"], dropped["date"])),
+            [("Lille", pd.Timestamp(days[35]))],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
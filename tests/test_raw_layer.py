@@ -0,0 +1,172 @@
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from etl.raw_layer import (PartitionedParquetSink, compact_daily_files,
+                           migrate_csv_files, read_raw)
+from etl.schema import RAW_FILE_SCHEMA
+
+
+def make_rows(store_location: str, month: int, day: int, visit_count: str) -> list[dict]:
+    return [
+        {
+            "store_location": store_location,
+            "sensor_id": sensor,
+            "visit_count": visit_count if 8 <= hour <= 19 else 0,
+            "hour": hour,
+            "day": day,
+            "month": month,
+            "year": 2025,
+        }
+        for hour in range(24)
+        for sensor in ["A", "B"]
+    ]
+
+
+class TestRawLayer(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.raw_dir = self.tmp_dir.name
+        self.sink = PartitionedParquetSink(self.raw_dir)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_write_hive_partitions(self):
+        self.sink.write(make_rows("Lille", 4, 1, "12") + make_rows("Paris", 4, 1, "30"))
+        self.assertTrue(
+            os.path.exists(
+                os.path.join(
+                    self.raw_dir,
+                    "year=2025",
+                    "month=04",
+                    "store_location=Lille",
+                    "sensor_id=B",
+                    "data_2025_04.parquet",
+                )
+            )
+        )
+        self.assertEqual(self.sink.rows_written, 2 * 48)
+        self.assertGreater(self.sink.bytes_written, 0)
+
+        df = read_raw(self.raw_dir)
+        self.assertEqual(len(df), 2 * 48)
+        self.assertEqual(
+            set(df.columns),
+            {"store_location", "sensor_id", "visit_count", "hour", "day", "month", "year"},
+        )
+
+    def test_rewriting_a_day_replaces_it(self):
+        self.sink.write(make_rows("Lille", 4, 1, "12"))
+        self.sink.write(make_rows("Lille", 4, 1, "15"))
+
+        df = read_raw(self.raw_dir)
+        self.assertEqual(len(df), 48)
+        self.assertEqual(set(df["visit_count"]), {0, 15})
+
+    def test_counts_that_are_not_integers(self):
+        rows = make_rows("Lille", 4, 1, "2.0") + make_rows("Lille", 4, 2, '"Store Not Found"')
+        with self.assertLogs(level="ERROR") as logs:
+            self.sink.write(rows)
+        self.assertIn("Skipped 24 raw rows", logs.output[0])
+
+        df = read_raw(self.raw_dir)
+        self.assertEqual(len(df), 48 + 24)
+        self.assertEqual(set(df.loc[df["day"] == 1, "visit_count"]), {0, 2})
+        self.assertEqual(set(df.loc[df["day"] == 2, "visit_count"]), {0})
+
+    def test_days_of_a_month_share_a_file(self):
+        for day in [3, 1, 2]:
+            self.sink.write(make_rows("Lille", 4, day, "12"))
+        filename = self.sink.partition_path("Lille", "A", 2025, 4)
+        directory = os.path.dirname(filename)
+        self.assertEqual(os.listdir(directory), ["data_2025_04.parquet"])
+        table = pq.read_table(filename)
+        self.assertEqual(table["day"].to_pylist(), [1] * 24 + [2] * 24 + [3] * 24)
+        self.assertEqual(table["hour"].to_pylist(), list(range(24)) * 3)
+
+    def test_compact_daily_files(self):
+        self.sink.write(make_rows("Lille", 4, 1, "12"))
+        directory = os.path.dirname(self.sink.partition_path("Lille", "A", 2025, 4))
+        # Daily files of the earlier layout, one of them with a day the month file has
+        for day, visit_count in [(1, "99"), (2, "13")]:
+            table = pa.table(
+                {
+                    "visit_count": [int(visit_count)] * 24,
+                    "hour": list(range(24)),
+                    "day": [day] * 24,
+                },
+                schema=RAW_FILE_SCHEMA,
+            )
+            pq.write_table(
+                table, os.path.join(directory, f"data_2025_04_{day:02}.parquet")
+            )
+
+        self.assertEqual(compact_daily_files(self.raw_dir), 1)
+        self.assertEqual(os.listdir(directory), ["data_2025_04.parquet"])
+        df = read_raw(self.raw_dir, sensor_id="A")
+        self.assertEqual(
+            df.groupby("day")["visit_count"].max().to_dict(), {1: 12, 2: 13}
+        )
+        self.assertEqual(compact_daily_files(self.raw_dir), 0)
+
+    def test_read_raw_filters_and_projection(self):
+        self.sink.write(make_rows("Lille", 4, 1, "12"))
+        self.sink.write(make_rows("Lille", 5, 1, "13"))
+        self.sink.write(make_rows("Paris", 5, 2, "30"))
+
+        df = read_raw(
+            self.raw_dir,
+            columns=["store_location", "day", "visit_count"],
+            month=5,
+            store_location="Lille",
+        )
+        self.assertEqual(list(df.columns), ["store_location", "day", "visit_count"])
+        self.assertEqual(len(df), 48)
+        self.assertEqual(set(df["visit_count"]), {0, 13})
+
+        self.assertEqual(len(read_raw(self.raw_dir, sensor_id="A", month=5)), 2 * 24)
+        self.assertTrue(read_raw(self.raw_dir, year=2021).empty)
+
+    def test_read_raw_is_typed_and_reports_throughput(self):
+        self.sink.write(make_rows("Lille", 4, 1, "12"))
+        self.sink.write(make_rows("Lille", 4, 2, "13"))
+
+        with self.assertLogs(level="INFO") as logs:
+            df = read_raw(self.raw_dir)
+        self.assertEqual(df["visit_count"].dtype, "int32")
+        self.assertEqual(df["year"].dtype, "int16")
+        self.assertIsInstance(df["store_location"].dtype, pd.CategoricalDtype)
+        self.assertIn("Read 2 raw files (96 rows)", logs.output[0])
+        self.assertIn("files/s", logs.output[0])
+        self.assertIn("rows/s", logs.output[0])
+
+    def test_migrate_csv_files(self):
+        pd.DataFrame(make_rows("Lille", 4, 1, "12")).to_csv(
+            os.path.join(self.raw_dir, "data_2025_04.csv"), index=False
+        )
+        manual = pd.DataFrame(make_rows("Lyon", 4, 2, "9")).drop(columns="sensor_id")
+        manual.iloc[:24].to_csv(
+            os.path.join(self.raw_dir, "data_Lyon_2025_04_sensorC.csv"), index=False
+        )
+        manual.iloc[:24].to_csv(
+            os.path.join(self.raw_dir, "data_Lyon_2025_04.csv"), index=False
+        )
+
+        self.assertEqual(migrate_csv_files(self.raw_dir), 2)
+        df = read_raw(self.raw_dir)
+        self.assertEqual(len(df), 48 + 24)
+        self.assertEqual(set(df.loc[df["store_location"] == "Lyon", "sensor_id"]), {"C"})
+        # Whole-store traffic has no sensor partition and stays as it is
+        self.assertTrue(
+            os.path.exists(os.path.join(self.raw_dir, "data_Lyon_2025_04.csv"))
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
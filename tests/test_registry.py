@@ -0,0 +1,99 @@
+import os
+import tempfile
+import time
+import unittest
+from datetime import date
+from unittest.mock import patch
+
+from src.__init__ import create_app
+from src.registry import StoreRegistry
+from src.store import StoreSensor
+
+
+class TestStoreRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write_csv(self, lines: list[str]) -> str:
+        path = os.path.join(self.tmp_dir.name, "stores.csv")
+        with open(path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        return path
+
+    def test_default_stores(self):
+        stores = create_app()
+        self.assertEqual(
+            list(stores), ["Lille", "Paris", "Lyon", "Bordeaux", "Marseille"]
+        )
+        self.assertIn("Lyon", stores.keys())
+        self.assertNotIn("Nice", stores)
+        with self.assertRaises(KeyError):
+            stores["Nice"]
+
+    def test_same_counts_as_an_eager_store(self):
+        stores = create_app()
+        eager = StoreSensor("Paris", 8000, 800, 0.1, 0.08)
+        for day in [date(2021, 3, 4), date(2023, 7, 14)]:
+            self.assertEqual(
+                stores["Paris"].get_all_traffic(day), eager.get_all_traffic(day)
+            )
+
+    def test_stores_are_built_on_first_access(self):
+        lines = ["location,avg_visit,std_visit,perc_malfunction,perc_break"]
+        lines += [f"store_{i},{1000 + i},100,0.05,0.01" for i in range(5000)]
+        path = self.write_csv(lines)
+
+        with patch("src.registry.StoreSensor", wraps=StoreSensor) as store_sensor:
+            started = time.perf_counter()
+            stores = create_app(stores_path=path)
+            self.assertLess(time.perf_counter() - started, 1)
+            self.assertEqual(len(stores), 5000)
+            store_sensor.assert_not_called()
+
+            self.assertIs(stores["store_42"], stores["store_42"])
+            store_sensor.assert_called_once_with("store_42", 1042, 100, 0.05, 0.01)
+        self.assertEqual(stores.avg_visit.nbytes, 4 * 5000)
+
+    def test_table_precompute_keeps_no_store(self):
+        lines = ["location,avg_visit,std_visit,perc_malfunction,perc_break"]
+        lines += [f"store_{i},{1000 + i},100,0.05,0.01" for i in range(20)]
+        path = self.write_csv(lines)
+        table_path = os.path.join(self.tmp_dir.name, "traffic.i32")
+
+        stores = create_app(table_path=table_path, stores_path=path)
+        self.assertEqual(len(stores.stores), 0)
+        self.assertIs(stores["store_3"].table, stores.table)
+        self.assertEqual(list(stores.stores), ["store_3"])
+
+    def test_built_stores_are_bounded(self):
+        lines = ["location,avg_visit,std_visit,perc_malfunction,perc_break"]
+        lines += [f"store_{i},{1000 + i},100,0.05,0.01" for i in range(5)]
+        stores = StoreRegistry.from_csv(self.write_csv(lines))
+        stores.max_stores = 2
+
+        first = stores["store_0"]
+        stores["store_1"]
+        self.assertIs(stores["store_0"], first)
+        stores["store_2"]
+        # store_1 was the least recently used
+        self.assertEqual(list(stores.stores), ["store_0", "store_2"])
+        self.assertIsNot(stores["store_1"], stores.build("store_1"))
+
+    def test_invalid_config(self):
+        with self.assertRaises(ValueError):
+            StoreRegistry.from_csv(self.write_csv(["location,avg_visit", "Lille,3000"]))
+        header = "location,avg_visit,std_visit,perc_malfunction,perc_break"
+        with self.assertRaises(ValueError):
+            StoreRegistry.from_csv(
+                self.write_csv([header, "Lille,1,1,0,0", "Lille,2,2,0,0"])
+            )
+        with self.assertRaises(ValueError):
+            StoreRegistry.from_csv(self.write_csv([header, "Orléans,1,1,0,0"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
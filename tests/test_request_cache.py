@@ -0,0 +1,52 @@
+import os
+import tempfile
+import unittest
+from datetime import date, timedelta
+
+from etl.request_cache import ResponseCache, unique_requests
+
+
+class TestRequestCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "cache.sqlite")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_unique_requests(self):
+        row = {"year": 2025, "month": 4, "day": 2}
+        plan = [(row, None), (row, "a"), (row, "a"), (row, "b")]
+        self.assertEqual(
+            unique_requests(plan), {"a": date(2025, 4, 2), "b": date(2025, 4, 2)}
+        )
+
+    def test_cache_persists_across_connections(self):
+        cache = ResponseCache(self.path)
+        cache.put("a", date(2025, 4, 2), "42", 200)
+        cache.close()
+
+        cache = ResponseCache(self.path)
+        self.assertEqual(cache.get_many(["a", "b"]), {"a": ("42", 200)})
+        cache.close()
+
+    def test_only_past_successful_responses_are_cached(self):
+        cache = ResponseCache(self.path)
+        cache.put("error", date(2025, 4, 2), "Store Not Found", 404)
+        cache.put("today", date.today(), "42", 200)
+        cache.put("future", date.today() + timedelta(days=1), "42", 200)
+        self.assertEqual(cache.get_many(["error", "today", "future"]), {})
+        cache.close()
+
+    def test_get_many_large_batch(self):
+        cache = ResponseCache(self.path)
+        for i in range(1200):
+            cache.put(str(i), date(2024, 1, 1), str(i), 200)
+        responses = cache.get_many([str(i) for i in range(1500)])
+        self.assertEqual(len(responses), 1200)
+        cache.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+import unittest
+from datetime import date
+from unittest.mock import patch
+
+from etl import transform_data
+from etl.extract_data import run_extraction
+from etl.extract_state import ExtractionState
+from etl.generate_raw_data import write_store
+from etl.run_report import RunReport
+
+
+class TestRunReport(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_stages_accumulate(self):
+        report = RunReport("test", {"serial": True})
+        for _ in range(3):
+            with report.stage("fetch") as stage:
+                stage.rows += 2
+                stage.bytes_read += 10
+        with report.stage("write") as stage:
+            stage.bytes_written = 100
+
+        content = report.as_dict()
+        self.assertEqual(content["args"], {"serial": True})
+        fetch, write = content["stages"]
+        self.assertEqual(
+            (fetch["name"], fetch["calls"], fetch["rows"], fetch["bytes_read"]),
+            ("fetch", 3, 6, 30),
+        )
+        self.assertEqual((write["name"], write["bytes_written"]), ("write", 100))
+        self.assertGreater(write["peak_rss_bytes"], 0)
+        self.assertGreaterEqual(content["wall_s"], fetch["wall_s"] + write["wall_s"])
+
+    def test_concurrent_entries_are_timed_once(self):
+        report = RunReport("test")
+
+        async def request():
+            with report.stage("fetch"):
+                await asyncio.sleep(0.05)
+
+        async def run():
+            await asyncio.gather(*[request() for _ in range(10)])
+
+        asyncio.run(run())
+        stage = report.stages["fetch"]
+        self.assertEqual(stage.calls, 10)
+        self.assertLess(stage.wall_s, 0.25)
+
+    def test_stages_do_not_overlap(self):
+        report = RunReport("test")
+
+        async def extract_day(i):
+            with report.stage("fetch"):
+                await asyncio.sleep(0.05 * (i + 1))
+            # A blocking write while the other days are still fetching
+            with report.stage("write"):
+                time.sleep(0.05)
+
+        async def run():
+            await asyncio.gather(*[extract_day(i) for i in range(3)])
+
+        asyncio.run(run())
+        fetch, write = report.stages["fetch"], report.stages["write"]
+        self.assertGreaterEqual(write.wall_s, 0.15)
+        self.assertLess(fetch.wall_s, 0.1)
+        self.assertEqual(report.running, [])
+        self.assertGreaterEqual(
+            report.as_dict()["wall_s"], fetch.wall_s + write.wall_s
+        )
+
+    def test_failed_stage_is_measured(self):
+        report = RunReport("test")
+        with self.assertRaises(ValueError):
+            with report.stage("load"):
+                raise ValueError("corrupt file")
+        self.assertEqual(report.stages["load"].calls, 1)
+        self.assertEqual(report.stages["load"].active, 0)
+
+    def test_save(self):
+        path = os.path.join(self.tmp_dir.name, "reports", "run.json")
+        report = RunReport("test", {"start": date(2025, 4, 1)})
+        report.status = "success"
+        report.save(path)
+        with open(path) as f:
+            content = json.load(f)
+        self.assertEqual(content["status"], "success")
+        self.assertEqual(content["args"], {"start": "2025-04-01"})
+        self.assertEqual(os.listdir(os.path.dirname(path)), ["run.json"])
+
+    @patch("etl.extract_data.get_data", return_value=("10", 200))
+    def test_extraction_stages(self, mock_get_data):
+        report = RunReport("extract_data")
+        run_extraction(
+            ["Lille"],
+            ["A", "B"],
+            date(2025, 4, 1),
+            date(2025, 4, 5),
+            ExtractionState(os.path.join(self.tmp_dir.name, "state.json")),
+            raw_dir=os.path.join(self.tmp_dir.name, "raw"),
+            serial=True,
+            report=report,
+        )
+        fetch, write = report.stages["fetch"], report.stages["write"]
+        # One request per sensor and day, fanned out to 24 hourly rows
+        self.assertEqual((fetch.calls, fetch.rows, fetch.bytes_read), (5, 10, 20))
+        self.assertEqual((write.calls, write.rows), (5, 5 * 2 * 24))
+        self.assertGreater(write.bytes_written, 0)
+
+    def test_transform_report(self):
+        raw_dir = os.path.join(self.tmp_dir.name, "raw")
+        write_store(raw_dir, 0, ["A", "B"], date(2025, 1, 1), date(2025, 1, 31), 0, 0, 0)
+        processed_path = os.path.join(self.tmp_dir.name, "processed", "data.parquet")
+        report_path = os.path.join(self.tmp_dir.name, "transform.json")
+        with patch.multiple(
+            transform_data,
+            RAW_PATH=raw_dir,
+            PROCESSED_PATH=processed_path,
+            STATE_PATH=os.path.join(self.tmp_dir.name, "state.json"),
+        ), patch("builtins.print"):
+            transform_data.main(["--report", report_path])
+
+        with open(report_path) as f:
+            content = json.load(f)
+        self.assertEqual(content["script"], "transform_data")
+        self.assertEqual(content["status"], "success")
+        stages = {stage["name"]: stage for stage in content["stages"]}
+        self.assertEqual(
+            list(stages), ["load", "prepare", "aggregate", "features", "write"]
+        )
+        self.assertEqual(stages["load"]["rows"], 31 * 2 * 24)
+        self.assertGreater(stages["load"]["bytes_read"], 0)
+        self.assertEqual(stages["write"]["rows"], stages["features"]["rows"])
+        self.assertEqual(
+            stages["write"]["bytes_written"], os.path.getsize(processed_path)
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from etl.incremental_transform import read_processed, write_processed
+from etl.raw_layer import PartitionedParquetSink
+from etl.schema import (PROCESSED_SCHEMA, RAW_FILE_SCHEMA, log_memory,
+                        to_processed_table)
+
+
+def make_processed() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "store_location": ["Lille", "Lille", "Paris"],
+            "sensor_id": ["A", "B", "A"],
+            "date": pd.to_datetime(["2024-01-01", "2024-01-01", "2024-01-02"]),
+            "day_of_week": [0, 0, 1],
+            "visit_count": [120, 80, 95],
+            "moving_avg_4": [120.0, 80.0, 95.0],
+            "pct_change": [0.0, 0.0, 0.0],
+        }
+    )
+
+
+class TestSchema(unittest.TestCase):
+
+    def test_raw_files_follow_the_schema(self):
+        with tempfile.TemporaryDirectory() as raw_dir:
+            sink = PartitionedParquetSink(raw_dir)
+            sink.write(
+                [
+                    {
+                        "store_location": "Lille",
+                        "sensor_id": "A",
+                        "year": 2024,
+                        "month": 1,
+                        "day": 2,
+                        "hour": 9,
+                        # The API's response text
+                        "visit_count": "42",
+                    }
+                ]
+            )
+            filename = sink.partition_path("Lille", "A", 2024, 1)
+            self.assertTrue(pq.read_schema(filename).equals(RAW_FILE_SCHEMA))
+            self.assertEqual(pq.read_table(filename)["visit_count"].to_pylist(), [42])
+
+    def test_processed_file_follows_the_schema(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "data.parquet")
+            write_processed(make_processed(), path)
+            self.assertTrue(pq.read_schema(path).equals(PROCESSED_SCHEMA))
+
+            df = read_processed(path)
+            self.assertIsInstance(df["store_location"].dtype, pd.CategoricalDtype)
+            self.assertEqual(df["visit_count"].dtype, "int32")
+            self.assertEqual(df["moving_avg_4"].dtype, "float32")
+            self.assertTrue(pd.api.types.is_datetime64_dtype(df["date"]))
+
+    def test_missing_column_is_rejected(self):
+        with self.assertRaises(KeyError):
+            to_processed_table(make_processed().drop(columns="pct_change"))
+
+    def test_dates_are_date32(self):
+        table = to_processed_table(make_processed())
+        self.assertEqual(table.schema.field("date").type, pa.date32())
+        self.assertEqual(table["date"][2].as_py().isoformat(), "2024-01-02")
+
+    def test_log_memory(self):
+        df = make_processed()
+        with self.assertLogs(level="INFO") as logs:
+            size = log_memory("features", df)
+        self.assertEqual(size, df.memory_usage(deep=True).sum())
+        self.assertIn("features: 3 rows", logs.output[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,5 @@
 import unittest
-from datetime import date
+from datetime import date, timedelta
 
 from src.store import StoreSensor
 
@@ -16,13 +16,58 @@ class TestStoreSensor(unittest.TestCase):
     def test_get_all_traffic(self):
         store = StoreSensor(location="Lille", avg_visit=1500, std_visit=300)
         traffic = store.get_all_traffic(business_date=date(year=2025, month=4, day=2))
-        self.assertEqual(traffic, 149)
+        self.assertEqual(traffic, 172)
 
     def test_store_closed_sunday(self):
         store = StoreSensor(location="Lille", avg_visit=1500, std_visit=300)
         traffic = store.get_all_traffic(business_date=date(year=2025, month=5, day=4))
         self.assertEqual(traffic, 0)
 
+    def test_get_all_traffic_range_matches_scalar(self):
+        store = StoreSensor(
+            location="Paris",
+            avg_visit=8000,
+            std_visit=800,
+            perc_malfunction=0.1,
+            perc_break=0.08,
+        )
+        start, end = date(2024, 1, 1), date(2024, 12, 31)
+        dates, counts, _, _ = store.get_all_traffic_range(start, end)
+
+        self.assertEqual(len(dates), 366)
+        expected = [
+            store.get_all_traffic(start + timedelta(days=i)) for i in range(len(dates))
+        ]
+        self.assertEqual(counts.tolist(), expected)
+
+    def test_get_sensor_traffic_range_matches_scalar(self):
+        store = StoreSensor(location="Lille", avg_visit=1500, std_visit=300)
+        start, end = date(2025, 3, 1), date(2025, 4, 30)
+        dates, counts, _, _ = store.get_sensor_traffic_range("B", start, end)
+
+        expected = [
+            store.get_sensor_traffic("B", start + timedelta(days=i))
+            for i in range(len(dates))
+        ]
+        self.assertEqual(counts.tolist(), expected)
+
+    def test_sensors_draw_independently(self):
+        store = StoreSensor(
+            location="Paris",
+            avg_visit=8000,
+            std_visit=800,
+            perc_malfunction=0.5,
+            perc_break=0.5,
+        )
+        _, _, break_a, _ = store.get_sensor_traffic_range(
+            "A", date(2024, 1, 1), date(2024, 12, 31)
+        )
+        _, _, break_b, _ = store.get_sensor_traffic_range(
+            "B", date(2024, 1, 1), date(2024, 12, 31)
+        )
+        # Each (store, sensor, date) has its own draws, so sensors break on different days
+        self.assertFalse((break_a == break_b).all())
+
 
 if __name__ == "__main__":
     unittest.main()
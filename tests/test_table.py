@@ -0,0 +1,91 @@
+import os
+import tempfile
+import unittest
+from datetime import date, timedelta
+from unittest.mock import patch
+
+from src.__init__ import create_app
+from src.registry import COLUMNS, StoreRegistry
+from src.table import START_DATE, TrafficTable
+
+
+class TestTrafficTable(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "traffic.i32")
+        self.stores = create_app()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_lookup_matches_simulation(self):
+        table = TrafficTable(self.path, self.stores)
+        table.sync(end_date=date(2020, 12, 31))
+        self.assertEqual(table.n_days(), 366)
+
+        for location, store in self.stores.items():
+            for day in [date(2020, 1, 1), date(2020, 6, 13), date(2020, 12, 31)]:
+                for sensor_id in ["A", "B", "C", "D"]:
+                    self.assertEqual(
+                        table.lookup(location, sensor_id, day),
+                        store.get_sensor_traffic(sensor_id, day),
+                    )
+                self.assertEqual(
+                    table.lookup(location, None, day), store.get_all_traffic(day)
+                )
+
+    def test_sync_appends_only_missing_days(self):
+        table = TrafficTable(self.path, self.stores)
+        table.sync(end_date=date(2020, 1, 31))
+        size = os.path.getsize(self.path)
+
+        with patch.object(
+            TrafficTable, "compute_rows", wraps=table.compute_rows
+        ) as compute_rows:
+            table.sync(end_date=date(2020, 2, 1))
+        compute_rows.assert_called_once_with(date(2020, 2, 1), date(2020, 2, 1))
+        self.assertEqual(os.path.getsize(self.path), size + table.row_bytes)
+
+    def test_changed_store_parameters_rebuild_the_table(self):
+        stores_path = os.path.join(self.tmp_dir.name, "stores.csv")
+        with open(stores_path, "w") as f:
+            f.write(",".join(COLUMNS) + "\nLille,3000,300,0,0\n")
+        table = TrafficTable(self.path, StoreRegistry.from_csv(stores_path))
+        table.sync(end_date=date(2020, 1, 31))
+        day = date(2020, 1, 6)
+        before = table.lookup("Lille", None, day)
+
+        with open(stores_path, "w") as f:
+            f.write(",".join(COLUMNS) + "\nLille,90000,300,0,0\n")
+        stores = StoreRegistry.from_csv(stores_path)
+        table = TrafficTable(self.path, stores)
+        table.sync(end_date=date(2020, 1, 31))
+        self.assertEqual(table.n_days(), 31)
+        self.assertGreater(table.lookup("Lille", None, day), 10 * before)
+        self.assertEqual(
+            table.lookup("Lille", None, day),
+            stores.build("Lille").get_all_traffic(day),
+        )
+
+    def test_lookup_outside_table(self):
+        table = TrafficTable(self.path, self.stores)
+        table.sync(end_date=date(2020, 1, 31))
+        self.assertIsNone(table.lookup("Lille", "A", START_DATE - timedelta(days=1)))
+        self.assertIsNone(table.lookup("Lille", "A", date.today() + timedelta(days=1)))
+
+    def test_create_app_attaches_table(self):
+        stores = create_app(table_path=self.path)
+        table = stores["Paris"].table
+        self.assertEqual(
+            table.n_days(), date.today().toordinal() - START_DATE.toordinal() + 1
+        )
+        dates = [date(2023, 3, 1) + timedelta(days=i) for i in range(30)]
+        self.assertEqual(
+            stores["Paris"].get_traffic_counts("C", dates).tolist(),
+            [self.stores["Paris"].get_sensor_traffic("C", d) for d in dates],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
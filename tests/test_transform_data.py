@@ -1,8 +1,10 @@
+import tempfile
 import unittest
 from unittest.mock import patch
 
 import pandas as pd
 
+from etl.raw_layer import PartitionedParquetSink
 from etl.transform_data import (add_moving_average_and_change,
                                 aggregate_daily_visits, load_data,
                                 prepare_date_column)
@@ -10,42 +12,36 @@ from etl.transform_data import (add_moving_average_and_change,
 
 class TestTransformData(unittest.TestCase):
 
-    @patch("glob.glob")
-    @patch("pandas.concat")
-    @patch("pandas.read_csv")
-    def test_load_data(self, mock_read_csv, mock_concat, mock_glob):
-        # Mocking glob to simulate the presence of CSV files
-        mock_glob.return_value = ["file1.csv", "file2.csv"]
+    def test_load_data(self):
+        with tempfile.TemporaryDirectory() as raw_dir:
+            sink = PartitionedParquetSink(raw_dir)
+            sink.write(
+                [
+                    {
+                        "store_location": store,
+                        "sensor_id": "A",
+                        "year": 2023,
+                        "month": month,
+                        "day": 1,
+                        "hour": 10,
+                        "visit_count": "100",
+                    }
+                    for store in ["A", "B"]
+                    for month in [5, 6]
+                ]
+            )
 
-        # Mock the behavior of pd.read_csv to return a simple DataFrame
-        mock_read_csv.return_value = pd.DataFrame(
-            {
-                "store_location": ["A", "B"],
-                "sensor_id": [1, 1],
-                "year": [2023, 2023],
-                "month": [5, 5],
-                "day": [1, 2],
-                "visit_count": [100, 200],
-            }
-        )
+            df = load_data(path=raw_dir)
+            self.assertFalse(df.empty)
+            self.assertIn("sensor_id", df.columns)
+            self.assertNotIn("hour", df.columns)
+            self.assertEqual(df.shape[0], 4)
+            self.assertTrue(pd.api.types.is_numeric_dtype(df["visit_count"]))
 
-        # Mock pandas concat
-        mock_concat.return_value = pd.DataFrame(
-            {
-                "store_location": ["A", "B"],
-                "sensor_id": [1, 1],
-                "year": [2023, 2023],
-                "month": [5, 5],
-                "day": [1, 2],
-                "visit_count": [100, 200],
-            }
-        )
-
-        # Test
-        df = load_data(path="data/raw/")
-        self.assertFalse(df.empty)
-        self.assertIn("sensor_id", df.columns)
-        self.assertEqual(df.shape[0], 2)
+            # Partition filters only read the matching files
+            df = load_data(path=raw_dir, month=5, store_location="B")
+            self.assertEqual(df.shape[0], 1)
+            self.assertEqual(df["store_location"].tolist(), ["B"])
 
     def test_prepare_date_column(self):
         df = pd.DataFrame(
@@ -97,6 +93,20 @@ class TestTransformData(unittest.TestCase):
         self.assertIn("pct_change", df_result.columns)
         self.assertFalse(df_result["moving_avg_4"].isna().all())
 
+    def test_pct_change_with_zero_average(self):
+        df_day = pd.DataFrame(
+            {
+                "store_location": ["A"] * 3,
+                "sensor_id": ["A"] * 3,
+                "date": pd.to_datetime(["2023-05-01", "2023-05-08", "2023-05-15"]),
+                "day_of_week": [0, 0, 0],
+                "visit_count": [0, 0, 30],
+            }
+        )
+        df_result = add_moving_average_and_change(df_day)
+        self.assertEqual(df_result["moving_avg_4"].tolist(), [0, 0, 10])
+        self.assertEqual(df_result["pct_change"].tolist(), [0, 0, 2])
+
     def test_load_sensor_data_empty(self):
         # Test case for when no CSV files are found
         with patch("glob.glob", return_value=[]):
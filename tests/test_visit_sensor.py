@@ -1,6 +1,10 @@
 import unittest
-from datetime import date
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
 
+import numpy as np
+
+from src.rng import daily_draws, derive_key, philox_blocks
 from src.sensor import VisitSensor
 
 
@@ -134,6 +138,59 @@ class TestVisitSensor(unittest.TestCase):
 
         self.assertEqual(visit_count, 96)
 
+    def test_get_visit_counts_matches_scalar(self):
+        visit_sensor = VisitSensor(
+            avg_visit=1200, std_visit=300, perc_break=0.05, perc_malfunction=0.1
+        )
+        dates = [date(2023, 1, 1) + timedelta(days=i) for i in range(400)]
+        counts, is_break, is_malfunction = visit_sensor.get_visit_counts(dates)
+
+        expected = [visit_sensor.get_visit_count(d) for d in dates]
+        self.assertEqual(counts.tolist(), expected)
+        self.assertTrue(is_break.any())
+        self.assertTrue(is_malfunction.any())
+        self.assertTrue((counts[is_break] == -1).all())
+
+    def test_global_random_state_is_untouched(self):
+        visit_sensor = VisitSensor(avg_visit=1200, std_visit=300)
+        np.random.seed(seed=7)
+        expected = np.random.random()
+
+        np.random.seed(seed=7)
+        visit_sensor.get_visit_count(date(year=2025, month=4, day=9))
+        self.assertEqual(np.random.random(), expected)
+
+    def test_concurrent_calls_are_deterministic(self):
+        visit_sensor = VisitSensor(
+            avg_visit=1200, std_visit=300, perc_break=0.05, perc_malfunction=0.1
+        )
+        dates = [date(2022, 1, 1) + timedelta(days=i) for i in range(500)]
+        expected = [visit_sensor.get_visit_count(d) for d in dates]
+
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            results = list(executor.map(visit_sensor.get_visit_count, dates * 4))
+        self.assertEqual(results, expected * 4)
+
+
+class TestPhilox(unittest.TestCase):
+
+    def test_matches_numpy_philox(self):
+        key = derive_key(3, 5)
+        # Unsorted, repeated and non-consecutive ordinals
+        ordinals = np.array([737426, 1, 737425, 2**40, 737425, 737427])
+        blocks = philox_blocks(key, ordinals)
+
+        for i, ordinal in enumerate(ordinals):
+            # numpy increments its counter before generating the first block
+            reference = np.random.Philox(
+                key=key, counter=[int(ordinal) - 1, 0, 0, 0]
+            ).random_raw(4)
+            self.assertEqual(blocks[i].tolist(), reference.tolist())
+
+    def test_draws_are_unchanged(self):
+        uniform, normal = daily_draws(derive_key(0, 1, 2), [737425, 737426])
+        np.testing.assert_allclose(uniform, [0.01767995, 0.6529386], atol=1e-8)
+        np.testing.assert_allclose(normal, [-0.66585776, -0.18867746], atol=1e-8)
 
 if __name__ == "__main__":
     unittest.main()